@@ -1,6 +1,6 @@
-# Run the loop
+# Run the analyzer as a long-running daemon; the loop only restarts it if it exits
 while true; do
 	source /opt/workhub/DocuInsight/analyzer/.env
-	python3 /opt/workhub/DocuInsight/analyzer/main.py
-	sleep $((RANDOM % 10 + 1)) # pause between 1 - 10 seconds
+	python3 /opt/workhub/DocuInsight/analyzer/main.py --daemon
+	sleep $((RANDOM % 10 + 1)) # pause between 1 - 10 seconds before restarting
 done
@@ -0,0 +1,117 @@
+import statistics
+import subprocess
+import argparse
+import sys
+import os
+
+# imported on first use (see file_io.py, clients.py and mail.py); importing any of
+# these when the analyzer starts means a lazy import became an eager one again
+LAZY_MODULES = (
+    "fitz",
+    "docx",
+    "openpyxl",
+    "pytesseract",
+    "PIL",
+    "chardet",
+    "openai",
+    "groq",
+    "supabase",
+    "resend",
+)
+
+
+def get_startup_modules(python=sys.executable):
+    """
+    Returns the modules a fresh interpreter imports before running any code
+    (site, .pth hooks, ...), which aren't the analyzer's cost.
+    """
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", "pass"], capture_output=True, text=True
+    )
+    return {
+        line.split("|")[-1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:")
+    }
+
+
+def measure_import(module_name, python=sys.executable):
+    """
+    Imports `module_name` in a fresh interpreter and returns (total import time
+    in seconds, {module: cumulative seconds}, names of LAZY_MODULES that got imported).
+    """
+    check_lazy = (
+        f"import sys, {module_name}; "
+        f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", check_lazy],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise Exception(f"Importing {module_name} failed:\n{result.stderr}")
+
+    # lines look like "import time:  self [us] | cumulative | imported package"
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:") :].split("|")
+        name = name.strip()
+        cumulative[name] = max(cumulative.get(name, 0), int(cumulative_us) / 1e6)
+
+    eagerly_imported = [name for name in result.stdout.strip().split(",") if name]
+    return cumulative.get(module_name, 0.0), cumulative, eagerly_imported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure how long importing the analyzer's modules takes in a fresh interpreter"
+    )
+    parser.add_argument(
+        "--modules",
+        nargs="+",
+        default=["main", "file_io", "clients", "g_agent", "o_agent"],
+        help="modules to import (default: main file_io clients g_agent o_agent)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="imports per module (the median counts)"
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=10,
+        help="how many of the slowest imported top-level packages to list per module",
+    )
+    args = parser.parse_args()
+
+    print(f"{'module':<20} {'median (s)':>11} {'min (s)':>9} {'max (s)':>9}")
+    startup_modules = get_startup_modules()
+    reports = []
+    for module_name in args.modules:
+        runs = [measure_import(module_name) for _ in range(args.repeat)]
+        totals = [total for total, _, _ in runs]
+        print(
+            f"{module_name:<20} {statistics.median(totals):>11.3f} "
+            f"{min(totals):>9.3f} {max(totals):>9.3f}"
+        )
+        reports.append((module_name, runs[-1][1], runs[-1][2]))
+
+    for module_name, cumulative, eagerly_imported in reports:
+        # only the top-level packages, their submodules are included in their time
+        packages = {
+            name: seconds
+            for name, seconds in cumulative.items()
+            if "." not in name and name != module_name and name not in startup_modules
+        }
+        slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+        print(f"\nslowest imports of {module_name}:")
+        for name, seconds in slowest[: args.top]:
+            print(f"  {name:<30} {seconds:>8.3f}s")
+        if eagerly_imported:
+            print(
+                f"  WARNING: {module_name} imports {', '.join(eagerly_imported)} "
+                "on import, which should only be imported on first use"
+            )
@@ -0,0 +1,113 @@
+import argparse
+import tempfile
+import time
+import re
+import os
+
+import fitz
+
+import file_io
+
+
+def legacy_load_pdf_content(file_path):
+    # what load_file_content() did for PDFs before load_pdf_parallel()
+    document = fitz.open(file_path)
+    text = ""
+    for page_num in range(document.page_count):
+        page = document[page_num]
+        text += page.get_text()
+    document.close()
+    text = re.sub(r"\n\s+\n", "\n\n", text)
+    text = re.sub(r"\n{2,}", "\n\n", text)
+    return text
+
+
+def make_sample_pdf(file_path, page_count):
+    """
+    Writes a text-heavy PDF (contract-like numbered clauses) with `page_count` pages.
+    """
+    document = fitz.open()
+    clause = (
+        "{n}. The Receiving Party shall hold and maintain the Confidential Information "
+        "in strictest confidence for the sole and exclusive benefit of the Disclosing "
+        "Party, and shall not, without prior written approval, use for its own benefit, "
+        "publish, copy, or otherwise disclose to others any Confidential Information.\n\n \n"
+    )
+    for page_num in range(page_count):
+        page = document.new_page()
+        text = "".join(clause.format(n=page_num * 6 + i + 1) for i in range(6))
+        page.insert_textbox(fitz.Rect(54, 54, 558, 738), text, fontsize=9)
+    document.save(file_path)
+    document.close()
+
+
+def time_it(func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the serial and the page-parallel PDF text extraction"
+    )
+    parser.add_argument(
+        "--path",
+        help="PDF to extract (a synthetic contract is generated when omitted)",
+    )
+    parser.add_argument(
+        "--pages",
+        type=int,
+        nargs="+",
+        default=[10, 100, 300, 1000],
+        help="page counts of the generated PDFs",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="runs per loader (the best one counts)"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_paths = []
+        if args.path:
+            pdf_paths.append(args.path)
+        else:
+            for page_count in args.pages:
+                pdf_path = os.path.join(temp_dir, f"contract_{page_count}.pdf")
+                make_sample_pdf(pdf_path, page_count)
+                pdf_paths.append(pdf_path)
+
+        # start the worker processes up front so the first measurement doesn't pay for it
+        file_io.get_pdf_process_pool().submit(int).result()
+
+        print(
+            f"process pool workers: {file_io.PDF_PROCESS_POOL_WORKERS}, "
+            f"parallel page threshold: {file_io.PARALLEL_PDF_PAGE_THRESHOLD}"
+        )
+        print(
+            f"{'pdf':<40} {'pages':>6} {'legacy (s)':>11} {'parallel (s)':>13} {'speedup':>8}"
+        )
+        for pdf_path in pdf_paths:
+            with fitz.open(pdf_path) as document:
+                page_count = document.page_count
+
+            legacy_time, legacy_text = time_it(
+                lambda: legacy_load_pdf_content(pdf_path), args.repeat
+            )
+            parallel_time, parallel_text = time_it(
+                lambda: file_io.load_pdf_parallel(pdf_path), args.repeat
+            )
+            if legacy_text != parallel_text:
+                raise Exception(f"The two loaders disagree on {pdf_path}.")
+
+            print(
+                f"{os.path.basename(pdf_path):<40} {page_count:>6} {legacy_time:>11.3f} "
+                f"{parallel_time:>13.3f} {legacy_time / parallel_time:>7.2f}x"
+            )
+
+    file_io.get_pdf_process_pool().shutdown()
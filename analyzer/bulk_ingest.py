@@ -0,0 +1,343 @@
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+    FIRST_COMPLETED,
+)
+from datetime import datetime
+import traceback
+import argparse
+import time
+import json
+import os
+
+import pytz
+
+import extraction_cache
+import clients
+import file_io
+import main
+
+# file types that are analyzed by default (see --extensions)
+DEFAULT_EXTENSIONS = (".pdf", ".docx", ".txt", ".png", ".jpg", ".jpeg", ".tiff")
+# images are described by the vision model, so they're extracted here instead of in the process pool
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tiff")
+
+# how often progress and throughput are logged, in seconds
+PROGRESS_INTERVAL = 10
+
+
+def init_extract_worker():
+    # the files are already extracted side by side, so each worker only gets a
+    # single process for the OCR of scanned PDF pages (instead of one per core)
+    file_io.PDF_PROCESS_POOL_WORKERS = 1
+
+
+def extract_file(file_path: str):
+    """
+    Extracts one file's text. Runs in the worker processes of the ingest.
+    Returns (text, seconds it took).
+    """
+    start_time = time.perf_counter()
+    text = file_io.load_file_content(file_path)
+    return text, time.perf_counter() - start_time
+
+
+def extract_image(file_path: str):
+    """
+    extract_file() for images, whose vision call has to stay within the limits
+    of main.rate_limiter, so it runs in this process (tesseract still runs on
+    file_io's process pool).
+    """
+    start_time = time.perf_counter()
+    text = file_io.load_file_content(
+        file_path,
+        client=clients.get_openai_client(),
+        rate_limiter=main.rate_limiter,
+    )
+    return text, time.perf_counter() - start_time
+
+
+def analyze_text(file_path: str, content_hash: str, text: str, o_config, g_config):
+    """
+    Analyzes an extracted contract the same way a job is analyzed (GAgent,
+    falling back to OAgent). Returns (output, trace steps, seconds it took).
+    """
+    start_time = time.perf_counter()
+    context = {
+        "job": {"id": content_hash, "file_name": os.path.basename(file_path)},
+        "worker_id": f"BULK_INGEST {content_hash[:8]}",
+        "trace_back": {"steps": []},
+        "local_file_path": file_path,
+        "contract_content": text,
+    }
+    main.analyze_job_contract(
+        context, clients.get_openai_client(), o_config=o_config, g_config=g_config
+    )
+    output = dict(context["output"])
+    # the text is already in the archive; the results file only needs the analysis
+    output.pop("contract_content", None)
+    return output, context["trace_back"]["steps"], time.perf_counter() - start_time
+
+
+def load_checkpoint(checkpoint_path: str) -> set:
+    """
+    Returns the content hashes that were already analyzed (one per line).
+    """
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, "r") as file:
+        return {line.strip() for line in file if line.strip()}
+
+
+def list_files(root_dir: str, extensions):
+    """
+    Returns (path, size in bytes) of every file under `root_dir` with one of
+    the given extensions (see file_io.iter_directory()).
+    """
+    files = []
+    for _, file_entries, _ in file_io.iter_directory(root_dir):
+        for entry in file_entries:
+            if entry.name.lower().endswith(extensions):
+                files.append((entry.path, entry.stat().st_size))
+    return files
+
+
+def bulk_ingest(
+    root_dir: str,
+    output_path: str,
+    checkpoint_path: str,
+    extract_workers: int,
+    analyze_workers: int,
+    extensions=DEFAULT_EXTENSIONS,
+    big_model_name: str = main.BIG_MODEL_NAME,
+    small_model_name: str = main.SMALL_MODEL_NAME,
+):
+    """
+    Analyzes every contract under `root_dir` and appends one JSON line per
+    file to `output_path`. Files are extracted by a process pool (images by the
+    analysis threads, see extract_image()) and analyzed by `analyze_workers`
+    threads; at most twice that many files are extracted ahead of the
+    analysis, so memory stays bounded.
+
+    The content hash (MD5, like jobs.file_hash) of every successfully analyzed
+    file is appended to `checkpoint_path`, so a rerun skips those files (and
+    identical copies of them) and retries only the failed or missing ones.
+    """
+    logger = main.logger
+    o_config, g_config = main.make_agent_configs(
+        prices=main.MODEL_PRICES,
+        big_model_name=big_model_name,
+        small_model_name=small_model_name,
+        last_cost_values_set_date=main.LAST_COST_VALUES_SET_DATE,
+    )
+
+    start_time = time.perf_counter()
+    files = list_files(root_dir, tuple(extensions))
+    finished_hashes = load_checkpoint(checkpoint_path)
+    total_bytes = sum(size for _, size in files)
+    logger.info(
+        f"[BULK_INGEST] Found {len(files)} files ({total_bytes / 1024**2:.1f} MB) under {root_dir} "
+        f"in {time.perf_counter() - start_time:.1f}s; {len(finished_hashes)} content hashes are already done."
+    )
+
+    counts = {"completed": 0, "failed": 0, "skipped": 0}
+    processed_bytes = 0
+    in_flight_hashes = set()
+    max_in_flight = analyze_workers * 2
+    # future -> the file it works on: {"step", "path", "size", "content_hash", ...}
+    pending = {}
+    next_file = 0
+    last_progress_time = time.perf_counter()
+
+    extract_pool = ProcessPoolExecutor(
+        max_workers=extract_workers,
+        mp_context=file_io.get_process_context(),
+        initializer=init_extract_worker,
+    )
+    analyze_pool = ThreadPoolExecutor(max_workers=analyze_workers)
+    with open(output_path, "a", encoding="utf-8") as output_file, open(
+        checkpoint_path, "a"
+    ) as checkpoint_file:
+
+        def write_result(record: dict):
+            record["finished_at"] = str(datetime.now(pytz.utc))
+            output_file.write(json.dumps(record, default=str) + "\n")
+            output_file.flush()
+            if record["status"] == "completed":
+                # only written once the result is on disk, so a crash can't lose an analysis
+                checkpoint_file.write(record["content_hash"] + "\n")
+                checkpoint_file.flush()
+                os.fsync(checkpoint_file.fileno())
+
+        def log_progress():
+            elapsed = time.perf_counter() - start_time
+            done = sum(counts.values())
+            rate = counts["completed"] / elapsed * 60 if elapsed else 0
+            logger.info(
+                f"[BULK_INGEST] {done}/{len(files)} files "
+                f"({counts['completed']} completed, {counts['failed']} failed, {counts['skipped']} skipped), "
+                f"{len(pending)} in flight, {rate:.1f} contracts/min, "
+                f"{processed_bytes / 1024**2 / elapsed * 60 if elapsed else 0:.1f} MB/min"
+            )
+
+        try:
+            while next_file < len(files) or pending:
+                # hash and queue files until enough are in flight
+                while next_file < len(files) and len(pending) < max_in_flight:
+                    file_path, size = files[next_file]
+                    next_file += 1
+                    try:
+                        content_hash = extraction_cache.hash_file(file_path)
+                    except OSError as e:
+                        counts["failed"] += 1
+                        write_result(
+                            {
+                                "path": file_path,
+                                "content_hash": None,
+                                "status": "failed",
+                                "error": f"{type(e).__name__}: {e}",
+                            }
+                        )
+                        continue
+                    if (
+                        content_hash in finished_hashes
+                        or content_hash in in_flight_hashes
+                    ):
+                        # already analyzed (or being analyzed) under this or another name
+                        counts["skipped"] += 1
+                        processed_bytes += size
+                        continue
+                    in_flight_hashes.add(content_hash)
+                    if file_path.lower().endswith(IMAGE_EXTENSIONS):
+                        future = analyze_pool.submit(extract_image, file_path)
+                    else:
+                        future = extract_pool.submit(extract_file, file_path)
+                    pending[future] = {
+                        "step": "extract",
+                        "path": file_path,
+                        "size": size,
+                        "content_hash": content_hash,
+                    }
+
+                done, _ = wait(
+                    list(pending),
+                    timeout=PROGRESS_INTERVAL,
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    item = pending.pop(future)
+                    file_path = item["path"]
+                    content_hash = item["content_hash"]
+                    try:
+                        if item["step"] == "extract":
+                            text, extract_seconds = future.result()
+                            analyze_future = analyze_pool.submit(
+                                analyze_text,
+                                file_path,
+                                content_hash,
+                                text,
+                                o_config,
+                                g_config,
+                            )
+                            pending[analyze_future] = {
+                                **item,
+                                "step": "analyze",
+                                "extract_seconds": extract_seconds,
+                            }
+                            continue
+
+                        output, steps, analyze_seconds = future.result()
+                        counts["completed"] += 1
+                        finished_hashes.add(content_hash)
+                        write_result(
+                            {
+                                "path": file_path,
+                                "content_hash": content_hash,
+                                "status": "completed",
+                                "extract_seconds": round(item["extract_seconds"], 3),
+                                "analyze_seconds": round(analyze_seconds, 3),
+                                "output": output,
+                                "steps": steps,
+                            }
+                        )
+                    except Exception as e:
+                        counts["failed"] += 1
+                        logger.error(
+                            f"[BULK_INGEST] Failed to {item['step']} {file_path}: {type(e).__name__}: {e}"
+                        )
+                        write_result(
+                            {
+                                "path": file_path,
+                                "content_hash": content_hash,
+                                "status": "failed",
+                                "step": item["step"],
+                                "error": f"{type(e).__name__}: {e}",
+                                "traceback": traceback.format_exc(),
+                            }
+                        )
+                    in_flight_hashes.discard(content_hash)
+                    processed_bytes += item["size"]
+
+                if time.perf_counter() - last_progress_time >= PROGRESS_INTERVAL:
+                    last_progress_time = time.perf_counter()
+                    log_progress()
+        finally:
+            log_progress()
+            analyze_pool.shutdown(wait=False, cancel_futures=True)
+            extract_pool.shutdown(wait=False, cancel_futures=True)
+
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Analyze every contract in a directory (e.g. a customer's archive) and write the results as JSON lines"
+    )
+    parser.add_argument("root_dir", help="directory to walk (recursively)")
+    parser.add_argument(
+        "--output",
+        default="bulk_ingest_results.jsonl",
+        help="JSONL file the results are appended to (default: bulk_ingest_results.jsonl)",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help="file with the content hashes that are done; reruns skip them (default: <output>.checkpoint)",
+    )
+    parser.add_argument(
+        "--extract-workers",
+        type=int,
+        default=os.cpu_count() or 2,
+        help="processes extracting text (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--analyze-workers",
+        type=int,
+        default=8,
+        help="contracts analyzed at the same time (default: 8)",
+    )
+    parser.add_argument(
+        "--extensions",
+        nargs="+",
+        default=list(DEFAULT_EXTENSIONS),
+        help=f"file extensions to analyze (default: {' '.join(DEFAULT_EXTENSIONS)})",
+    )
+    args = parser.parse_args()
+
+    main.rate_limiter.set_limits(main.MODEL_RATE_LIMITS)
+    main.rate_limiter.set_concurrency_limits(main.PROVIDER_CONCURRENCY_LIMITS)
+    clients.configure(**main.HTTP_POOL_SETTINGS)
+    main.setup_node()
+
+    try:
+        counts = bulk_ingest(
+            root_dir=args.root_dir,
+            output_path=args.output,
+            checkpoint_path=args.checkpoint or f"{args.output}.checkpoint",
+            extract_workers=args.extract_workers,
+            analyze_workers=args.analyze_workers,
+            extensions=[extension.lower() for extension in args.extensions],
+        )
+    finally:
+        clients.close_all()
+    main.logger.info(f"[BULK_INGEST] Done: {json.dumps(counts)}")
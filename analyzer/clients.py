@@ -0,0 +1,256 @@
+from typing import TYPE_CHECKING, Callable, Dict, Any
+import threading
+import os
+
+import httpx
+
+# the SDKs are imported when their client is first needed, since importing them
+# (openai and groq especially) takes a good part of a second
+if TYPE_CHECKING:
+    from supabase import Client
+    from openai import OpenAI
+    from groq import Groq
+    import requests
+
+
+class ConnectionStats:
+    """
+    Counts requests and newly opened connections per host through httpcore's
+    "trace" request extension, so it is possible to see how often the pool
+    actually reuses a keep-alive (or multiplexed HTTP/2) connection.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def tracer(self, host: str):
+        """
+        Returns the trace callback for one request to `host`.
+        """
+
+        def trace(event_name: str, info: Dict[str, Any]):
+            if event_name == "connection.connect_tcp.complete":
+                self._count(host, "new_connections")
+            elif event_name == "connection.start_tls.complete":
+                self._count(host, "tls_handshakes")
+            elif event_name == "http11.send_request_headers.started":
+                self._count(host, "requests")
+            elif event_name == "http2.send_request_headers.started":
+                self._count(host, "requests")
+                self._count(host, "http2_requests")
+
+        return trace
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns per host counters, including how many requests went over an
+        already open connection.
+        """
+        with self._lock:
+            output = {}
+            for host, counters in self._hosts.items():
+                entry = dict(counters)
+                entry["reused_connections"] = max(
+                    0, entry["requests"] - entry["new_connections"]
+                )
+                entry["reuse_ratio"] = (
+                    round(entry["reused_connections"] / entry["requests"], 3)
+                    if entry["requests"]
+                    else 0.0
+                )
+                output[host] = entry
+            return output
+
+    def _count(self, host: str, counter: str):
+        with self._lock:
+            counters = self._hosts.setdefault(
+                host,
+                {
+                    "requests": 0,
+                    "http2_requests": 0,
+                    "new_connections": 0,
+                    "tls_handshakes": 0,
+                },
+            )
+            counters[counter] += 1
+
+
+# limits of the shared connection pool; change them with configure() before the first client is created
+POOL_SETTINGS = {
+    "max_connections": 200,
+    "max_keepalive_connections": 50,
+    "keepalive_expiry": 60,
+    "http2": True,
+}
+
+connection_stats = ConnectionStats()
+_clients = {}
+# reentrant, since creating the LLM clients creates the shared http client too
+_clients_lock = threading.RLock()
+
+
+def configure(**settings):
+    """
+    Updates POOL_SETTINGS (max_connections, max_keepalive_connections,
+    keepalive_expiry, http2). Clients that already exist keep their old limits.
+    """
+    unknown = set(settings) - set(POOL_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown HTTP pool settings: {sorted(unknown)}")
+    POOL_SETTINGS.update(settings)
+
+
+def _attach_tracer(request: httpx.Request):
+    request.extensions["trace"] = connection_stats.tracer(request.url.host)
+
+
+def make_http_client(**settings) -> httpx.Client:
+    """
+    Creates an httpx.Client with a keep-alive (HTTP/2 when available)
+    connection pool that reports to `connection_stats`.
+    Any POOL_SETTINGS value can be overridden through `settings`.
+    """
+    pool_settings = {**POOL_SETTINGS, **settings}
+    return httpx.Client(
+        http2=pool_settings["http2"],
+        limits=httpx.Limits(
+            max_connections=pool_settings["max_connections"],
+            max_keepalive_connections=pool_settings["max_keepalive_connections"],
+            keepalive_expiry=pool_settings["keepalive_expiry"],
+        ),
+        event_hooks={"request": [_attach_tracer]},
+    )
+
+
+def _get_or_create(name: str, factory):
+    client = _clients.get(name)
+    if client is not None:
+        return client
+    with _clients_lock:
+        if name not in _clients:
+            _clients[name] = factory()
+        return _clients[name]
+
+
+def get_http_client() -> httpx.Client:
+    """
+    Returns the process wide httpx.Client shared by the LLM clients and downloads.
+    """
+    return _get_or_create("http", make_http_client)
+
+
+def get_openai_client() -> "OpenAI":
+    """
+    Returns the process wide (thread-safe) OpenAI client.
+    """
+
+    def make_client():
+        from openai import OpenAI
+
+        return OpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"), http_client=get_http_client()
+        )
+
+    return _get_or_create("openai", make_client)
+
+
+def get_groq_client() -> "Groq":
+    """
+    Returns the process wide (thread-safe) Groq client.
+    """
+
+    def make_client():
+        from groq import Groq
+
+        return Groq(api_key=os.getenv("GROQ_API_KEY"), http_client=get_http_client())
+
+    return _get_or_create("groq", make_client)
+
+
+def get_supabase_client() -> "Client":
+    """
+    Returns the process wide Supabase client (public schema).
+    """
+
+    def make_client():
+        from supabase import create_client
+
+        return create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+
+    return _get_or_create("supabase", make_client)
+
+
+def get_supabase_auth_client() -> "Client":
+    """
+    Returns the process wide Supabase client of the next_auth schema.
+    """
+
+    def make_client():
+        from supabase.lib.client_options import ClientOptions
+        from supabase import create_client
+
+        return create_client(
+            supabase_url=os.getenv("SUPABASE_URL"),
+            supabase_key=os.getenv("SUPABASE_SERVICE"),
+            # NOTE: (1-25-2025) Supabase's python SDK is dumb and requires you to setup a new client for a different schema
+            options=ClientOptions(schema="next_auth"),
+        )
+
+    return _get_or_create("supabase_auth", make_client)
+
+
+class LazyClient:
+    """
+    Stands in for the client returned by `factory` (e.g. get_supabase_client)
+    and only calls it when the client is first used, so a module can keep a
+    global client without creating it (and importing its SDK) on import.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+
+    def __getattr__(self, name: str):
+        return getattr(self._factory(), name)
+
+
+def get_alert_session() -> "requests.Session":
+    """
+    Returns the requests.Session used for alert webhooks, which retries failed
+    POSTs and keeps its connection open between alerts.
+    """
+
+    def make_session():
+        from requests.packages.urllib3.util.retry import Retry
+        from requests.adapters import HTTPAdapter
+        import requests
+
+        retry_strategy = Retry(
+            total=3,
+            status_forcelist=list(range(400, 600)),
+            allowed_methods=["POST"],
+            backoff_factor=1,
+        )
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(max_retries=retry_strategy))
+        return session
+
+    return _get_or_create("alerts", make_session)
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Returns the connection reuse counters of the shared pool, per host.
+    """
+    return connection_stats.stats()
+
+
+def close_all():
+    """
+    Closes every shared client (e.g. when the daemon shuts down).
+    """
+    with _clients_lock:
+        for name in ("openai", "groq", "http", "alerts"):
+            client = _clients.pop(name, None)
+            if client is not None:
+                client.close()
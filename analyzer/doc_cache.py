@@ -0,0 +1,195 @@
+from typing import Callable, Dict, Any
+from collections import OrderedDict
+import threading
+import os
+
+
+class DocumentCache:
+    """
+    Content-addressed on-disk cache of the documents the analyzer works on.
+
+    Files are stored as `<root_dir>/<key[:2]>/<key><suffix>`, where the key is
+    the document's content hash (jobs.file_hash), so a retry or re-analysis of
+    the same document never downloads it twice no matter what it's called in
+    the bucket. Once the stored files exceed `max_bytes`, the least recently
+    used ones are removed. Files that a worker is still using (see acquire()
+    and release()) are never removed.
+    """
+
+    def __init__(self, root_dir: str, max_bytes: int = 2 * 1024**3):
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (path, size), least recently used first
+        self._total_bytes = 0
+        self._pins = {}  # key -> number of workers using the file
+        self._key_locks = {}  # key -> lock held while the file is being fetched
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "fetch_failures": 0}
+
+        os.makedirs(self.root_dir, exist_ok=True)
+        self._load_index()
+
+    def path_for(self, key: str, suffix: str = "") -> str:
+        """
+        Returns where the file of `key` is (or would be) stored.
+        """
+        return os.path.join(self.root_dir, key[:2], f"{key}{suffix}")
+
+    def acquire(self, key: str, fetch: Callable[[str], None], suffix: str = "") -> str:
+        """
+        Returns the local path of the document with content hash `key`, calling
+        `fetch(destination_path)` to download it first on a cache miss. `fetch`
+        must only create destination_path once the file is complete.
+
+        Concurrent calls for the same key wait for a single fetch. The returned
+        file is pinned (it can't be evicted) until release(key) is called.
+        """
+        with self._lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        try:
+            with key_lock:
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None and os.path.exists(entry[0]):
+                        self._entries.move_to_end(key)
+                        self._stats["hits"] += 1
+                        path = entry[0]
+                    else:
+                        if entry is not None:
+                            # removed from disk behind our back
+                            self._forget(key)
+                        self._stats["misses"] += 1
+                        path = None
+
+                if path is not None:
+                    self._touch(path)
+                    return path
+
+                path = self.path_for(key, suffix)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                try:
+                    fetch(path)
+                except Exception:
+                    with self._lock:
+                        self._stats["fetch_failures"] += 1
+                    raise
+                if not os.path.exists(path):
+                    with self._lock:
+                        self._stats["fetch_failures"] += 1
+                    raise Exception(f"Fetching '{key}' did not create {path}.")
+
+                with self._lock:
+                    size = os.path.getsize(path)
+                    self._entries[key] = (path, size)
+                    self._total_bytes += size
+                    self._evict()
+                return path
+        except Exception:
+            self.release(key)
+            raise
+
+    def release(self, key: str):
+        """
+        Unpins a file returned by acquire(); it may be evicted afterwards.
+        """
+        with self._lock:
+            pins = self._pins.get(key, 0) - 1
+            if pins > 0:
+                self._pins[key] = pins
+            else:
+                self._pins.pop(key, None)
+                self._key_locks.pop(key, None)
+            self._evict()
+
+    def cleanup(self):
+        """
+        Removes leftover partial downloads and enforces the byte budget.
+        """
+        with self._lock:
+            tracked = {path for path, _ in self._entries.values()}
+            for dir_path, _, file_names in os.walk(self.root_dir):
+                for file_name in file_names:
+                    file_path = os.path.join(dir_path, file_name)
+                    if file_path.endswith(".part") and not self._pins:
+                        try:
+                            os.remove(file_path)
+                        except FileNotFoundError:
+                            pass
+                    elif file_path not in tracked and not file_path.endswith(".part"):
+                        # e.g. put there by another process; it becomes the oldest entry
+                        self._add_existing_file(file_path, last=False)
+            self._evict()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the hit/miss/eviction counters and the current disk use.
+        """
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "pinned": len(self._pins),
+            }
+
+    def _load_index(self):
+        files = []
+        for dir_path, _, file_names in os.walk(self.root_dir):
+            for file_name in file_names:
+                file_path = os.path.join(dir_path, file_name)
+                if not file_path.endswith(".part"):
+                    try:
+                        files.append((os.path.getmtime(file_path), file_path))
+                    except FileNotFoundError:
+                        # removed (e.g. evicted by another process) while scanning
+                        pass
+
+        # least recently used (oldest mtime, see _touch()) first
+        with self._lock:
+            for _, file_path in sorted(files):
+                self._add_existing_file(file_path)
+            self._evict()
+
+    def _add_existing_file(self, file_path: str, last: bool = True):
+        key = os.path.basename(file_path).split(".")[0]
+        if key in self._entries:
+            return
+        try:
+            size = os.path.getsize(file_path)
+        except FileNotFoundError:
+            return
+        self._entries[key] = (file_path, size)
+        self._entries.move_to_end(key, last=last)
+        self._total_bytes += size
+
+    def _touch(self, path: str):
+        # the mtime doubles as the "last used" time when the index is rebuilt on startup
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _forget(self, key: str):
+        _, size = self._entries.pop(key)
+        self._total_bytes -= size
+
+    def _evict(self):
+        # NOTE: called with self._lock held
+        if self._total_bytes <= self.max_bytes:
+            return
+        for key in list(self._entries):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if key in self._pins:
+                continue
+            path, _ = self._entries[key]
+            self._forget(key)
+            self._stats["evictions"] += 1
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,185 @@
+from typing import Any, Dict, Optional
+import threading
+import hashlib
+import logging
+import os
+
+from doc_cache import DocumentCache
+import file_io
+
+
+class ExtractionCache:
+    """
+    Persistent cache of extracted document text (the output of
+    file_io.load_file_content()), keyed by the document's content hash (MD5,
+    the same hash as jobs.file_hash) and file_io.EXTRACTOR_VERSION, so a retry
+    or re-analysis never parses, OCRs or describes (vision) the same bytes twice.
+
+    Texts are stored on local disk within a byte budget (least recently used
+    first out, see doc_cache.DocumentCache). If a Supabase client is given, the
+    texts are also shared through the `table_name` table (see
+    database/setup.sql), so other analyzer nodes can reuse them; failures of
+    that table are logged and otherwise ignored.
+
+    Texts that could only be extracted in part (e.g. scans while tesseract
+    wasn't available, see file_io.load_file_content()'s `problems`) are
+    returned but never stored, so they're extracted again once OCR works.
+    """
+
+    def __init__(
+        self,
+        root_dir: str,
+        max_bytes: int = 512 * 1024**2,
+        supabase_client=None,
+        table_name: str = "extractions",
+        version: str = file_io.EXTRACTOR_VERSION,
+        logger: Optional[logging.Logger] = None,
+    ):
+        self.files = DocumentCache(root_dir, max_bytes=max_bytes)
+        self.supabase_client = supabase_client
+        self.table_name = table_name
+        self.version = version
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._stats = {
+            "extractions": 0,
+            "partial_extractions": 0,
+            "remote_hits": 0,
+            "remote_failures": 0,
+        }
+
+    def load(
+        self,
+        file_path: str,
+        client=None,
+        data=None,
+        content_hash: Optional[str] = None,
+        rate_limiter=None,
+    ) -> Any:
+        """
+        Drop-in replacement for file_io.load_file_content() that returns the
+        cached text when the same content was extracted before. `content_hash`
+        (MD5 hex digest of the file) is computed when not given.
+        """
+        if file_path.lower().endswith(".json"):
+            # parsed into a dict, not text, and cheap to load anyway
+            return file_io.load_file_content(
+                file_path, client=client, data=data, rate_limiter=rate_limiter
+            )
+
+        if content_hash is None:
+            content_hash = hash_file(file_path, data=data)
+        content_hash = content_hash.lower()
+        # (no dots, DocumentCache reads the key back from the file name)
+        key = f"{content_hash}-v{self.version}".replace(".", "_")
+
+        def extract(destination_path):
+            text = self._get_remote(content_hash)
+            if text is None:
+                problems = []
+                text = file_io.load_file_content(
+                    file_path,
+                    client=client,
+                    data=data,
+                    rate_limiter=rate_limiter,
+                    problems=problems,
+                )
+                with self._lock:
+                    self._stats["extractions"] += 1
+                if problems:
+                    with self._lock:
+                        self._stats["partial_extractions"] += 1
+                    self.logger.warning(
+                        f"[EXTRACTION_CACHE] Not caching the partial text of {content_hash}: {'; '.join(problems)}"
+                    )
+                    raise _PartialExtraction(text)
+                self._put_remote(content_hash, text)
+            else:
+                with self._lock:
+                    self._stats["remote_hits"] += 1
+
+            temp_path = f"{destination_path}.{os.getpid()}.{threading.get_ident()}.part"
+            with open(temp_path, "w", encoding="utf-8", newline="") as file:
+                file.write(text)
+            os.replace(temp_path, destination_path)
+
+        try:
+            cached_path = self.files.acquire(key, extract, suffix=".txt")
+        except _PartialExtraction as e:
+            return e.text
+        try:
+            with open(cached_path, "r", encoding="utf-8", newline="") as file:
+                return file.read()
+        finally:
+            self.files.release(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the disk cache's counters plus how many documents were actually
+        extracted and how many came from the Supabase table.
+        """
+        with self._lock:
+            return {**self.files.stats(), **self._stats}
+
+    def _get_remote(self, content_hash: str) -> Optional[str]:
+        if self.supabase_client is None:
+            return None
+        try:
+            response = (
+                self.supabase_client.table(self.table_name)
+                .select("content")
+                .eq("content_hash", content_hash)
+                .eq("extractor_version", self.version)
+                .limit(1)
+                .execute()
+            )
+            if response.data:
+                return response.data[0]["content"]
+        except Exception as e:
+            with self._lock:
+                self._stats["remote_failures"] += 1
+            self.logger.warning(
+                f"[EXTRACTION_CACHE] Failed to read {content_hash}: {e}"
+            )
+        return None
+
+    def _put_remote(self, content_hash: str, text: str):
+        if self.supabase_client is None:
+            return
+        try:
+            self.supabase_client.table(self.table_name).upsert(
+                {
+                    "content_hash": content_hash,
+                    "extractor_version": self.version,
+                    "content": text,
+                }
+            ).execute()
+        except Exception as e:
+            with self._lock:
+                self._stats["remote_failures"] += 1
+            self.logger.warning(
+                f"[EXTRACTION_CACHE] Failed to store {content_hash}: {e}"
+            )
+
+
+class _PartialExtraction(Exception):
+    # raised out of the disk cache's fetch so the partial text isn't stored
+    def __init__(self, text: str):
+        super().__init__("partial extraction")
+        self.text = text
+
+
+def hash_file(file_path: str, data=None, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Returns the MD5 hex digest of a file (or of `data`, its bytes).
+    """
+    md5_hash = hashlib.md5()
+    if data is not None:
+        md5_hash.update(data)
+        return md5_hash.hexdigest()
+
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            md5_hash.update(chunk)
+    return md5_hash.hexdigest()
@@ -1,14 +1,69 @@
-from docx import Document
-from PIL import Image
-import pytesseract
-import openpyxl
-import chardet
+import codecs
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import xml.etree.ElementTree as ElementTree
+import multiprocessing
+import contextlib
+import itertools
+import threading
+import zipfile
+import hashlib
 import base64
-import fitz
 import json
+import io
 import re
 import os
 
+from rate_limit import create_chat_completion
+
+# NOTE: the format specific parsers (fitz, openpyxl, PIL, pytesseract, chardet) are imported by the
+# functions that use them, so importing file_io (and main) doesn't pay for formats a run never sees
+
+# bump whenever a loader's output changes, so extraction_cache.ExtractionCache stops serving old text
+EXTRACTOR_VERSION = "4"
+
+# PDFs with at least this many pages are extracted by a process pool (see load_pdf_parallel()),
+# which also runs tesseract for scanned PDF pages and images (one thread per worker, see init_pdf_worker())
+PARALLEL_PDF_PAGE_THRESHOLD = 64
+PDF_PROCESS_POOL_WORKERS = os.cpu_count() or 2
+
+# PDF pages with less text than this (and at least one image) are treated as scans and OCRed
+OCR_MIN_TEXT_CHARS = 25
+OCR_DPI = 300
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "cache", "ocr"
+)
+# byte budget of the OCR cache ("0" disables it), enforced by the analyzer's local_cleanup()
+OCR_CACHE_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_BYTES", 256 * 1024**2))
+
+# the encoding of text files is guessed from (at most) their first ENCODING_SAMPLE_BYTES bytes
+ENCODING_SAMPLE_BYTES = 64 * 1024
+ENCODING_DETECTION_CHUNK_SIZE = 8 * 1024
+
+# optional caps on how much of each spreadsheet sheet is extracted ("0" means no cap)
+XLSX_MAX_ROWS_PER_SHEET = int(os.getenv("XLSX_MAX_ROWS_PER_SHEET") or 0)
+XLSX_MAX_CHARS_PER_SHEET = int(os.getenv("XLSX_MAX_CHARS_PER_SHEET") or 0)
+
+# images are downscaled to at most this many pixels (and re-encoded) before they're sent to a vision model
+IMAGE_MAX_PIXELS = 2048 * 2048
+IMAGE_JPEG_QUALITY = 85
+# frames of a multi-frame image (GIF, TIFF) shown to the vision model; all of them are still OCRed
+IMAGE_MAX_VISION_FRAMES = int(os.getenv("IMAGE_MAX_VISION_FRAMES") or 8)
+
+# WordprocessingML tags read by iter_docx_blocks()
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+_pdf_process_pool = None
+_pdf_process_pool_lock = threading.Lock()
+
+
+def as_bytes(data):
+    # the *_bytes loaders take any bytes-like object, but fitz.open(stream=...) only
+    # takes bytes and io.BytesIO only shares (instead of copying) a bytes buffer,
+    # so anything else is converted once here
+    return data if isinstance(data, bytes) else bytes(data)
+
 
 def load_json(path):
     with open(str(path)) as file:
@@ -16,41 +71,156 @@ def load_json(path):
     return content
 
 
+def load_json_bytes(data):
+    return json.loads(as_bytes(data))
+
+
+def detect_encoding(sample):
+    """
+    Guesses the encoding of text from `sample`, a bounded prefix of it (see
+    ENCODING_SAMPLE_BYTES). Valid UTF-8 (by far the most common case) is
+    recognized without chardet; otherwise chardet's incremental detector is
+    fed chunk by chunk and stopped as soon as it is confident.
+    """
+    sample = memoryview(sample)[:ENCODING_SAMPLE_BYTES]
+    if sample[: len(codecs.BOM_UTF8)] == codecs.BOM_UTF8:
+        return "utf-8-sig"
+    try:
+        # final=False, since the sample may end in the middle of a character
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+
+    import chardet
+
+    detector = chardet.UniversalDetector()
+    for start in range(0, len(sample), ENCODING_DETECTION_CHUNK_SIZE):
+        detector.feed(sample[start : start + ENCODING_DETECTION_CHUNK_SIZE])
+        if detector.done:
+            break
+    encoding = detector.close()["encoding"]
+    # a pure ASCII sample says nothing about the rest of the file, and UTF-8 decodes ASCII the same way
+    if not encoding or encoding.lower() == "ascii":
+        return "utf-8"
+    return encoding
+
+
 def load_text(file_path):
     with open(file_path, "rb") as file:
-        raw_data = file.read()
-        result = chardet.detect(raw_data)
-        encoding = result["encoding"]
+        return load_text_bytes(file.read())
 
-    with open(file_path, "r", encoding=encoding, errors="replace") as file:
-        return file.read()
 
+def load_text_bytes(data):
+    data = as_bytes(data)
+    text = data.decode(detect_encoding(data), errors="replace")
+    # same newline handling as reading the file in text mode
+    return text.replace("\r\n", "\n").replace("\r", "\n")
 
-def load_image(file_path, client, model_name="gpt-4o", prompt=None, text_mode=False):
+
+def load_image(
+    file_path,
+    client,
+    model_name="gpt-4o",
+    prompt=None,
+    text_mode=False,
+    rate_limiter=None,
+    problems=None,
+):
     with open(file_path, "rb") as image_file:
-        base64_image = base64.b64encode(image_file.read()).decode("utf-8")
+        image_data = image_file.read()
+    return load_image_bytes(
+        image_data,
+        client,
+        model_name=model_name,
+        prompt=prompt,
+        text_mode=text_mode,
+        file_name=file_path,
+        rate_limiter=rate_limiter,
+        problems=problems,
+    )
+
 
-    chat_history = [
-        {
-            "role": "user",
-            "content": [
+def load_image_bytes(
+    data,
+    client,
+    model_name="gpt-4o",
+    prompt=None,
+    text_mode=False,
+    file_name="image",
+    rate_limiter=None,
+    problems=None,
+):
+    """
+    Describes an image with a vision model (through the shared `rate_limiter`,
+    if given, see rate_limit.create_chat_completion()) while tesseract OCRs it
+    on the process pool. Of a multi-frame image, every frame is OCRed but only
+    the first IMAGE_MAX_VISION_FRAMES are shown to the model. Frames tesseract
+    couldn't OCR are noted in the `problems` list, if given.
+    """
+    from PIL import Image, ImageSequence
+
+    data = as_bytes(data)
+    image = Image.open(io.BytesIO(data))
+    frame_count = getattr(image, "n_frames", 1)
+    if frame_count > 1:
+        # multi-frame TIFFs/GIFs are handled page by page
+        frames = [
+            frame.copy()
+            for frame in itertools.islice(
+                ImageSequence.Iterator(image), IMAGE_MAX_VISION_FRAMES
+            )
+        ]
+    else:
+        frames = [image]
+
+    with share_bytes(data) as shared:
+        # tesseract runs in the pool's worker processes while the vision model is waited on here
+        pool = get_pdf_process_pool()
+        ocr_futures = [
+            pool.submit(ocr_image_frame, shared, frame_index)
+            for frame_index in range(frame_count)
+        ]
+        try:
+            chat_history = [
                 {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "image_url",
+                            "image_url": {"url": get_vision_image_url(frame, data)},
+                        }
+                        for frame in frames
+                    ],
                 }
-            ],
-        }
-    ]
+            ]
 
-    if isinstance(prompt, str):
-        chat_history.append({"role": "user", "content": prompt})
+            if isinstance(prompt, str):
+                chat_history.append({"role": "user", "content": prompt})
 
-    response = client.chat.completions.create(model=model_name, messages=chat_history)
-    models_response = response.choices[0].message.content
+            response = create_chat_completion(
+                client,
+                "openai",
+                model_name,
+                messages=chat_history,
+                rate_limiter=rate_limiter,
+            )
+            models_response = response.choices[0].message.content
+            # (frames tesseract couldn't OCR are left out, see ocr_image_frame())
+            frame_texts = [future.result() for future in ocr_futures]
+            text = "\n".join(
+                frame_text for frame_text in frame_texts if frame_text is not None
+            )
+        except Exception as e:
+            for future in ocr_futures:
+                future.cancel()
+            if isinstance(e, BrokenProcessPool):
+                discard_process_pool(pool)
+            raise
 
-    image = Image.open(file_path)
-    text = pytesseract.image_to_string(image)
-    text = "\n".join(line for line in text.splitlines() if line.strip())
+    failed_frames = frame_texts.count(None)
+    if failed_frames and problems is not None:
+        problems.append(f"{failed_frames} of {frame_count} image frames were not OCRed")
 
     if text_mode == False:
         return {"response": models_response, "pytesseract": text}
@@ -58,7 +228,7 @@ def load_image(file_path, client, model_name="gpt-4o", prompt=None, text_mode=Fa
         return (
             "The following image was reviewed:\n"
             "```\n"
-            f"{file_path}\n"
+            f"{file_name}\n"
             "```\n\n"
             f"With the following task/prompt provided to the '{model_name}' model:\n"
             "```\n"
@@ -75,42 +245,749 @@ def load_image(file_path, client, model_name="gpt-4o", prompt=None, text_mode=Fa
         )
 
 
+def ocr_image(image):
+    """
+    Returns the non-blank lines tesseract finds on an image (at full resolution).
+    """
+    import pytesseract
+
+    text = pytesseract.image_to_string(image)
+    return "\n".join(line for line in text.splitlines() if line.strip())
+
+
+def ocr_image_frame(shared, frame_index=0):
+    """
+    Returns ocr_image() of one frame of the image whose bytes were shared as
+    (name, size) by share_bytes(), or None if tesseract isn't available or
+    fails on it. Runs in the worker processes of the process pool.
+    """
+    from PIL import Image
+
+    try:
+        image = Image.open(io.BytesIO(read_shared_bytes(shared)))
+        image.seek(frame_index)
+        return ocr_image(image)
+    except Exception:
+        # OCR only adds to the vision model's description, so it may fail; the error also
+        # mustn't reach the pool (pytesseract.TesseractNotFoundError can't be unpickled by
+        # the parent, which would mark the shared pool broken and cancel every other task)
+        return None
+
+
+def get_vision_image_url(image, data=None):
+    """
+    Returns a base64 data URL of the image for a vision model. Images larger
+    than IMAGE_MAX_PIXELS are downscaled (keeping their aspect ratio) and
+    re-encoded as JPEG, since the model doesn't look at more detail than that
+    and the upload (and its tokens) would grow with the resolution. A small
+    enough JPEG/PNG is sent as is when its original bytes are given as `data`.
+    """
+    from PIL import Image, ImageOps
+
+    width, height = image.size
+    if (
+        data is not None
+        and width * height <= IMAGE_MAX_PIXELS
+        and image.format in ("JPEG", "PNG")
+    ):
+        mime_type = Image.MIME[image.format]
+        return f"data:{mime_type};base64,{base64.b64encode(data).decode('utf-8')}"
+
+    # the EXIF orientation of phone photos would be lost when re-encoding
+    image = ImageOps.exif_transpose(image)
+    if width * height > IMAGE_MAX_PIXELS:
+        scale = (IMAGE_MAX_PIXELS / (width * height)) ** 0.5
+        size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+        image = image.resize(size, Image.LANCZOS)
+
+    if image.mode in ("RGBA", "LA") or (
+        image.mode == "P" and "transparency" in image.info
+    ):
+        # JPEG has no alpha channel; transparent areas become white (the paper) instead of black
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+    return (
+        f"data:image/jpeg;base64,{base64.b64encode(output.getvalue()).decode('utf-8')}"
+    )
+
+
 def load_pdf(file_path):
-    document = fitz.open(file_path)
-    text = ""
+    document = open_pdf(file_path)
+    return get_pdf_text(document)
+
+
+def load_pdf_bytes(data):
+    document = open_pdf(data=data)
+    return get_pdf_text(document)
+
+
+def open_pdf(file_path=None, data=None):
+    import fitz
+
+    if data is None:
+        return fitz.open(file_path)
+    return fitz.open(stream=as_bytes(data), filetype="pdf")
+
+
+def get_pdf_text(document):
+    pages = []
     for page_num in range(document.page_count):
         page = document[page_num]
-        text += page.get_text()
+        pages.append(page.get_text())
     document.close()
+    return "".join(pages)
+
+
+def normalize_whitespace(text):
+    """
+    Collapses runs of blank lines into a single empty line.
+    """
+    text = re.sub(r"\n\s+\n", "\n\n", text)
+    text = re.sub(r"\n{2,}", "\n\n", text)
     return text
 
 
+def join_normalized_pages(pages):
+    """
+    Joins page texts that went through normalize_whitespace() one by one into
+    the same text as normalize_whitespace("".join(pages)) would give, by
+    normalizing only the whitespace where two pages meet.
+    """
+    parts = []
+    carry = ""
+    for text in pages:
+        stripped = text.rstrip()
+        if not stripped:
+            # blank page; its whitespace joins the boundary with the next page
+            carry += text
+            continue
+        body = stripped.lstrip()
+        parts.append(
+            normalize_whitespace(carry + stripped[: len(stripped) - len(body)])
+        )
+        parts.append(body)
+        carry = text[len(stripped) :]
+    parts.append(normalize_whitespace(carry))
+    return "".join(parts)
+
+
+def page_needs_ocr(page, text):
+    """
+    True if a PDF page looks scanned: (almost) no text layer, but an image.
+    """
+    return len(text.strip()) < OCR_MIN_TEXT_CHARS and len(page.get_images()) > 0
+
+
+def ocr_pdf_page(page):
+    """
+    Rasterizes a PDF page and returns the text tesseract finds on it, or None if
+    tesseract isn't available. Results are cached on disk by the hash of the
+    rendered page, so the same scan is never OCRed twice; the cache is only an
+    optimization, so a cache that can't be read or written is skipped.
+    """
+    from PIL import Image
+    import pytesseract
+
+    pixmap = page.get_pixmap(dpi=OCR_DPI)
+    page_hash = hashlib.sha256(pixmap.samples_mv).hexdigest()
+    cache_path = os.path.join(OCR_CACHE_DIR, page_hash[:2], f"{page_hash}.txt")
+    if OCR_CACHE_MAX_BYTES > 0 and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "r", encoding="utf-8") as file:
+                text = file.read()
+            # the mtime is the page's "last used" time for the cache's byte budget (see local_cleanup())
+            with contextlib.suppress(OSError):
+                os.utime(cache_path)
+            return text
+        except OSError:
+            # e.g. evicted in the meantime
+            pass
+
+    try:
+        text = pytesseract.image_to_string(
+            Image.open(io.BytesIO(pixmap.tobytes("png")))
+        )
+    except pytesseract.TesseractNotFoundError:
+        return None
+
+    if OCR_CACHE_MAX_BYTES > 0:
+        temp_path = f"{cache_path}.{os.getpid()}.part"
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as file:
+                file.write(text)
+            os.replace(temp_path, cache_path)
+        except OSError:
+            # e.g. a read-only or full disk
+            with contextlib.suppress(OSError):
+                os.remove(temp_path)
+    return text
+
+
+def extract_pdf_pages(source, page_nums):
+    """
+    Returns the normalized text of the given pages of a PDF given by its path
+    or by the (name, size) of the shared memory block holding its bytes (see
+    share_bytes()), OCRing the pages without a text layer, and the numbers of
+    the pages that needed OCR but tesseract wasn't available for.
+    Runs in the worker processes of load_pdf_parallel().
+    """
+    if isinstance(source, str):
+        document = open_pdf(source)
+    else:
+        document = open_pdf(data=read_shared_bytes(source))
+    try:
+        pages = []
+        not_ocred = []
+        for page_num in page_nums:
+            page = document[page_num]
+            text = page.get_text()
+            if page_needs_ocr(page, text):
+                ocr_text = ocr_pdf_page(page)
+                if ocr_text is None:
+                    not_ocred.append(page_num)
+                text = ocr_text or text
+            pages.append(normalize_whitespace(text))
+        return pages, not_ocred
+    finally:
+        document.close()
+
+
+@contextlib.contextmanager
+def share_bytes(data):
+    """
+    Copies `data` into a shared memory block once and yields its (name, size),
+    which is all a worker process needs to read it (see read_shared_bytes()),
+    instead of pickling the whole file into every task. The block is freed on exit.
+    """
+    from multiprocessing import shared_memory
+
+    block = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    try:
+        block.buf[: len(data)] = data
+        yield (block.name, len(data))
+    finally:
+        block.close()
+        block.unlink()
+
+
+def read_shared_bytes(shared):
+    """
+    Returns a copy of the bytes shared by share_bytes() as (name, size).
+    """
+    from multiprocessing import shared_memory
+
+    name, size = shared
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        return bytes(block.buf[:size])
+    finally:
+        block.close()
+
+
+def init_pdf_worker():
+    # tesseract would otherwise start a thread per core in every worker process (only the
+    # workers' environment is changed; the analyzer's own process never runs tesseract)
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def get_process_context():
+    """
+    Returns the multiprocessing context process pools are started with.
+    Forking a process that runs threads (HTTP clients, workers, ...) can copy
+    held locks into the child, so workers are started from a clean forkserver
+    (spawn where there is none) instead.
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    mp_context = multiprocessing.get_context("forkserver")
+    # (the workers are forked with file_io already imported; they still re-import the
+    # launching script as __mp_main__, so main.py keeps its setup out of import time)
+    mp_context.set_forkserver_preload(["file_io"])
+    return mp_context
+
+
+def get_pdf_process_pool():
+    global _pdf_process_pool
+    with _pdf_process_pool_lock:
+        if _pdf_process_pool is None:
+            _pdf_process_pool = ProcessPoolExecutor(
+                max_workers=PDF_PROCESS_POOL_WORKERS,
+                mp_context=get_process_context(),
+                initializer=init_pdf_worker,
+            )
+        return _pdf_process_pool
+
+
+def discard_process_pool(pool):
+    """
+    Drops a pool that raised BrokenProcessPool (a worker died, e.g. killed for
+    running out of memory while rendering a page for OCR), so the next
+    get_pdf_process_pool() call starts a new one instead of every later task failing.
+    """
+    global _pdf_process_pool
+    with _pdf_process_pool_lock:
+        # (another thread may have replaced it already)
+        if _pdf_process_pool is pool:
+            _pdf_process_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_pdf_tasks(source, page_batches):
+    """
+    Runs extract_pdf_pages(source, batch) for each of `page_batches` on the
+    shared process pool and returns the results in order. If a worker died, the
+    broken pool is replaced (see discard_process_pool()) and the batches are
+    tried once more.
+    """
+    for attempt in range(2):
+        pool = get_pdf_process_pool()
+        try:
+            futures = [
+                pool.submit(extract_pdf_pages, source, batch) for batch in page_batches
+            ]
+            return [future.result() for future in futures]
+        except BrokenProcessPool:
+            discard_process_pool(pool)
+            if attempt == 1:
+                raise
+
+
+def load_pdf_parallel(
+    file_path=None, data=None, page_threshold=PARALLEL_PDF_PAGE_THRESHOLD, problems=None
+):
+    """
+    Extracts a PDF's text with its whitespace normalized (same result as
+    normalize_whitespace(load_pdf(file_path)) for PDFs with a text layer).
+    PDFs with at least `page_threshold` pages are split into page ranges that
+    are extracted side by side by a shared process pool; smaller ones are
+    extracted here. Scanned pages (see page_needs_ocr()) are OCRed by the pool
+    either way. Pass the PDF's bytes as `data` to extract it without touching disk.
+    Scanned pages that couldn't be OCRed are noted in the `problems` list, if given.
+    """
+    if data is not None:
+        data = as_bytes(data)
+    document = open_pdf(file_path, data=data)
+    page_count = document.page_count
+
+    if page_count < page_threshold:
+        # extract the text layer here, but OCR the scanned pages side by side in the pool
+        pages = []
+        ocr_page_nums = []
+        for page_num in range(page_count):
+            page = document[page_num]
+            text = page.get_text()
+            if page_needs_ocr(page, text):
+                ocr_page_nums.append(page_num)
+            pages.append(normalize_whitespace(text))
+        document.close()
+
+        if ocr_page_nums:
+            # one batch per worker so each worker opens the document only once
+            batches = [
+                ocr_page_nums[i::PDF_PROCESS_POOL_WORKERS]
+                for i in range(min(PDF_PROCESS_POOL_WORKERS, len(ocr_page_nums)))
+            ]
+            with pdf_task_source(file_path, data) as source:
+                results = run_pdf_tasks(source, batches)
+            for batch, (texts, _) in zip(batches, results):
+                for page_num, text in zip(batch, texts):
+                    pages[page_num] = text
+            note_pages_not_ocred(results, problems)
+        return join_normalized_pages(pages)
+
+    document.close()
+    # a few ranges per worker so one slow (e.g. image heavy) range doesn't hold up the rest
+    chunk_count = min(page_count, PDF_PROCESS_POOL_WORKERS * 4)
+    chunk_size = -(-page_count // chunk_count)
+    batches = [
+        range(start, min(start + chunk_size, page_count))
+        for start in range(0, page_count, chunk_size)
+    ]
+    with pdf_task_source(file_path, data) as source:
+        results = run_pdf_tasks(source, batches)
+    note_pages_not_ocred(results, problems)
+    return join_normalized_pages(page for texts, _ in results for page in texts)
+
+
+def note_pages_not_ocred(results, problems):
+    not_ocred = sum(len(page_nums) for _, page_nums in results)
+    if not_ocred and problems is not None:
+        problems.append(f"{not_ocred} scanned PDF pages were not OCRed")
+
+
+@contextlib.contextmanager
+def pdf_task_source(file_path=None, data=None):
+    """
+    Yields the `source` extract_pdf_pages() tasks open the PDF from: its path,
+    or for an in-memory PDF its bytes shared once through share_bytes().
+    """
+    if data is None:
+        yield file_path
+    else:
+        with share_bytes(data) as shared:
+            yield shared
+
+
+def iter_pdf_pages(file_path=None, data=None):
+    """
+    Yields the pages of a PDF (given by its path or its bytes) one at a time as
+    {"kind": "page", "index", "offset", "text"}, where offset is where the
+    page starts in load_pdf()'s text. Only one page's text is held at a time.
+    """
+    document = open_pdf(file_path, data=data)
+    try:
+        offset = 0
+        for page_num in range(document.page_count):
+            text = document[page_num].get_text()
+            yield {"kind": "page", "index": page_num, "offset": offset, "text": text}
+            offset += len(text)
+    finally:
+        document.close()
+
+
 def load_docx(file_path):
-    doc = Document(file_path)
-    return "\n".join([paragraph.text for paragraph in doc.paragraphs])
+    return "\n".join(block["text"] for block in iter_docx_blocks(file_path))
+
+
+def load_docx_bytes(data):
+    return "\n".join(block["text"] for block in iter_docx_blocks(data=data))
+
+
+def iter_docx_blocks(file_path=None, data=None):
+    """
+    Yields the content of a DOCX (given by its path or its bytes) in document
+    order as {"kind", "index", "offset", "text"} items, whose texts joined with
+    newlines give load_docx()'s text:
+      - kind "header": the text of a page header ("Header: ...")
+      - kind "paragraph": a paragraph of the body
+      - kind "table_row": a table row, its cells tab separated (the paragraphs of a
+        cell, and the rows of a table nested in it, are joined with spaces)
+      - kind "footer": the text of a page footer ("Footer: ...")
+
+    The XML parts are streamed out of the zip and parsed incrementally, so
+    memory use is bounded by the largest paragraph or table, not the document.
+    """
+    offset = 0
+    counts = {"header": 0, "paragraph": 0, "table_row": 0, "footer": 0}
+
+    def make_item(kind, text):
+        nonlocal offset
+        item = {"kind": kind, "index": counts[kind], "offset": offset, "text": text}
+        counts[kind] += 1
+        offset += len(text) + 1
+        return item
+
+    source = file_path if data is None else io.BytesIO(as_bytes(data))
+    with zipfile.ZipFile(source) as archive:
+
+        def part_names(kind):
+            # word/header1.xml, word/header2.xml, ... (in numeric order)
+            names = [
+                name
+                for name in archive.namelist()
+                if re.fullmatch(rf"word/{kind}\d*\.xml", name)
+            ]
+            return sorted(names, key=lambda name: int(re.sub(r"\D", "", name) or 0))
+
+        def iter_part_text(kind):
+            seen = set()
+            for name in part_names(kind):
+                with archive.open(name) as part:
+                    text = "\n".join(
+                        text for _, text in iter_wordprocessing_blocks(part) if text
+                    )
+                # the same header/footer is often repeated for the first/even pages
+                if text and text not in seen:
+                    seen.add(text)
+                    yield make_item(kind, f"{kind.capitalize()}: {text}")
+
+        yield from iter_part_text("header")
+        with archive.open("word/document.xml") as part:
+            for kind, text in iter_wordprocessing_blocks(part):
+                yield make_item(kind, text)
+        yield from iter_part_text("footer")
+
+
+def iter_wordprocessing_blocks(part):
+    """
+    Incrementally parses a WordprocessingML part (word/document.xml, a header,
+    ...) and yields ("paragraph", text) and ("table_row", text) in document
+    order. Paragraph texts match python-docx's Paragraph.text, except that the
+    runs of tracked insertions, content controls and text boxes are included.
+    """
+    tags = []  # the open elements' tags
+    elements = []  # the open elements, to free the finished ones
+    paragraphs = []  # text pieces of each open paragraph
+    tables = []  # of each open table: the cells (lists of texts) of its current row
+    skip_depth = 0  # > 0 inside mc:Fallback, which repeats the content before it
+
+    for event, element in ElementTree.iterparse(part, events=("start", "end")):
+        tag = element.tag
+        if event == "start":
+            tags.append(tag)
+            elements.append(element)
+            if tag == _MC_FALLBACK:
+                skip_depth += 1
+            elif skip_depth:
+                pass
+            elif tag == f"{_W}p":
+                paragraphs.append([])
+            elif tag == f"{_W}tbl":
+                tables.append(None)
+            elif tag == f"{_W}tr" and tables:
+                tables[-1] = []
+            elif tag == f"{_W}tc" and tables and tables[-1] is not None:
+                tables[-1].append([])
+            continue
+
+        tags.pop()
+        elements.pop()
+        parent_tag = tags[-1] if tags else None
+        if tag == _MC_FALLBACK:
+            skip_depth -= 1
+        elif skip_depth:
+            pass
+        elif paragraphs and parent_tag == f"{_W}r":
+            # the text of a run (see docx.oxml.text.run.CT_R.text)
+            if tag == f"{_W}t":
+                paragraphs[-1].append(element.text or "")
+            elif tag in (f"{_W}tab", f"{_W}ptab"):
+                paragraphs[-1].append("\t")
+            elif tag == f"{_W}br":
+                # page and column breaks have no text
+                if element.get(f"{_W}type", "textWrapping") == "textWrapping":
+                    paragraphs[-1].append("\n")
+            elif tag == f"{_W}cr":
+                paragraphs[-1].append("\n")
+            elif tag == f"{_W}noBreakHyphen":
+                paragraphs[-1].append("-")
+        elif tag == f"{_W}p" and paragraphs:
+            text = "".join(paragraphs.pop())
+            cell = tables[-1][-1] if tables and tables[-1] else None
+            if cell is not None:
+                cell.append(text)
+            else:
+                yield "paragraph", text
+        elif tag == f"{_W}tr" and tables and tables[-1] is not None:
+            row = tables[-1]
+            tables[-1] = None
+            cells = [" ".join(text for text in cell if text) for cell in row]
+            outer_cell = tables[-2][-1] if len(tables) > 1 and tables[-2] else None
+            if outer_cell is not None:
+                # a table nested in a cell becomes part of that cell's text
+                outer_cell.append(" ".join(text for text in cells if text))
+            elif any(cells):
+                yield "table_row", "\t".join(cells)
+        elif tag == f"{_W}tbl" and tables:
+            tables.pop()
+
+        # the element is done; free it (and drop it from its parent) to bound the memory
+        element.clear()
+        if elements and tag in (f"{_W}p", f"{_W}tbl"):
+            elements[-1].remove(element)
+
 
+def open_workbook(source):
+    """
+    Opens a spreadsheet (a path or a file-like object) in openpyxl's read-only
+    mode, which parses the rows lazily as they are iterated instead of
+    building every cell in memory up front. The caller must close() it.
+    """
+    import openpyxl
+
+    return openpyxl.load_workbook(source, read_only=True, data_only=True)
+
+
+def load_xlsx(file_path, max_rows=None, max_chars=None):
+    workbook = open_workbook(file_path)
+    try:
+        return get_workbook_text(workbook, max_rows=max_rows, max_chars=max_chars)
+    finally:
+        workbook.close()
+
+
+def load_xlsx_bytes(data, max_rows=None, max_chars=None):
+    workbook = open_workbook(io.BytesIO(as_bytes(data)))
+    try:
+        return get_workbook_text(workbook, max_rows=max_rows, max_chars=max_chars)
+    finally:
+        workbook.close()
+
+
+def get_workbook_text(workbook, max_rows=None, max_chars=None):
+    text = "".join(
+        item["text"]
+        for item in iter_workbook_rows(workbook, max_rows=max_rows, max_chars=max_chars)
+    )
+    text = text.strip()
+    return text
+
+
+def iter_xlsx_rows(file_path=None, data=None, max_rows=None, max_chars=None):
+    """
+    Yields the sheets and rows of a spreadsheet (given by its path or its
+    bytes) one at a time, see iter_workbook_rows().
+    """
+    source = file_path if data is None else io.BytesIO(as_bytes(data))
+    workbook = open_workbook(source)
+    try:
+        yield from iter_workbook_rows(workbook, max_rows=max_rows, max_chars=max_chars)
+    finally:
+        workbook.close()
+
+
+def iter_workbook_rows(workbook, max_rows=None, max_chars=None):
+    """
+    Yields {"kind", "index", "offset", "text"} items whose texts, joined, give
+    the workbook's text (before the final strip() of load_xlsx()):
+      - kind "sheet": the "Sheet: <title>" line that starts each sheet
+      - kind "row": one non-empty row, tab separated (the item also has a "sheet" key)
+      - kind "blank": stands in for a run of empty rows
+      - kind "truncated": ends a sheet that has more than `max_rows` non-empty
+        rows or `max_chars` characters of rows (XLSX_MAX_ROWS_PER_SHEET and
+        XLSX_MAX_CHARS_PER_SHEET by default, 0 meaning no cap)
+    """
+    max_rows = XLSX_MAX_ROWS_PER_SHEET if max_rows is None else max_rows
+    max_chars = XLSX_MAX_CHARS_PER_SHEET if max_chars is None else max_chars
+    offset = 0
+    counts = {"sheet": 0, "row": 0, "blank": 0, "truncated": 0}
+
+    def make_item(kind, text, **extra):
+        nonlocal offset
+        item = {"kind": kind, "index": counts[kind], "offset": offset, "text": text}
+        item.update(extra)
+        counts[kind] += 1
+        offset += len(text)
+        return item
 
-def load_xlsx(file_path):
-    workbook = openpyxl.load_workbook(file_path, data_only=True)
-    text = ""
     for sheet in workbook:
-        text += f"Sheet: {sheet.title}\n"
+        yield make_item("sheet", f"Sheet: {sheet.title}\n")
         consecutive_empty_rows = 0
+        sheet_rows = 0
+        sheet_chars = 0
         for row in sheet.iter_rows(values_only=True):
-            formatted_row = "\t".join(
-                [str(cell).strip() if cell is not None else "" for cell in row]
-            )
-            if all(cell == "" for cell in formatted_row.split("\t")):
+            cells = [str(cell).strip() if cell is not None else "" for cell in row]
+            if not any(cells):
                 consecutive_empty_rows += 1
-            else:
-                if consecutive_empty_rows > 0:
-                    text += "\t\n"
-                    consecutive_empty_rows = 0
-                text += formatted_row + "\n"
+                continue
+
+            formatted_row = "\t".join(cells) + "\n"
+            if (max_rows and sheet_rows >= max_rows) or (
+                max_chars and sheet_chars + len(formatted_row) > max_chars
+            ):
+                consecutive_empty_rows = 0
+                yield make_item(
+                    "truncated",
+                    f"[... rest of sheet {sheet.title} omitted after {sheet_rows} rows]\n",
+                    sheet=sheet.title,
+                )
+                break
+
+            if consecutive_empty_rows > 0:
+                yield make_item("blank", "\t\n", sheet=sheet.title)
+                consecutive_empty_rows = 0
+            yield make_item("row", formatted_row, sheet=sheet.title)
+            sheet_rows += 1
+            sheet_chars += len(formatted_row)
         if consecutive_empty_rows > 0:
-            text += "\t\n"
-    text = text.strip()
-    return text
+            yield make_item("blank", "\t\n", sheet=sheet.title)
+
+
+def iter_text_lines(file_path=None, data=None):
+    """
+    Yields the lines of a text file (given by its path or its bytes) as
+    {"kind": "line", "index", "offset", "text"}, where offset is where the
+    line starts in load_text()'s text.
+    """
+    if data is None:
+        file = open(file_path, "rb")
+        encoding = detect_encoding(file.read(ENCODING_SAMPLE_BYTES))
+        file.seek(0)
+        lines = io.TextIOWrapper(file, encoding=encoding, errors="replace")
+    else:
+        lines = io.StringIO(load_text_bytes(data))
+
+    with lines:
+        offset = 0
+        for index, text in enumerate(lines):
+            yield {"kind": "line", "index": index, "offset": offset, "text": text}
+            offset += len(text)
+
+
+def iter_file_content(file_path, client=None, data=None, rate_limiter=None):
+    """
+    Streaming counterpart of load_file_content(): yields the file's content
+    piece by piece (PDF pages, DOCX paragraphs/table rows, spreadsheet rows, text
+    lines) as {"kind", "index", "offset", "text"} dicts, so a caller can
+    chunk, hash or count tokens without holding the whole text. Formats that
+    can't be split (images, JSON) are yielded as a single "document" item.
+
+    NOTE: the texts are raw; unlike load_file_content(), PDF whitespace is not normalized.
+    """
+    lower_path = file_path.lower()
+    if lower_path.endswith(".pdf"):
+        yield from iter_pdf_pages(file_path, data=data)
+    elif lower_path.endswith((".doc", ".docx")):
+        yield from iter_docx_blocks(file_path, data=data)
+    elif lower_path.endswith((".xls", ".xlsx", ".ods")):
+        yield from iter_xlsx_rows(file_path, data=data)
+    elif lower_path.endswith(
+        (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tiff", ".json")
+    ):
+        content = load_file_content(
+            file_path, client=client, data=data, rate_limiter=rate_limiter
+        )
+        if not isinstance(content, str):
+            content = json.dumps(content)
+        yield {"kind": "document", "index": 0, "offset": 0, "text": content}
+    else:
+        yield from iter_text_lines(file_path, data=data)
+
+
+def iter_directory(root_dir):
+    """
+    Walks `root_dir` top-down with os.scandir() (no extra stat() call per
+    entry) and yields (dir_path, file_entries, dir_count) for every directory:
+    its non-hidden files as os.DirEntry objects and how many subdirectories it
+    has. Directories that start with an underscore are skipped, and symlinked
+    directories are counted but not followed (like os.walk()).
+    """
+    pending = [root_dir]
+    while pending:
+        dir_path = pending.pop()
+        try:
+            with os.scandir(dir_path) as entries:
+                entries = list(entries)
+        except OSError:
+            # e.g. removed or unreadable (os.walk() skips those too)
+            continue
+
+        file_entries = []
+        sub_dirs = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                if not entry.name.startswith("_"):
+                    sub_dirs.append(entry)
+            elif not entry.name.startswith("."):
+                file_entries.append(entry)
+
+        yield dir_path, file_entries, len(sub_dirs)
+        # reversed, so the subdirectories are popped (visited) in listing order
+        pending.extend(
+            entry.path for entry in reversed(sub_dirs) if not entry.is_symlink()
+        )
 
 
 def get_directory_structure(root_dir):
@@ -118,54 +995,67 @@ def get_directory_structure(root_dir):
     total_files = 0
     total_directories = 0
 
-    for dirpath, dirnames, filenames in os.walk(root_dir):
-        # filter out directories that are './', '../', or start with an underscore
-        dirnames[:] = [
-            d for d in dirnames if not d.startswith("_") and d not in (".", "..")
-        ]
-
-        # create a list of file paths, ignoring hidden files
-        file_paths = [
-            os.path.join(dirpath, filename)
-            for filename in filenames
-            if not filename.startswith(".")
-        ]
-
+    for dir_path, file_entries, dir_count in iter_directory(root_dir):
         # count the number of non-hidden directories
-        total_directories += len(dirnames)
+        total_directories += dir_count
 
         # count the number of non-hidden files
-        total_files += len(file_paths)
+        total_files += len(file_entries)
 
         # only add directories with files that are not hidden
-        if file_paths:
-            directory_structure[dirpath] = file_paths
+        if file_entries:
+            directory_structure[dir_path] = [entry.path for entry in file_entries]
 
     return directory_structure, total_files, total_directories
 
 
-def load_file_content(file_path, client=None):
+def load_file_content(
+    file_path, client=None, data=None, rate_limiter=None, problems=None
+):
+    """
+    Loads the content of `file_path` with the loader that matches its extension.
+    If the file's bytes are passed as `data`, nothing is read from disk and
+    `file_path` is only used for its extension (and as the image's label).
+    Images are described by the vision model within `rate_limiter`'s limits.
+    If a `problems` list is given, a note is appended to it for every part of
+    the file that could only be extracted in part (e.g. without OCR).
+    """
     file_content = None
     if file_path.lower().endswith(".pdf"):
-        file_content = load_pdf(file_path)
-        file_content = re.sub(r"\n\s+\n", "\n\n", file_content)
-        file_content = re.sub(r"\n{2,}", "\n\n", file_content)
+        file_content = load_pdf_parallel(file_path, data=data, problems=problems)
     elif file_path.lower().endswith((".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tiff")):
-        file_content = load_image(
-            file_path=file_path,
+        image_args = dict(
             client=client,
             model_name="gpt-4o",
             prompt="Given the following image, describe it's details/features as much as you can",
             text_mode=True,
+            rate_limiter=rate_limiter,
+            problems=problems,
         )
+        if data is None:
+            file_content = load_image(file_path=file_path, **image_args)
+        else:
+            file_content = load_image_bytes(data, file_name=file_path, **image_args)
     elif file_path.lower().endswith((".doc", ".docx")):
-        file_content = load_docx(file_path)
+        if data is None:
+            file_content = load_docx(file_path)
+        else:
+            file_content = load_docx_bytes(data)
     elif file_path.lower().endswith((".xls", ".xlsx", ".ods")):
-        file_content = load_xlsx(file_path)
+        if data is None:
+            file_content = load_xlsx(file_path)
+        else:
+            file_content = load_xlsx_bytes(data)
     elif file_path.lower().endswith(".json"):
-        file_content = load_json(file_path)
+        if data is None:
+            file_content = load_json(file_path)
+        else:
+            file_content = load_json_bytes(data)
     else:
-        file_content = load_text(file_path)
+        if data is None:
+            file_content = load_text(file_path)
+        else:
+            file_content = load_text_bytes(data)
     return file_content
 
 
@@ -185,10 +1075,15 @@ def get_size_mb(path):
         return os.path.getsize(path) / (1024 * 1024)
 
     total_size = 0
-    for dirpath, dirnames, filenames in os.walk(path):
-        for f in filenames:
-            fp = os.path.join(dirpath, f)
-            if not os.path.islink(fp):
-                total_size += os.path.getsize(fp)
+    pending = [path]
+    while pending:
+        with os.scandir(pending.pop()) as entries:
+            for entry in entries:
+                if entry.is_symlink():
+                    continue
+                if entry.is_dir():
+                    pending.append(entry.path)
+                else:
+                    total_size += entry.stat().st_size
 
     return total_size / (1024 * 1024)
@@ -1,13 +1,18 @@
-from typing import Optional, Dict, Any, List
+from typing import TYPE_CHECKING, Optional, Dict, Any, List
+import threading
 from pydantic import BaseModel, Field
-from openai import OpenAI
-from groq import Groq
 import json
 import time
 import os
 
+from rate_limit import RateLimiter, create_chat_completion
+from extraction_cache import ExtractionCache
 from file_io import load_file_content
 
+if TYPE_CHECKING:
+    from openai import OpenAI
+    from groq import Groq
+
 
 class TokenUsage(BaseModel):
     input: int
@@ -144,17 +149,28 @@ Please provide your analysis in the following JSON structure:
 
     def __init__(
         self,
-        openai_client: Optional[OpenAI],
-        groq_client: Optional[Groq],
+        openai_client: Optional["OpenAI"],
+        groq_client: Optional["Groq"],
         config: GAgentConfig,
+        rate_limiter: Optional[RateLimiter] = None,
+        extraction_cache: Optional[ExtractionCache] = None,
+        cancel_event: Optional[threading.Event] = None,
     ):
         """
         You can pass in one or both clients. The code will determine which one to use
         based on the model name and the config's 'prices' dictionary.
+        An optional rate_limiter (shared between agents) keeps the calls within the
+        providers' requests/tokens per minute limits. An optional extraction_cache
+        is checked before a contract's text is extracted. Once the optional
+        cancel_event is set, no further LLM requests are sent (see
+        rate_limit.RequestCancelled).
         """
         self.openai_client = openai_client
         self.groq_client = groq_client
         self.config = config
+        self.rate_limiter = rate_limiter
+        self.extraction_cache = extraction_cache
+        self.cancel_event = cancel_event
 
     def get_provider_for_model(self, model_name: str) -> str:
         """
@@ -195,9 +211,13 @@ Input Text:
         """.strip()
 
         try:
-            response = client.chat.completions.create(
-                model=self.config.small_model,
+            response = create_chat_completion(
+                client,
+                small_model_provider,
+                self.config.small_model,
                 messages=[{"role": "user", "content": prompt}],
+                rate_limiter=self.rate_limiter,
+                cancel_event=self.cancel_event,
             )
 
             usage_info = getattr(response, "usage", None)
@@ -273,10 +293,20 @@ Document Under Review:
 
         return prompt
 
-    def analyze_contract(self, contract_path: str) -> Dict[str, Any]:
+    def analyze_contract(
+        self, contract_path: str, contract_content: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Analyzes the contract at `contract_path`. If the caller already extracted
+        the contract's text, it can be passed as `contract_content` so the file
+        is not loaded again.
+        """
         start_time = time.time()
 
-        contract_content = load_file_content(contract_path)
+        if contract_content is None and self.extraction_cache is not None:
+            contract_content = self.extraction_cache.load(contract_path)
+        elif contract_content is None:
+            contract_content = load_file_content(contract_path)
         prompt = self.build_prompt(contract_text=contract_content)
 
         # Determine which provider to use for the big_model
@@ -290,9 +320,13 @@ Document Under Review:
 
         try:
             if provider_for_big_model == "openai":
-                response = self.openai_client.chat.completions.create(
-                    model=big_model_name,
+                response = create_chat_completion(
+                    self.openai_client,
+                    "openai",
+                    big_model_name,
                     messages=[{"role": "user", "content": prompt}],
+                    rate_limiter=self.rate_limiter,
+                    cancel_event=self.cancel_event,
                     stream=False,
                 )
                 usage_info = getattr(response, "usage", None)
@@ -305,9 +339,13 @@ Document Under Review:
 
             else:
                 # provider is groq
-                response = self.groq_client.chat.completions.create(
-                    model=big_model_name,
+                response = create_chat_completion(
+                    self.groq_client,
+                    "groq",
+                    big_model_name,
                     messages=[{"role": "user", "content": prompt}],
+                    rate_limiter=self.rate_limiter,
+                    cancel_event=self.cancel_event,
                 )
                 usage_info = getattr(response, "usage", None)
                 if usage_info and hasattr(usage_info, "prompt_tokens"):
@@ -401,12 +439,17 @@ Document Under Review:
 
         return output
 
-    def run(self, contract_path: str) -> Dict[str, Any]:
-        return self.analyze_contract(contract_path)
+    def run(
+        self, contract_path: str, contract_content: Optional[str] = None
+    ) -> Dict[str, Any]:
+        return self.analyze_contract(contract_path, contract_content=contract_content)
 
 
 # NOTE: this code is only used for demonstration/testing.
 if __name__ == "__main__":
+    from openai import OpenAI
+    from groq import Groq
+
     openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
     groq_client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
 
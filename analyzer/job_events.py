@@ -0,0 +1,112 @@
+from typing import Callable, Optional, Dict, Any
+import threading
+import asyncio
+import logging
+
+from realtime import AsyncRealtimeClient, RealtimeSubscribeStates
+
+
+class JobEventListener:
+    """
+    Listens for inserts into public.jobs through Supabase Realtime and calls
+    `on_new_job` with the inserted row for each one. The websocket runs on its
+    own asyncio loop in a background thread, so the (threaded) analyzer only
+    has to hand over a callback, e.g. one that sets a threading.Event.
+
+    NOTE: the jobs table has to be part of the 'supabase_realtime' publication
+    (see database/setup.sql) for any event to be delivered.
+    """
+
+    def __init__(
+        self,
+        supabase_url: str,
+        supabase_key: str,
+        on_new_job: Callable[[Dict[str, Any]], None],
+        logger: Optional[logging.Logger] = None,
+        reconnect_delay: float = 5,
+    ):
+        self.realtime_url = f"{supabase_url.rstrip('/')}/realtime/v1"
+        self.supabase_key = supabase_key
+        self.on_new_job = on_new_job
+        self.logger = logger or logging.getLogger(__name__)
+        self.reconnect_delay = reconnect_delay
+        self.subscribed = False
+
+        self._loop = None
+        self._task = None
+        self._thread = None
+
+    def start(self):
+        """
+        Starts listening in a background (daemon) thread.
+        """
+        self._thread = threading.Thread(
+            target=self._run, name="job-event-listener", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops listening and closes the websocket.
+        """
+        if self._loop is not None and self._task is not None:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.subscribed = False
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._task = self._loop.create_task(self._listen_forever())
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+
+    def _handle_insert(self, payload: Dict[str, Any], ref: Optional[str] = None):
+        record = payload.get("data", {}).get("record") or {}
+        try:
+            self.on_new_job(record)
+        except Exception as e:
+            self.logger.error(f"[JOB_EVENTS] on_new_job callback failed: {e}")
+
+    def _handle_subscribe_state(self, state, error):
+        self.subscribed = state == RealtimeSubscribeStates.SUBSCRIBED
+        if self.subscribed:
+            self.logger.info("[JOB_EVENTS] Subscribed to inserts on public.jobs.")
+        else:
+            self.logger.warning(
+                f"[JOB_EVENTS] Subscription state changed to {state}: {error}"
+            )
+
+    async def _listen_forever(self):
+        while True:
+            client = AsyncRealtimeClient(
+                self.realtime_url, self.supabase_key, auto_reconnect=True
+            )
+            try:
+                await client.connect()
+                channel = client.channel("analyzer-jobs")
+                channel.on_postgres_changes(
+                    "INSERT",
+                    schema="public",
+                    table="jobs",
+                    callback=self._handle_insert,
+                )
+                await channel.subscribe(self._handle_subscribe_state)
+                await client.listen()
+            except asyncio.CancelledError:
+                if client.is_connected:
+                    await client.close()
+                raise
+            except Exception as e:
+                self.logger.error(
+                    f"[JOB_EVENTS] Realtime connection failed: {type(e).__name__}: {e}"
+                )
+
+            # the listen loop only returns once the connection is gone for good
+            self.subscribed = False
+            await asyncio.sleep(self.reconnect_delay)
@@ -0,0 +1,104 @@
+from typing import Callable, Iterable, Optional, List
+import threading
+import logging
+
+
+class JobLeaseKeeper:
+    """
+    Keeps the leases of the jobs this analyzer node is working on from
+    expiring (see claim_jobs() and renew_job_leases() in database/setup.sql).
+    Every `interval` seconds a background thread hands the ids of the held
+    jobs to `renew`, which extends their leases and returns the ids that are
+    still claimed by this node; any other job was taken over by another node
+    and is dropped.
+    """
+
+    def __init__(
+        self,
+        renew: Callable[[List[str]], Iterable[str]],
+        interval: float,
+        logger: Optional[logging.Logger] = None,
+    ):
+        self.renew = renew
+        self.interval = interval
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._job_ids = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def add(self, job_ids: Iterable[str]):
+        """
+        Starts renewing the leases of `job_ids`.
+        """
+        with self._lock:
+            self._job_ids.update(job_ids)
+
+    def discard(self, job_id: str):
+        """
+        Stops renewing the lease of `job_id` (e.g. once the job is finalized).
+        """
+        with self._lock:
+            self._job_ids.discard(job_id)
+
+    def held(self) -> int:
+        """
+        Returns the number of jobs whose leases are being renewed.
+        """
+        with self._lock:
+            return len(self._job_ids)
+
+    def start(self):
+        """
+        Starts renewing in a background (daemon) thread; does nothing if it is already running.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="job-lease-keeper", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops renewing; the leases of the jobs still held then simply expire.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def renew_now(self):
+        """
+        Renews the leases of all held jobs once.
+        """
+        with self._lock:
+            job_ids = list(self._job_ids)
+        if not job_ids:
+            return
+
+        try:
+            renewed = set(self.renew(job_ids))
+        except Exception as e:
+            self.logger.error(
+                f"[JOB_LEASES] Failed to renew the leases of {len(job_ids)} jobs: {e}"
+            )
+            return
+
+        with self._lock:
+            # (jobs that were finalized while renewing are already gone from the set)
+            lost = [
+                job_id
+                for job_id in job_ids
+                if job_id not in renewed and job_id in self._job_ids
+            ]
+            self._job_ids.difference_update(lost)
+        for job_id in lost:
+            self.logger.warning(
+                f"[JOB_LEASES] Job {job_id} is no longer claimed by this node; its result will not be saved."
+            )
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.renew_now()
@@ -1,9 +1,16 @@
 from typing import Union, List
-import resend
 import json
 import os
 
-resend.api_key = os.getenv("RESEND_API_KEY")
+
+def get_resend():
+    """
+    Returns the resend module with its API key set (imported on the first email, not with this module).
+    """
+    import resend
+
+    resend.api_key = os.getenv("RESEND_API_KEY")
+    return resend
 
 
 def send_document_review_email(
@@ -166,6 +173,7 @@ def send_document_review_email(
     if type(recipient_email) == list:
         to_emails = recipient_email
 
+    resend = get_resend()
     params: resend.Emails.SendParams = {
         "from": f"{email_from_name} <{from_email_address}>",
         "to": to_emails,
@@ -336,6 +344,7 @@ def send_personal_doc_analysis_email(
     # ensure 'to' is a list even if a single email is provided
     to_emails = [user_email] if isinstance(user_email, str) else user_email
 
+    resend = get_resend()
     params: resend.Emails.SendParams = {
         "from": f"{email_from_name} <{from_email_address}>",
         "to": to_emails,
@@ -1,9 +1,14 @@
 from datetime import datetime
-from typing import Dict, Any
+from typing import TYPE_CHECKING, Dict, Any
+import functools
+import argparse
 import threading
 import traceback
-import requests
+import hashlib
+import urllib.parse
 import logging
+import signal
+import socket
 import copy
 import time
 import uuid
@@ -12,43 +17,75 @@ import time
 import sys
 import os
 
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from requests.packages.urllib3.util.retry import Retry
-from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import pytz
 
-from supabase.lib.client_options import ClientOptions
-from supabase import create_client, Client
 from dotenv import load_dotenv
-from openai import OpenAI
-from groq import Groq
-
+import httpx
+
+import extraction_cache
+import job_events
+import job_leases
+import doc_cache
+import clients
+import ttl_cache
+import rate_limit
+import pipeline
 import file_io
 import o_agent
 import g_agent
 import mail
 
+if TYPE_CHECKING:
+    from openai import OpenAI
+
 
 # load environment variables which should be in the same directory as this script
 load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
 
-# global variables
-supabase: Client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
-supabase_auth_schema_client: Client = create_client(
-    supabase_url=os.getenv("SUPABASE_URL"),
-    supabase_key=os.getenv("SUPABASE_SERVICE"),
-    # NOTE: (1-25-2025) Supabase's python SDK is dumb and requires you to setup a new client for a different schema
-    options=ClientOptions(schema="next_auth"),
-)
+# global variables (the Supabase clients are only created once they are first used, see clients.py)
+supabase = clients.LazyClient(clients.get_supabase_client)
+supabase_auth_schema_client = clients.LazyClient(clients.get_supabase_auth_client)
 _worker_ids = {}
 
+# shared by every worker so the LLM calls stay within each provider's limits (see set_limits() in __main__);
+# a call that would wait longer than RATE_LIMIT_MAX_WAIT_SECONDS fails instead (e.g. GAgent falls back to OAgent)
+rate_limiter = rate_limit.RateLimiter(
+    max_wait_seconds=float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS") or 120)
+)
+
+# identifies this analyzer node when claiming jobs (see claim_jobs() in database/setup.sql)
+ANALYZER_NODE_ID = (
+    os.getenv("ANALYZER_NODE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+)
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 30 * 60))
+# a failed job is only claimed again once it has been failed for this long, so a job that
+# always fails is retried (and alerted on) every few minutes instead of in a tight loop
+JOB_RETRY_DELAY_SECONDS = int(os.getenv("JOB_RETRY_DELAY_SECONDS", 5 * 60))
+
+# per-stage concurrency limits of the job pipeline (see make_job_pipeline())
+DEFAULT_STAGE_LIMITS = {
+    "download": 16,
+    "extract": os.cpu_count() or 2,
+    "analyze": 128,
+    "persist": 16,
+    "notify": 16,
+}
+
+# next_auth.users rows rarely change, so the senders of recent jobs are cached (see attach_users_to_jobs())
+user_cache = ttl_cache.TTLCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", 10000)),
+    ttl=int(os.getenv("USER_CACHE_TTL_SECONDS", 10 * 60)),
+)
+
 # logging setup - configure overall logger
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 # logging setup - configure log file location
 log_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "analyzer.log")
-file_handler = logging.FileHandler(log_file_path)
+# (delay=True: the file is only opened once something is logged)
+file_handler = logging.FileHandler(log_file_path, delay=True)
 file_handler.setLevel(logging.INFO)
 
 # logging setup - configure logger to also output to console
@@ -63,6 +100,109 @@ logger.addHandler(file_handler)
 logger.addHandler(console_handler)
 
 
+def open_disk_cache(name: str, root_dir: str, create):
+    """
+    Returns create(), or None (the cache is disabled) with a warning if
+    `root_dir` can't be created or written to, e.g. on a read-only filesystem,
+    since the caches are only an optimization.
+    """
+    try:
+        os.makedirs(root_dir, exist_ok=True)
+        if not os.access(root_dir, os.W_OK):
+            raise PermissionError(f"{root_dir} is not writable")
+        return create()
+    except OSError as e:
+        logger.warning(f"[MAIN] The {name} is disabled: {e}")
+        return None
+
+
+# downloaded contracts, keyed by their content hash (jobs.file_hash) and bounded to a byte budget
+# (DOC_CACHE_MAX_BYTES=0 disables it; contracts are then downloaded and extracted in memory only)
+DOC_CACHE_MAX_BYTES = int(os.getenv("DOC_CACHE_MAX_BYTES", 2 * 1024**3))
+DOC_CACHE_DIR = os.getenv("DOC_CACHE_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "cache", "documents"
+)
+
+# extracted contract text, keyed by content hash + extractor version, so retries never re-parse/re-OCR a contract
+# (set EXTRACTION_CACHE_TABLE to also share it between analyzer nodes through Supabase, see database/setup.sql;
+# EXTRACTION_CACHE_MAX_BYTES=0 disables it)
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", 512 * 1024**2))
+EXTRACTION_CACHE_DIR = os.getenv("EXTRACTION_CACHE_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "cache", "extracted_text"
+)
+
+# created by setup_node() instead of at import time: file_io's worker processes re-import this
+# script (as __mp_main__) and must not open the caches (and evict files) of the analyzer itself
+document_cache = None
+contract_text_cache = None
+lease_keeper = None
+
+# signed download URLs are created for every claimed job at once and reused until shortly before they expire
+SIGNED_URL_EXPIRES_IN = 10 * 60
+SIGNED_URL_EXPIRY_MARGIN = 60
+signed_url_cache = ttl_cache.TTLCache(
+    maxsize=10000, ttl=SIGNED_URL_EXPIRES_IN - SIGNED_URL_EXPIRY_MARGIN
+)
+
+# contract downloads are streamed to disk in chunks of this size
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_TIMEOUT = httpx.Timeout(connect=10, read=60, write=60, pool=30)
+
+# only the jobs columns the analyzer actually uses (skips docusign ids, timestamps, etc.)
+JOB_COLUMNS = "id, user_id, bucket_url, file_name, file_hash, recipients, report_id, status, priority, created_at"
+
+# seconds after which a still running GAgent (Groq) analysis gets an OAgent (OpenAI) analysis
+# started next to it, the first valid report winning (unset: OAgent only runs once GAgent failed;
+# jobs.priority jobs always start both right away, see analyze_job_contract())
+ANALYSIS_HEDGE_DELAY_SECONDS = (
+    float(os.getenv("ANALYSIS_HEDGE_DELAY_SECONDS"))
+    if os.getenv("ANALYSIS_HEDGE_DELAY_SECONDS")
+    else None
+)
+
+
+def setup_node():
+    """
+    Creates the disk caches and the lease keeper of this analyzer process;
+    does nothing if they were already created. Called by manager(), daemon()
+    and the other entry points before any job is processed.
+    """
+    global document_cache, contract_text_cache, lease_keeper
+    if lease_keeper is not None:
+        return
+
+    if DOC_CACHE_MAX_BYTES > 0:
+        document_cache = open_disk_cache(
+            "document cache",
+            DOC_CACHE_DIR,
+            lambda: doc_cache.DocumentCache(
+                root_dir=DOC_CACHE_DIR, max_bytes=DOC_CACHE_MAX_BYTES
+            ),
+        )
+
+    if EXTRACTION_CACHE_MAX_BYTES > 0:
+        contract_text_cache = open_disk_cache(
+            "extraction cache",
+            EXTRACTION_CACHE_DIR,
+            lambda: extraction_cache.ExtractionCache(
+                root_dir=EXTRACTION_CACHE_DIR,
+                max_bytes=EXTRACTION_CACHE_MAX_BYTES,
+                supabase_client=(
+                    supabase if os.getenv("EXTRACTION_CACHE_TABLE") else None
+                ),
+                table_name=os.getenv("EXTRACTION_CACHE_TABLE") or "extractions",
+            ),
+        )
+
+    # renews the leases of the claimed jobs while they are in flight, so a job that waits long for a
+    # rate limit or a pipeline stage is never reclaimed by another node (see renew_job_leases())
+    lease_keeper = job_leases.JobLeaseKeeper(
+        renew=lambda job_ids: renew_job_leases(job_ids),
+        interval=max(JOB_LEASE_SECONDS / 3, 1),
+        logger=logger,
+    )
+
+
 def get_worker_id():
     """
     Assigns and returns a unique ID (short, random) for each worker (thread).
@@ -93,16 +233,7 @@ def send_alert(message: str):
     data = {"content": message}
 
     try:
-        retry_strategy = Retry(
-            total=3,
-            status_forcelist=list(range(400, 600)),
-            allowed_methods=["POST"],
-            backoff_factor=1,
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        http = requests.Session()
-        http.mount("https://", adapter)
-
+        http = clients.get_alert_session()
         response = http.post(url, json=data, headers=headers, timeout=5)
         if response.status_code != 204:
             raise Exception(
@@ -138,64 +269,110 @@ def retry_operation(operation_name: str, func, max_retries=3, delay=2, *args, **
 def fail_job(worker_id: str, job_id: str, error_message: str, trace_back: dict):
     """
     Mark a job as failed, log the error in the jobs.errors column, and
-    store the traceback in the reports table if applicable. Also send an alert.
+    store the traceback in the job's report, which is created if the job
+    has none yet (a single finalize_job() call). Also send an alert.
     """
     logger.error(f"[{worker_id}] Failing Job {job_id}: {error_message}")
 
-    # 1. update job to 'failed' with errors
-    combined_errors = {"error_message": error_message}
-    try:
-        response = (
-            supabase.table("jobs")
-            .update({"status": "failed", "errors": combined_errors})
-            .eq("id", job_id)
-            .execute()
+    # 1. update job to 'failed' with errors, and the report's trace_back
+    finalize_result = finalize_job(
+        job_id,
+        "failed",
+        errors={"error_message": error_message},
+        trace_back=trace_back,
+    )
+    if isinstance(finalize_result, dict) and "error" in finalize_result:
+        logger.error(
+            f"[{worker_id}] Failed to update job to 'failed' for job_id {job_id} due to: {finalize_result['error']}"
         )
 
-        if not response.data:
-            logger.error(
-                f"[{worker_id}] No data returned when updating job status to 'failed'."
-            )
+    # 2. send alert to the team
+    try:
+        send_alert(f"Job failed (ID: {job_id}). Reason: {error_message}")
     except Exception as e:
         logger.error(
-            f"[{worker_id}] Failed to update job to 'failed' for job_id {job_id} due to: {e}"
+            f"[{worker_id}] Failed to send alert message for job {job_id}: {e}"
         )
 
-    # 2. if we know the report_id from trace_back, update its trace_back
-    report_id = trace_back.get("report_id")
-    if report_id:
+
+def parse_bucket_url(bucket_url: str):
+    """
+    Splits a Supabase Storage object URL (public or signed, e.g.
+    .../storage/v1/object/sign/contracts/pdfs/<md5>.pdf?token=...) into
+    (bucket_name, file_path).
+    """
+    path_parts = [
+        urllib.parse.unquote(part)
+        for part in urllib.parse.urlparse(bucket_url).path.split("/")
+        if part
+    ]
+    if "object" in path_parts:
+        path_parts = path_parts[path_parts.index("object") + 1 :]
+        if path_parts and path_parts[0] in ("public", "sign", "authenticated"):
+            path_parts = path_parts[1:]
+    else:
+        # not a storage URL; assume ".../<bucket>/<folder>/<file>"
+        path_parts = path_parts[-3:]
+
+    if len(path_parts) < 2:
+        raise ValueError(f"Can't find a bucket and file path in '{bucket_url}'.")
+    return path_parts[0], "/".join(path_parts[1:])
+
+
+def prefetch_signed_urls(jobs: list):
+    """
+    Creates the signed download URLs of all the given jobs' contracts that are
+    not in signed_url_cache yet, with one Storage API call per bucket, so
+    create_signed_url() finds them in the cache.
+    """
+    worker_id = get_worker_id()
+
+    missing_paths = {}
+    for job in jobs:
+        try:
+            bucket_name, file_path = parse_bucket_url(job["bucket_url"])
+        except Exception:
+            # reported by get_contract_pdf() once the job runs
+            continue
+        if signed_url_cache.get((bucket_name, file_path)) is None:
+            missing_paths.setdefault(bucket_name, set()).add(file_path)
+
+    for bucket_name, file_paths in missing_paths.items():
         try:
-            resp = (
-                supabase.table("reports")
-                .update({"trace_back": trace_back})
-                .eq("id", report_id)
-                .execute()
+            response = supabase.storage.from_(bucket_name).create_signed_urls(
+                sorted(file_paths), SIGNED_URL_EXPIRES_IN
             )
-            if not resp.data:
-                logger.error(
-                    f"[{worker_id}] No data returned when updating reports.trace_back for report {report_id}."
-                )
         except Exception as e:
-            logger.error(
-                f"[{worker_id}] Failed to update 'reports.trace_back' for report {report_id}: {e}"
+            # every job simply signs its own URL instead
+            logger.warning(
+                f"[{worker_id}] Failed to batch create {len(file_paths)} signed URLs for bucket [{bucket_name}]: {e}"
             )
+            continue
 
-    # 3. send alert to the team
-    try:
-        send_alert(f"Job failed (ID: {job_id}). Reason: {error_message}")
-    except Exception as e:
-        logger.error(
-            f"[{worker_id}] Failed to send alert message for job {job_id}: {e}"
+        signed_urls = {
+            (bucket_name, item["path"]): item["signedURL"]
+            for item in response
+            if item.get("signedURL") and not item.get("error")
+        }
+        signed_url_cache.set_many(signed_urls)
+        logger.info(
+            f"[{worker_id}] Created {len(signed_urls)} of {len(file_paths)} signed URLs for bucket [{bucket_name}] in one call."
         )
 
 
-def create_signed_url(bucket_name: str, file_path: str, expires_in=60):
+def create_signed_url(
+    bucket_name: str, file_path: str, expires_in=SIGNED_URL_EXPIRES_IN
+):
     """
-    Creates a signed URL from Supabase Storage.
-    This method returns a dict-like object with the "signedURL" key.
+    Creates a signed URL from Supabase Storage, or returns the one in
+    signed_url_cache (see prefetch_signed_urls()) if it's still valid.
     """
 
     worker_id = get_worker_id()
+    cached_url = signed_url_cache.get((bucket_name, file_path))
+    if cached_url is not None:
+        return cached_url
+
     response = supabase.storage.from_(bucket_name).create_signed_url(
         file_path, expires_in
     )
@@ -207,26 +384,86 @@ def create_signed_url(bucket_name: str, file_path: str, expires_in=60):
     # response is typically a dict containing "signedURL" and possibly "error" if there's an error
     if "error" in response and response["error"]:
         raise Exception(f"Error creating signed URL: {response['error']}")
+    if response.get("signedURL"):
+        signed_url_cache.set(
+            (bucket_name, file_path),
+            response["signedURL"],
+            ttl=expires_in - SIGNED_URL_EXPIRY_MARGIN,
+        )
     return response.get("signedURL")
 
 
-def download_bucket_file(bucket_name: str, file_path: str, destination_path: str):
+def download_bucket_file(
+    bucket_name: str,
+    file_path: str,
+    destination_path: str,
+    expected_md5: str = None,
+):
     """
     Downloads a file from Supabase Storage using the generated signed URL.
+    The file is streamed in chunks into a temporary file next to
+    `destination_path` and hashed along the way; only once the whole file is
+    written (and matches `expected_md5`, e.g. jobs.file_hash, if given) is it
+    renamed to `destination_path`, so a partial download never looks complete.
+    """
+    worker_id = get_worker_id()
+    temp_path = f"{destination_path}.{uuid.uuid4().hex[:8]}.part"
+    try:
+        with open(temp_path, "wb") as file:
+            stream_bucket_file(bucket_name, file_path, file.write, expected_md5)
+        os.replace(temp_path, destination_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    logger.info(f"[{worker_id}] Successfully downloaded file to {destination_path}.")
+
+
+def download_bucket_bytes(bucket_name: str, file_path: str, expected_md5: str = None):
+    """
+    Downloads a file from Supabase Storage into memory (never touching disk)
+    and returns its bytes, checked against `expected_md5` if given.
     """
     worker_id = get_worker_id()
+    chunks = []
+    stream_bucket_file(bucket_name, file_path, chunks.append, expected_md5)
+    # one copy into the final buffer; the chunks are dropped right after
+    data = b"".join(chunks)
+
+    logger.info(
+        f"[{worker_id}] Successfully downloaded {len(data)} bytes of [{file_path}] into memory."
+    )
+    return data
+
+
+def stream_bucket_file(
+    bucket_name: str, file_path: str, write, expected_md5: str = None
+):
+    """
+    Streams a file from Supabase Storage (using the generated signed URL) in
+    chunks to `write`, hashing it along the way. Raises an exception if the
+    download fails or doesn't match `expected_md5` (e.g. jobs.file_hash).
+    """
     signed_url = create_signed_url(bucket_name, file_path)
     if not signed_url:
         raise Exception("Failed to generate signed URL.")
-    resp = requests.get(signed_url)
-    if resp.status_code == 200:
-        with open(destination_path, "wb") as file:
-            file.write(resp.content)
-        logger.info(
-            f"[{worker_id}] Successfully downloaded file to {destination_path}."
+
+    md5_hash = hashlib.md5()
+    with clients.get_http_client().stream(
+        "GET", signed_url, timeout=DOWNLOAD_TIMEOUT
+    ) as resp:
+        if resp.status_code != 200:
+            # e.g. an expired or revoked URL; sign a new one on the next attempt
+            signed_url_cache.invalidate((bucket_name, file_path))
+            raise Exception(f"Failed to download file. Status code: {resp.status_code}")
+        for chunk in resp.iter_bytes(chunk_size=DOWNLOAD_CHUNK_SIZE):
+            md5_hash.update(chunk)
+            write(chunk)
+
+    if expected_md5 and md5_hash.hexdigest() != expected_md5.lower():
+        raise Exception(
+            f"Downloaded file does not match its hash (expected {expected_md5}, got {md5_hash.hexdigest()})."
         )
-    else:
-        raise Exception(f"Failed to download file. Status code: {resp.status_code}")
 
 
 def delete_bucket_file(document: dict):
@@ -257,50 +494,129 @@ def delete_bucket_file(document: dict):
         raise Exception("Error: No data returned when deleting document from DB.")
 
 
-def get_jobs_with_users_by_status():
+def attach_users_to_jobs(jobs: list):
     """
-    Fetch jobs with statuses 'queued', 'failed', or 'retrying',
-    and include user information for each job.
+    Looks up the next_auth users that own the given jobs and stores each user
+    under the job's "user" key. Users are served from `user_cache` when
+    possible; the rest are fetched with one query for all of them.
     """
-    global supabase, supabase_auth_schema_client
+    global supabase_auth_schema_client
+
+    user_ids = list({job["user_id"] for job in jobs if "user_id" in job})
+    user_map, missing_user_ids = user_cache.get_many(user_ids)
+
+    if missing_user_ids:
+        user_response = (
+            supabase_auth_schema_client.table("users")
+            .select(
+                "id, name, first_name, last_name, email, emailVerified, created_at, updated_at"
+            )
+            .in_("id", missing_user_ids)
+            .execute()
+        )
+
+        if user_response.data:
+            fetched_users = {u["id"]: u for u in user_response.data}
+            user_cache.set_many(fetched_users)
+            user_map.update(fetched_users)
+
+    if user_map:
+        for job in jobs:
+            job["user"] = user_map.get(job["user_id"])
+    return jobs
+
+
+def claim_jobs_with_users(limit: int):
+    """
+    Atomically claims up to `limit` jobs with statuses 'queued', 'retrying',
+    'failed' (once JOB_RETRY_DELAY_SECONDS have passed since they failed) or
+    'running' with an expired lease for this analyzer node and
+    includes user information for each job. The claimed jobs are moved to
+    'running' by the claim_jobs() database function, so other nodes skip them
+    until the lease expires. If the jobs can't be returned (e.g. their users
+    couldn't be looked up), the claims are released right away.
+
+    NOTE: the caller has to hand the leases of the returned jobs to lease_keeper
+    as it submits them; until then they simply expire after JOB_LEASE_SECONDS.
+    """
+    global supabase
 
     worker_id = get_worker_id()
+    if limit <= 0:
+        return []
+
     try:
         job_response = (
-            supabase.table("jobs")
-            .select("*")
-            .in_("status", ["queued", "failed", "retrying"])
+            supabase.rpc(
+                "claim_jobs",
+                {
+                    "p_worker": ANALYZER_NODE_ID,
+                    "p_limit": limit,
+                    "p_lease_seconds": JOB_LEASE_SECONDS,
+                    "p_retry_delay_seconds": JOB_RETRY_DELAY_SECONDS,
+                },
+            )
+            .select(JOB_COLUMNS)
+            .order("created_at")
             .execute()
         )
 
         if not job_response.data:
             return []
 
-        jobs = job_response.data
-        user_ids = list({job["user_id"] for job in jobs if "user_id" in job})
-
-        if user_ids:
-            user_response = (
-                supabase_auth_schema_client.table("users")
-                .select(
-                    "id, name, first_name, last_name, email, emailVerified, created_at, updated_at"
-                )
-                .in_("id", user_ids)
-                .execute()
-            )
+        logger.info(
+            f"[{worker_id}] Claimed {len(job_response.data)} jobs as node {ANALYZER_NODE_ID}."
+        )
+    except Exception as e:
+        logger.error(f"[{worker_id}] An error occurred while claiming jobs: {e}")
+        return []
 
-            if user_response.data:
-                user_map = {u["id"]: u for u in user_response.data}
-                for job in jobs:
-                    job["user"] = user_map.get(job["user_id"])
-        return jobs
+    try:
+        prefetch_signed_urls(job_response.data)
+        return attach_users_to_jobs(job_response.data)
     except Exception as e:
         logger.error(
-            f"[{worker_id}] An error occurred while fetching jobs and users: {e}"
+            f"[{worker_id}] Releasing {len(job_response.data)} claimed jobs after an error: {e}"
         )
+        release_job_leases([job["id"] for job in job_response.data])
         return []
 
 
+def release_job_leases(job_ids: list):
+    """
+    Gives up this analyzer node's claim on the given jobs through the
+    release_job_leases database function (see database/setup.sql), so they
+    can be claimed again right away instead of once their leases expire.
+    """
+    try:
+        supabase.rpc(
+            "release_job_leases",
+            {"p_worker": ANALYZER_NODE_ID, "p_job_ids": job_ids},
+        ).execute()
+    except Exception as e:
+        logger.error(
+            f"[{get_worker_id()}] Failed to release {len(job_ids)} claimed jobs (they are reclaimed once their leases expire): {e}"
+        )
+
+
+def renew_job_leases(job_ids: list):
+    """
+    Extends the leases of the given jobs through the renew_job_leases database
+    function (see database/setup.sql) and returns the ids of the jobs that are
+    still claimed by this analyzer node. Raises on failure.
+    """
+    response = supabase.rpc(
+        "renew_job_leases",
+        {
+            "p_worker": ANALYZER_NODE_ID,
+            "p_job_ids": job_ids,
+            "p_lease_seconds": JOB_LEASE_SECONDS,
+        },
+    ).execute()
+    # (a SETOF UUID function returns a plain list of ids)
+    return response.data or []
+
+
 def get_specific_job(job_id):
     """
     Fetch the details for a specific job
@@ -333,24 +649,7 @@ def get_all_errored_jobs():
         if not job_response.data:
             return []
 
-        jobs = job_response.data
-        user_ids = list({job["user_id"] for job in jobs if "user_id" in job})
-
-        if user_ids:
-            user_response = (
-                supabase_auth_schema_client.table("users")
-                .select(
-                    "id, name, first_name, last_name, email, emailVerified, created_at, updated_at"
-                )
-                .in_("id", user_ids)
-                .execute()
-            )
-
-            if user_response.data:
-                user_map = {u["id"]: u for u in user_response.data}
-                for job in jobs:
-                    job["user"] = user_map.get(job["user_id"])
-        return jobs
+        return attach_users_to_jobs(job_response.data)
     except Exception as e:
         logger.error(
             f"[{worker_id}] An error occurred with get_all_errored_jobs(): {e}"
@@ -358,19 +657,28 @@ def get_all_errored_jobs():
         return []
 
 
-def get_contract_pdf(file_bucket_url: str, root_destination_dir="."):
+def contract_cache_key(job: dict):
     """
-    Retrieves (downloads) the contract PDF if it's not already present.
-    Uses retry logic for the download.
+    Returns the document_cache key of a job's contract: its content hash
+    (jobs.file_hash), or a hash of its bucket URL for jobs without one.
+    """
+    if job.get("file_hash"):
+        return job["file_hash"].lower()
+    return hashlib.md5(job["bucket_url"].split("?")[0].encode()).hexdigest()
+
+
+def get_contract_pdf(file_bucket_url: str, cache_key: str, expected_md5: str = None):
+    """
+    Retrieves the contract PDF from document_cache, downloading it (with retry
+    logic, and checked against `expected_md5` if given) on a cache miss.
+    Returns the local path of the file, which stays pinned in the cache until
+    document_cache.release(cache_key) is called, or None on failure.
     """
     worker_id = get_worker_id()
     try:
-        url_parts = file_bucket_url.split("/")
-        bucket_name = url_parts[-3]
-        file_path = "/".join(url_parts[-2:])
-        destination_path = os.path.join(root_destination_dir, url_parts[-1])
-        destination_path = destination_path.split("?")[0]
-        if not os.path.exists(destination_path):
+        bucket_name, file_path = parse_bucket_url(file_bucket_url)
+
+        def fetch(destination_path):
             retry_operation(
                 operation_name="download_bucket_file",
                 func=download_bucket_file,
@@ -379,11 +687,38 @@ def get_contract_pdf(file_bucket_url: str, root_destination_dir="."):
                 bucket_name=bucket_name,
                 file_path=file_path,
                 destination_path=destination_path,
+                expected_md5=expected_md5,
             )
-        return True
+
+        return document_cache.acquire(
+            cache_key, fetch, suffix=os.path.splitext(file_path)[1]
+        )
     except Exception as e:
         logger.error(f"[{worker_id}] Failed to get contract PDF: {e}")
-        return False
+        return None
+
+
+def get_contract_bytes(file_bucket_url: str, expected_md5: str = None):
+    """
+    Downloads the contract PDF into memory (with retry logic, and checked
+    against `expected_md5` if given) for when document_cache is disabled.
+    Returns the file's bytes, or None on failure.
+    """
+    worker_id = get_worker_id()
+    try:
+        bucket_name, file_path = parse_bucket_url(file_bucket_url)
+        return retry_operation(
+            operation_name="download_bucket_bytes",
+            func=download_bucket_bytes,
+            max_retries=3,
+            delay=2,
+            bucket_name=bucket_name,
+            file_path=file_path,
+            expected_md5=expected_md5,
+        )
+    except Exception as e:
+        logger.error(f"[{worker_id}] Failed to get contract PDF: {e}")
+        return None
 
 
 def update_jobs_table(job_id: str, updated_values: dict):
@@ -399,6 +734,8 @@ def update_jobs_table(job_id: str, updated_values: dict):
             "send_at",
             "errors",
             "status",
+            "claimed_by",
+            "lease_expires_at",
         ]
         filtered = {
             k: v for k, v in updated_values.items() if k in valid_updatable_columns
@@ -489,299 +826,572 @@ def update_report(report_id: str, updated_values: dict):
         return {"error": err_msg}
 
 
-def process_single_job(
-    worker_id: str,
-    job: dict,
-    openai_client: OpenAI,
+def finalize_job(
+    job_id: str,
+    status: str,
+    errors: dict = None,
+    trace_back: dict = None,
+    final_report: dict = None,
+    contract_content: str = None,
+    send_at: str = None,
+):
+    """
+    Writes the outcome of a job in one transaction through the finalize_job
+    database function (see database/setup.sql): the report's contract_content,
+    final_report and trace_back, and the job's status, errors, send_at and
+    report_id. The job's lease is released as well. Fails if the job is no
+    longer claimed by this analyzer node (its lease expired and another node
+    reclaimed it), so only the node holding a job ever writes its outcome.
+
+    A job without a report gets one when final_report or trace_back is given,
+    so the trace of a failed job is stored as well. A job can only be marked
+    'completed' with a non-empty final_report.
+
+    Returns the report's id (None if the job has no report), or a dict with an
+    "error" key on failure.
+    """
+    worker_id = get_worker_id()
+    try:
+        response = supabase.rpc(
+            "finalize_job",
+            {
+                "p_job_id": job_id,
+                "p_worker": ANALYZER_NODE_ID,
+                "p_status": status,
+                "p_errors": errors or {},
+                "p_trace_back": trace_back,
+                "p_final_report": final_report,
+                "p_contract_content": contract_content,
+                "p_send_at": send_at,
+            },
+        ).execute()
+        lease_keeper.discard(job_id)
+        return response.data
+    except Exception as e:
+        err_msg = f"finalize_job() failed: {str(e)}"
+        logger.error(f"[{worker_id}] {err_msg}")
+        return {"error": err_msg}
+
+
+def new_job_context(worker_id: str, job: dict):
+    """
+    Creates the state that is handed from one processing step of a job to the
+    next (see process_single_job() and make_job_pipeline()).
+    """
+    return {
+        "worker_id": worker_id,
+        "job": job,
+        # traceback logic handler
+        "trace_back": {"job_id": job["id"], "worker_id": worker_id, "steps": []},
+    }
+
+
+def trace_job_step(context: dict, msg: str, data: Any = None):
+    """
+    Logs a processing step and records it in the job's trace_back.
+    """
+    step_info = {
+        "timestamp": str(datetime.now(pytz.utc)),
+        "message": f"[{context['worker_id']}] {msg}",
+    }
+    if data is not None:
+        step_info["data"] = data
+    context["trace_back"]["steps"].append(step_info)
+    logger.info(step_info["message"])
+
+
+def validate_job_recipients(job: dict):
+    """
+    Raises an exception if the job's "recipients" value is not a non-empty list of
+    dictionaries with 'email', 'name', and 'signing_url' as strings.
+    """
+    # Ensure "recipients" value is formatted correctly
+    recipients_formatted_correctly = True
+
+    # Check if the "recipients" key exists and is a list
+    if "recipients" not in job or not isinstance(job.get("recipients"), list):
+        recipients_formatted_correctly = False
+    elif len(job.get("recipients")) == 0:
+        recipients_formatted_correctly = False
+    # Iterate over each recipient to check their structure
+    for recipient in job.get("recipients") or []:
+        if not isinstance(recipient, dict):
+            recipients_formatted_correctly = False
+            break
+        # Ensure each recipient has all required keys and they are strings
+        if not all(key in recipient for key in ["email", "name", "signing_url"]):
+            recipients_formatted_correctly = False
+            break
+        if not (
+            isinstance(recipient.get("email"), str)
+            and isinstance(recipient.get("name"), str)
+            and isinstance(recipient.get("signing_url"), str)
+        ):
+            recipients_formatted_correctly = False
+            break
+
+    # Raise an exception if the formatting is incorrect
+    if not recipients_formatted_correctly:
+        raise Exception(
+            "recipients in job is NOT formatted correctly; it must be a list of dictionaries with 'email', 'name', and 'signing_url' as strings"
+        )
+
+
+def make_agent_configs(
     prices: dict,
     big_model_name: str,
     small_model_name: str,
-    sender_email_address: str,
     last_cost_values_set_date: str,
 ):
     """
-    Processes a single job from 'queued_jobs' in a production-ready manner.
-    - Creates/fetches a report
-    - Downloads contract PDF
-    - Runs analysis via o_agent
-    - Updates the report
-    - Sends emails
-    - Marks the job 'completed'
-    On error, fails the job with a stored traceback and alert.
+    Returns the (OAgentConfig, GAgentConfig) pair used to analyze every job.
     """
-    job_id = job["id"]
+    # create config for OAgent
+    o_config = o_agent.OAgentConfig(
+        big_model=big_model_name,
+        small_model=small_model_name,
+        document_type="UNKNOWN",
+        specific_concerns="UNKNOWN",
+        last_cost_values_set_date=last_cost_values_set_date,
+        prices=prices,
+    )
 
-    # traceback logic handler
-    trace_back = {"job_id": job_id, "worker_id": worker_id, "steps": []}
+    # TODO: (3-10-2025) this sucks, but this works.....
+    g_config = g_agent.GAgentConfig(
+        big_model="deepseek-r1-distill-llama-70b",
+        small_model=small_model_name,
+        document_type="UNKNOWN",
+        specific_concerns="UNKNOWN",
+        last_cost_values_set_date="March 10, 2025",
+        prices={
+            "openai": {
+                "gpt-4o": {"input": 2.5, "output": 10},
+                "gpt-4o-mini": {"input": 0.15, "output": 0.6},
+                "o1": {"input": 15, "output": 60},
+                "o1-preview": {"input": 15, "output": 60},
+                "o1-mini": {"input": 3, "output": 12},
+            },
+            "groq": {"deepseek-r1-distill-llama-70b": {"input": 0.75, "output": 0.99}},
+        },
+    )
 
-    def _trace(msg: str, data: Any = None):
-        step_info = {
-            "timestamp": str(datetime.now(pytz.utc)),
-            "message": f"[{worker_id}] {msg}",
-        }
-        if data is not None:
-            step_info["data"] = data
-        trace_back["steps"].append(step_info)
-        logger.info(step_info["message"])
+    return o_config, g_config
 
-    try:
-        _trace(f"Beginning processing for job {job_id}.")
 
-        # create or fetch a report record
-        _trace("Creating or fetching report for this job.")
-        new_report_entry = create_report(
-            job.get("report_id"),  # NOTE: this value might be None
-            {"version": "0.0.0", "status": "queued"},
-        )
-        if isinstance(new_report_entry, dict) and "error" in new_report_entry:
-            raise Exception(
-                f"Unable to create/fetch report: {new_report_entry['error']}"
-            )
+def download_job_contract(context: dict):
+    """
+    Job step 1: downloads the contract PDF.
+    """
+    job = context["job"]
 
-        report_id = new_report_entry["id"]
-        trace_back["report_id"] = report_id
+    _trace = functools.partial(trace_job_step, context)
+    _trace(f"Beginning processing for job {job['id']}.")
 
-        # download contract PDF
-        _trace("Downloading contract PDF if not present.")
-        pdfs_directory = os.path.join(
-            os.path.dirname(os.path.abspath(__file__)), "pdfs"
-        )
-        os.makedirs(pdfs_directory, exist_ok=True)
+    # recipients are only needed at the very end, but there is no point in paying
+    # for a download and an analysis if we can't email anyone afterwards
+    validate_job_recipients(job)
 
-        got_pdf = get_contract_pdf(job["bucket_url"], pdfs_directory)
-        if not got_pdf:
+    if document_cache is None:
+        _trace("Downloading contract PDF into memory.")
+        contract_bytes = get_contract_bytes(
+            job["bucket_url"], expected_md5=job.get("file_hash")
+        )
+        if contract_bytes is None:
             raise Exception("Failed to retrieve contract PDF.")
 
-        local_file_path = os.path.join(pdfs_directory, job["file_name"])
-        if not os.path.exists(local_file_path):
-            raise Exception("Contract PDF still does not exist locally after download.")
+        # the path is only used for its extension by the extraction step
+        context["contract_bytes"] = contract_bytes
+        context["local_file_path"] = parse_bucket_url(job["bucket_url"])[1]
+        return context
 
-        # Ensure "recipients" value is formatted correctly
-        recipients_formatted_correctly = True
+    # download contract PDF
+    _trace("Downloading contract PDF if not present.")
+    cache_key = contract_cache_key(job)
+    local_file_path = get_contract_pdf(
+        job["bucket_url"], cache_key, expected_md5=job.get("file_hash")
+    )
+    if not local_file_path:
+        raise Exception("Failed to retrieve contract PDF.")
 
-        # Check if the "recipients" key exists and is a list
-        if "recipients" not in job or not isinstance(job.get("recipients"), list):
-            recipients_formatted_correctly = False
-        elif len(job.get("recipients")) == 0:
-            recipients_formatted_correctly = False
-        # Iterate over each recipient to check their structure
-        for recipient in job.get("recipients"):
-            if not isinstance(recipient, dict):
-                recipients_formatted_correctly = False
-                break
-            # Ensure each recipient has all required keys and they are strings
-            if not all(key in recipient for key in ["email", "name", "signing_url"]):
-                recipients_formatted_correctly = False
-                break
-            if not (
-                isinstance(recipient.get("email"), str)
-                and isinstance(recipient.get("name"), str)
-                and isinstance(recipient.get("signing_url"), str)
-            ):
-                recipients_formatted_correctly = False
-                break
+    # the file stays pinned in document_cache until release_job_contract()
+    context["doc_cache_key"] = cache_key
+    context["local_file_path"] = local_file_path
+    return context
 
-        # Raise an exception if the formatting is incorrect
-        if not recipients_formatted_correctly:
-            raise Exception(
-                "recipients in job is NOT formatted correctly; it must be a list of dictionaries with 'email', 'name', and 'signing_url' as strings"
+
+def release_job_contract(context: dict):
+    """
+    Lets document_cache evict the job's contract file again (or drops the
+    in-memory copy of the contract).
+    """
+    context.pop("contract_bytes", None)
+    cache_key = context.pop("doc_cache_key", None)
+    if cache_key is not None:
+        document_cache.release(cache_key)
+
+
+def extract_job_contract(context: dict, openai_client: "OpenAI"):
+    """
+    Job step 2: extracts the contract's text from the downloaded file.
+    """
+    trace_job_step(context, "Extracting contract content.")
+    try:
+        if contract_text_cache is not None:
+            context["contract_content"] = contract_text_cache.load(
+                context["local_file_path"],
+                client=openai_client,
+                data=context.get("contract_bytes"),
+                content_hash=context["job"].get("file_hash"),
+                rate_limiter=rate_limiter,
             )
+        else:
+            context["contract_content"] = file_io.load_file_content(
+                context["local_file_path"],
+                client=openai_client,
+                data=context.get("contract_bytes"),
+                rate_limiter=rate_limiter,
+            )
+    finally:
+        # the later steps only need the extracted text
+        release_job_contract(context)
+    return context
 
-        # create config for OAgent
-        o_config = o_agent.OAgentConfig(
-            big_model=big_model_name,
-            small_model=small_model_name,
-            document_type="UNKNOWN",
-            specific_concerns="UNKNOWN",
-            last_cost_values_set_date=last_cost_values_set_date,
-            prices=prices,
-        )
 
-        # TODO: (3-10-2025) this sucks, but this works.....
-        g_config = g_agent.GAgentConfig(
-            big_model="deepseek-r1-distill-llama-70b",
-            small_model=small_model_name,
-            document_type="UNKNOWN",
-            specific_concerns="UNKNOWN",
-            last_cost_values_set_date="March 10, 2025",
-            prices={
-                "openai": {
-                    "gpt-4o": {"input": 2.5, "output": 10},
-                    "gpt-4o-mini": {"input": 0.15, "output": 0.6},
-                    "o1": {"input": 15, "output": 60},
-                    "o1-preview": {"input": 15, "output": 60},
-                    "o1-mini": {"input": 3, "output": 12},
-                },
-                "groq": {
-                    "deepseek-r1-distill-llama-70b": {"input": 0.75, "output": 0.99}
-                },
-            },
-        )
+def analyze_job_contract(
+    context: dict,
+    openai_client: "OpenAI",
+    o_config: o_agent.OAgentConfig,
+    g_config: g_agent.GAgentConfig,
+):
+    """
+    Job step 3: analyzes the contract with GAgent (Groq) and OAgent (OpenAI).
+
+    By default OAgent only runs if GAgent fails or returns an empty report.
+    With ANALYSIS_HEDGE_DELAY_SECONDS set, OAgent is also started once GAgent
+    has been running that long, and for priority jobs both start right away;
+    the first valid report wins and the other agent is cancelled (it sends no
+    further requests). Which provider won and how long each one took is
+    recorded in the job's trace_back.
+    """
+    job = context["job"]
+    _trace = functools.partial(trace_job_step, context)
+
+    # # TODO: (3-10-2025) commented out
+    # # run analysis
+    # _trace("Running contract analysis via OAgent.")
+    # oagent = o_agent.OAgent(openai_client=openai_client, config=o_config)
+    # output = oagent.run(contract_path=local_file_path)
+    # if output.get("error"):
+    #     raise Exception(f"OAgent error: {output['error']}")
+
+    hedge_delay = 0 if job.get("priority") else ANALYSIS_HEDGE_DELAY_SECONDS
+    cancel_events = {"groq": threading.Event(), "openai": threading.Event()}
+    gagent = g_agent.GAgent(
+        openai_client=openai_client,
+        groq_client=clients.get_groq_client(),
+        config=g_config,
+        rate_limiter=rate_limiter,
+        extraction_cache=contract_text_cache,
+        cancel_event=cancel_events["groq"],
+    )
+    oagent = o_agent.OAgent(
+        openai_client=openai_client,
+        config=o_config,
+        rate_limiter=rate_limiter,
+        extraction_cache=contract_text_cache,
+        cancel_event=cancel_events["openai"],
+    )
+    agents = {"groq": ("GAgent", gagent), "openai": ("OAgent", oagent)}
 
-        # # TODO: (3-10-2025) commented out
-        # # run analysis
-        # _trace("Running contract analysis via OAgent.")
-        # oagent = o_agent.OAgent(openai_client=openai_client, config=o_config)
-        # output = oagent.run(contract_path=local_file_path)
-        # if output.get("error"):
-        #     raise Exception(f"OAgent error: {output['error']}")
+    def run_agent(provider):
+        agent_start_time = time.monotonic()
+        try:
+            output = agents[provider][1].run(
+                contract_path=context["local_file_path"],
+                contract_content=context["contract_content"],
+            )
+            error = output.get("error")
+        except Exception as e:
+            output = None
+            error = f"{type(e).__name__}: {e}"
+        # a report is required to win, except from OAgent run as the sequential last resort
+        require_report = provider == "groq" or hedge_delay is not None
+        if require_report and error is None and not output.get("report"):
+            error = "empty report"
+        return {
+            "provider": provider,
+            "output": output,
+            "error": error,
+            "seconds": round(time.monotonic() - agent_start_time, 3),
+        }
+
+    def log_cancelled_agent(name, future):
+        if not future.cancelled():
+            logger.info(
+                f"[{context['worker_id']}] Cancelled {name} returned after {future.result()['seconds']}s."
+            )
 
-        # Run analysis using GAgent first
+    start_time = time.monotonic()
+    started = {"groq": start_time}
+    timings = {}
+    results = {}
+    executor = ThreadPoolExecutor(max_workers=2)
+    try:
         _trace("Running contract analysis via GAgent.")
-        groq_client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
-        gagent = g_agent.GAgent(openai_client=openai_client, groq_client=groq_client, config=g_config)
-        output = gagent.run(contract_path=local_file_path)
-
-        # Check for errors or empty report in GAgent output
-        if output.get("error") or not output.get("report"):
-            _trace("GAgent failed or report is empty, switching to OAgent.")
-
-            # Run analysis using OAgent as a fallback
-            oagent = o_agent.OAgent(openai_client=openai_client, config=o_config)
-            output = oagent.run(contract_path=local_file_path)
-            if output.get("error"):
-                raise Exception(f"OAgent error: {output['error']}")
-
-        # Update report
-        _trace("Updating report with final analysis data.")
-        report_update_resp = update_report(
-            report_id,
-            {
-                "final_report": output["report"],
-                "status": "completed",
-                "contract_content": output["contract_content"],
-            },
-        )
-        if isinstance(report_update_resp, dict) and "error" in report_update_resp:
-            raise Exception(f"Error updating report: {report_update_resp['error']}")
+        futures = {executor.submit(run_agent, "groq"): "groq"}
+        if hedge_delay is not None:
+            wait(list(futures), timeout=hedge_delay)
+
+        winner = None
+        while winner is None and futures:
+            done, _ = wait(list(futures), return_when=FIRST_COMPLETED, timeout=0)
+            for future in done:
+                result = future.result()
+                provider = futures.pop(future)
+                results[provider] = result
+                timings[f"{provider}_seconds"] = result["seconds"]
+                if result["error"] is None:
+                    winner = winner or result
+                else:
+                    _trace(
+                        f"{agents[provider][0]} failed after {result['seconds']}s: {result['error']}"
+                    )
 
-        # Send emails
-        final_status = "completed"
-        recipients = job.get("recipients", [])
-        failed_email_counter = []
-        for recipient in recipients:
-            try:
-                if not isinstance(recipient, dict):
-                    raise ValueError(f"Recipient data is not a dictionary: {recipient}")
-
-                def send_email_and_return():
-                    # NOTE: account for case where the user is analyzing their own contract and is not sending it to anyone
-                    if type(recipient) == dict and list(recipient.keys()) == [
-                        "name",
-                        "email",
-                        "signing_url",
-                    ]:
-                        return mail.send_personal_doc_analysis_email(
-                            user_name=recipient["name"],
-                            user_email=recipient["email"],
-                            document_link=recipient["signing_url"],
-                            email_from_name="DocuInsight",
-                            from_email_address=sender_email_address,
-                            document_message="We've successfully analyzed your uploaded document. Click below to view the results!",
-                            analysis_headline_text="Your Document Analysis is Ready!",
-                            button_text="VIEW ANALYSIS",
-                            signature_line="The DocuInsight Team",
-                            full_custom_override_subject_text="Your Document Analysis Results Are Here!",
-                        )
+            # the backup starts once GAgent failed, or right away when hedging (its delay has passed)
+            if (
+                winner is None
+                and "openai" not in results
+                and "openai" not in futures.values()
+                and (hedge_delay is not None or "groq" in results)
+            ):
+                _trace("Running contract analysis via OAgent.")
+                started["openai"] = time.monotonic()
+                futures[executor.submit(run_agent, "openai")] = "openai"
+
+            if winner is None and futures and not done:
+                wait(list(futures), return_when=FIRST_COMPLETED)
+
+        # cancel (and stop waiting for) the agent that lost
+        for future, provider in futures.items():
+            cancel_events[provider].set()
+            future.cancel()
+            # the loser's time is how long it ran until it was cancelled
+            timings[f"{provider}_seconds"] = round(
+                time.monotonic() - started[provider], 3
+            )
+            timings[f"{provider}_cancelled"] = True
+            # its request in flight can't be aborted, so its full time is only logged once it returns
+            future.add_done_callback(
+                functools.partial(log_cancelled_agent, agents[provider][0])
+            )
+    finally:
+        executor.shutdown(wait=False)
+
+    if winner is None:
+        raise Exception(f"OAgent error: {results['openai']['error']}")
+
+    analysis_info = {
+        "winner": winner["provider"],
+        "providers_started": sorted(set(results) | set(futures.values())),
+        "hedged": hedge_delay is not None,
+        "priority": bool(job.get("priority")),
+        "total_seconds": round(time.monotonic() - start_time, 3),
+        **timings,
+    }
+    _trace(
+        f"Contract analysis won by {agents[winner['provider']][0]} ({winner['provider']}).",
+        data=analysis_info,
+    )
+    context["output"] = winner["output"]
+    return context
 
-                    return mail.send_document_review_email(
-                        sender_name=job["user"]["name"],
-                        sender_email=job["user"]["email"],
-                        recipient_name=recipient["name"],
-                        recipient_email=[recipient["email"]],
+
+def persist_job_report(context: dict):
+    """
+    Job step 4: stores the final analysis and the trace_back and marks the job
+    'completed' with a single finalize_job() call. This happens before any
+    email goes out, so a failed write never leads to a re-analysis that emails
+    the recipients a second time.
+    """
+    job_id = context["job"]["id"]
+    output = context["output"]
+    trace_back = context["trace_back"]
+
+    # (e.g. an empty report accepted from the last resort OAgent) nobody should be emailed about that
+    if not output.get("report"):
+        raise Exception("The analysis returned an empty report.")
+
+    trace_back["final_state"] = "completed"
+    trace_job_step(context, "Saving report and marking job as 'completed'.")
+    send_at = str(datetime.now(pytz.utc))
+    report_id = finalize_job(
+        job_id,
+        "completed",
+        trace_back=trace_back,
+        final_report=output["report"],
+        contract_content=output["contract_content"],
+        send_at=send_at,
+    )
+    if isinstance(report_id, dict) and "error" in report_id:
+        raise Exception(f"Error finalizing job: {report_id['error']}")
+
+    context["report_id"] = report_id
+    context["send_at"] = send_at
+    return context
+
+
+def notify_job_recipients(context: dict, sender_email_address: str):
+    """
+    Job step 5: emails the recipients of the (already saved) report. Recipients
+    whose email failed are stored in jobs.errors and the job is moved to
+    'error' (see retry_email_sending()), with one more update only then.
+    The trace of this step is added to the report's trace_back at the end.
+    """
+    job = context["job"]
+    _trace = functools.partial(trace_job_step, context)
+
+    # Send emails
+    final_status = "completed"
+    recipients = job.get("recipients", [])
+    failed_email_counter = []
+    for recipient in recipients:
+        try:
+            if not isinstance(recipient, dict):
+                raise ValueError(f"Recipient data is not a dictionary: {recipient}")
+
+            def send_email_and_return():
+                # NOTE: account for case where the user is analyzing their own contract and is not sending it to anyone
+                if type(recipient) == dict and list(recipient.keys()) == [
+                    "name",
+                    "email",
+                    "signing_url",
+                ]:
+                    return mail.send_personal_doc_analysis_email(
+                        user_name=recipient["name"],
+                        user_email=recipient["email"],
                         document_link=recipient["signing_url"],
-                        document_message="Please review and sign this document using DocuInsight.",
-                        signature_line=job["user"]["name"],
                         email_from_name="DocuInsight",
                         from_email_address=sender_email_address,
-                        action_description="sent you a document to review and sign",
-                        button_text="REVIEW DOCUMENT",
+                        document_message="We've successfully analyzed your uploaded document. Click below to view the results!",
+                        analysis_headline_text="Your Document Analysis is Ready!",
+                        button_text="VIEW ANALYSIS",
+                        signature_line="The DocuInsight Team",
+                        full_custom_override_subject_text="Your Document Analysis Results Are Here!",
                     )
 
-                email_resp = retry_operation(
-                    operation_name="Send Email",
-                    func=send_email_and_return,
-                    max_retries=3,
-                    delay=2,
-                )
-                _trace(
-                    f"Email successfully sent to {recipient['email']}",
-                    data=email_resp,
-                )
-            except Exception as e:
-                _trace(
-                    f"Failed to send email to {recipient.get('email', 'unknown')}: {e}"
+                return mail.send_document_review_email(
+                    sender_name=job["user"]["name"],
+                    sender_email=job["user"]["email"],
+                    recipient_name=recipient["name"],
+                    recipient_email=[recipient["email"]],
+                    document_link=recipient["signing_url"],
+                    document_message="Please review and sign this document using DocuInsight.",
+                    signature_line=job["user"]["name"],
+                    email_from_name="DocuInsight",
+                    from_email_address=sender_email_address,
+                    action_description="sent you a document to review and sign",
+                    button_text="REVIEW DOCUMENT",
                 )
-                final_status = "error"
-                failed_email_counter.append(recipient)
-
-        # Mark job
-        _trace("Updating job status to 'completed'.")
-        job_update_result = update_jobs_table(
-            job_id=job_id,
-            updated_values={
-                "status": final_status,
-                "send_at": str(datetime.now(pytz.utc)),
-                "errors": {},
-                "report_id": report_id,
-            },
-        )
-        if isinstance(job_update_result, dict) and "error" in job_update_result:
-            raise Exception(f"Error updating job: {job_update_result['error']}")
 
-        # Final trace update
-        trace_back["final_state"] = final_status
-        _trace("Saving final trace_back to the report.")
-        final_trace_resp = update_report(report_id, {"trace_back": trace_back})
-        if isinstance(final_trace_resp, dict) and "error" in final_trace_resp:
-            raise Exception(
-                f"Error updating trace_back in report: {final_trace_resp['error']}"
+            email_resp = retry_operation(
+                operation_name="Send Email",
+                func=send_email_and_return,
+                max_retries=3,
+                delay=2,
+            )
+            _trace(
+                f"Email successfully sent to {recipient['email']}",
+                data=email_resp,
+            )
+        except Exception as e:
+            _trace(f"Failed to send email to {recipient.get('email', 'unknown')}: {e}")
+            final_status = "error"
+            failed_email_counter.append(recipient)
+
+    if len(failed_email_counter) > 0:
+        update_result = update_jobs_table(
+            job["id"],
+            {"status": final_status, "errors": {"failed_emails": failed_email_counter}},
+        )
+        if isinstance(update_result, dict) and "error" in update_result:
+            logger.error(
+                f"[{context['worker_id']}] Failed to record the failed emails of job {job['id']}: {update_result['error']}"
             )
 
-        _trace(
-            f"Job {job_id} completed successfully - failed email sent count: {len(failed_email_counter)}"
+    context["final_status"] = final_status
+    context["failed_emails"] = failed_email_counter
+    _trace(
+        f"Job {job['id']} completed successfully - failed email sent count: {len(failed_email_counter)}"
+    )
+
+    # persist_job_report() saved the trace before the emails went out
+    trace_result = update_report(
+        context["report_id"],
+        {"trace_back": {**context["trace_back"], "report_id": context["report_id"]}},
+    )
+    if isinstance(trace_result, dict) and "error" in trace_result:
+        logger.error(
+            f"[{context['worker_id']}] Failed to save the email trace of job {job['id']}: {trace_result['error']}"
         )
+    return context
 
-        if len(failed_email_counter) > 0:
-            current_error_value = {}
-            job_data = get_specific_job(job["id"])
-            if (
-                job_data != None
-                and type(job_data) == dict
-                and job_data.get("errors") != None
-            ):
-                current_error_value = job_data["errors"]
-            current_error_value["failed_emails"] = failed_email_counter
-            update_jobs_table(
-                job_id=job["id"], updated_values={"errors": current_error_value}
-            )
 
-    except Exception as e:
-        # If an error happens at any point, fail the job and store partial trace
-        trace_back["final_state"] = "failed"
-        error_trace = traceback.format_exception(type(e), e, e.__traceback__)
-        logger.error(f"[{worker_id}] An error occurred: {error_trace}")
+def handle_job_failure(context: dict, e: Exception):
+    """
+    Fails the job with the partial trace collected so far.
+    """
+    worker_id = context["worker_id"]
+    trace_back = context["trace_back"]
+    release_job_contract(context)
 
-        # Provide error details in the 'fail_job'
-        fail_job(worker_id, job_id, str(e), trace_back)
+    # If an error happens at any point, fail the job and store partial trace
+    trace_back["final_state"] = "failed"
+    error_trace = traceback.format_exception(type(e), e, e.__traceback__)
+    logger.error(f"[{worker_id}] An error occurred: {error_trace}")
 
+    # Provide error details in the 'fail_job'
+    fail_job(worker_id, context["job"]["id"], str(e), trace_back)
 
-def manager(
-    max_workers=None,
-    prices=None,
-    big_model=None,
-    small_model=None,
-    sender_email_address=None,
-    last_cost_values_set_date="?",
+
+def process_single_job(
+    worker_id: str,
+    job: dict,
+    openai_client: "OpenAI",
+    prices: dict,
+    big_model_name: str,
+    small_model_name: str,
+    sender_email_address: str,
+    last_cost_values_set_date: str,
 ):
     """
-    Parameters:
-      - max_workers: number of threads to use
-      - prices: dictionary of model pricing
-      - big_model: the large LLM model for analyzing the legal contract
-      - small_model: the small LLM model for converting the output from the big_model into a json
+    Processes a single job from 'queued_jobs' in a production-ready manner.
+    - Downloads contract PDF
+    - Extracts the contract's text
+    - Runs analysis via g_agent (o_agent as a fallback)
+    - Saves the report and marks the job 'completed' (one database call)
+    - Sends emails
+    On error, fails the job with a stored traceback and alert.
+    make_job_pipeline() runs the same steps as separate, concurrent stages.
     """
+    context = new_job_context(worker_id, job)
+
+    try:
+        o_config, g_config = make_agent_configs(
+            prices, big_model_name, small_model_name, last_cost_values_set_date
+        )
+        download_job_contract(context)
+        extract_job_contract(context, openai_client)
+        analyze_job_contract(context, openai_client, o_config, g_config)
+        persist_job_report(context)
+        notify_job_recipients(context, sender_email_address)
+    except Exception as e:
+        handle_job_failure(context, e)
+
 
+def check_job_config(prices, big_model, small_model, sender_email_address):
+    """
+    Raises an exception if one of the required analyzer config values is missing.
+    """
     if prices is None:
         raise Exception("Model prices data not provided")
     if big_model is None:
@@ -791,15 +1401,26 @@ def manager(
     if sender_email_address is None:
         raise Exception("Sender email address is not provided")
 
-    worker_id = "[MAIN]"  # For main logs, just use a static placeholder
 
-    logger.info(f"{worker_id} Starting job processor...")
+def make_job_processor(
+    prices=None,
+    big_model=None,
+    small_model=None,
+    sender_email_address=None,
+    last_cost_values_set_date="?",
+):
+    """
+    Validates the analyzer config values and returns the function the worker
+    threads run for each job.
+    """
+
+    check_job_config(prices, big_model, small_model, sender_email_address)
 
-    # Create fresh client instances for each thread to avoid sharing locks
+    # every worker shares the same (thread-safe) pooled clients, see clients.py
     def create_job_processing_function(job):
         # Each thread will get its own worker_id upon entering the function:
         w_id = get_worker_id()
-        local_openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        local_openai_client = clients.get_openai_client()
         return process_single_job(
             w_id,
             job,
@@ -811,30 +1432,355 @@ def manager(
             last_cost_values_set_date,
         )
 
-    queued_jobs = get_jobs_with_users_by_status()
+    return create_job_processing_function
+
+
+def make_job_pipeline(
+    stage_limits=None,
+    on_slot_free=None,
+    prices=None,
+    big_model=None,
+    small_model=None,
+    sender_email_address=None,
+    last_cost_values_set_date="?",
+):
+    """
+    Validates the analyzer config values and returns a pipeline.StagedPipeline
+    that runs the steps of process_single_job() as separate stages
+    (download -> extract -> analyze -> persist -> notify). Each stage gets its
+    own concurrency limit from `stage_limits` (missing stages use
+    DEFAULT_STAGE_LIMITS), so many LLM calls can be in flight while the CPU-heavy
+    extraction stays bounded. Items submitted to it must be new_job_context()s.
+    on_slot_free is called whenever a job leaves the first stage (see
+    pipeline.StagedPipeline.free_slots()).
+    """
+
+    check_job_config(prices, big_model, small_model, sender_email_address)
+
+    limits = {**DEFAULT_STAGE_LIMITS, **(stage_limits or {})}
+    o_config, g_config = make_agent_configs(
+        prices, big_model, small_model, last_cost_values_set_date
+    )
+
+    # one client for all stages; the OpenAI client is safe to share between threads
+    openai_client = clients.get_openai_client()
+
+    return pipeline.StagedPipeline(
+        stages=[
+            ("download", download_job_contract, limits["download"]),
+            (
+                "extract",
+                functools.partial(extract_job_contract, openai_client=openai_client),
+                limits["extract"],
+            ),
+            (
+                "analyze",
+                functools.partial(
+                    analyze_job_contract,
+                    openai_client=openai_client,
+                    o_config=o_config,
+                    g_config=g_config,
+                ),
+                limits["analyze"],
+            ),
+            ("persist", persist_job_report, limits["persist"]),
+            (
+                "notify",
+                functools.partial(
+                    notify_job_recipients, sender_email_address=sender_email_address
+                ),
+                limits["notify"],
+            ),
+        ],
+        on_error=handle_job_failure,
+        logger=logger,
+        on_slot_free=on_slot_free,
+    )
+
+
+def make_job_executor(
+    max_workers=None, stage_limits=None, on_slot_free=None, **job_config
+):
+    """
+    Returns (executor, submit_job, workers, free_slots) for manager() and daemon():
+      - without stage_limits: a thread pool of `max_workers` threads that each run
+        process_single_job() for one job at a time
+      - with stage_limits: the staged pipeline from make_job_pipeline(), which
+        works on at most `max_workers` jobs (default: its full capacity)
+    submit_job(job) schedules a job and returns its Future, `workers` is the
+    number of jobs that may be in flight at once, and free_slots(in_flight) is
+    the number of jobs that can start right away with `in_flight` jobs
+    submitted, i.e. how many jobs may be claimed (jobs are never claimed just to
+    wait in a queue while their lease runs).
+    """
+    if stage_limits is None:
+        create_job_processing_function = make_job_processor(**job_config)
+        workers = max_workers or 8
+        executor = ThreadPoolExecutor(max_workers=workers)
+        submit_job = functools.partial(executor.submit, create_job_processing_function)
+        return executor, submit_job, workers, lambda in_flight: workers - in_flight
+
+    executor = make_job_pipeline(
+        stage_limits=stage_limits, on_slot_free=on_slot_free, **job_config
+    )
+    workers = max_workers or executor.capacity
+
+    def submit_job(job):
+        # a job moves between the stages' threads, so it gets its own id instead
+        return executor.submit(new_job_context(f"P-{uuid.uuid4().hex[:6]}", job))
+
+    def free_slots(in_flight):
+        # only as many as the first stage can take now, the later stages have their own limits
+        return min(workers - in_flight, executor.free_slots())
+
+    return executor, submit_job, workers, free_slots
+
+
+def manager(
+    max_workers=None,
+    prices=None,
+    big_model=None,
+    small_model=None,
+    sender_email_address=None,
+    last_cost_values_set_date="?",
+    stage_limits=None,
+):
+    """
+    Parameters:
+      - max_workers: number of threads to use (jobs in flight when stage_limits is set)
+      - prices: dictionary of model pricing
+      - big_model: the large LLM model for analyzing the legal contract
+      - small_model: the small LLM model for converting the output from the big_model into a json
+      - stage_limits: if set, run jobs through the staged pipeline with these per-stage limits (see make_job_pipeline())
+    """
+
+    worker_id = "[MAIN]"  # For main logs, just use a static placeholder
+
+    logger.info(f"{worker_id} Starting job processor...")
+    setup_node()
+
+    executor, submit_job, _, free_slots = make_job_executor(
+        max_workers=max_workers,
+        stage_limits=stage_limits,
+        prices=prices,
+        big_model=big_model,
+        small_model=small_model,
+        sender_email_address=sender_email_address,
+        last_cost_values_set_date=last_cost_values_set_date,
+    )
+
+    # claim at most one job per free worker so other analyzer nodes can pick up the rest
+    queued_jobs = claim_jobs_with_users(free_slots(0))
     if not queued_jobs:
         logger.info(f"{worker_id} No jobs pending.")
+        executor.shutdown()
         return
 
-    # Use provided max_workers or default to minimum of 8 and job count
-    workers = max_workers or min(8, len(queued_jobs))
+    lease_keeper.start()
+    with executor:
+        futures = {}
+        backlog_drained = False
+        while True:
+            for job in queued_jobs:
+                lease_keeper.add([job["id"]])
+                futures[submit_job(job)] = job
 
-    with ThreadPoolExecutor(max_workers=workers) as executor:
-        futures = {
-            executor.submit(create_job_processing_function, job): job
-            for job in queued_jobs
-        }
+            if not futures:
+                break
+
+            # (the pipeline's first stage can free up before any job is done)
+            done, _ = wait(
+                futures,
+                timeout=None if stage_limits is None else 1,
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                job = futures.pop(future)
+                lease_keeper.discard(job["id"])
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"{worker_id} Job processing failed: {e}")
+
+            # page through the rest of the backlog as workers free up
+            queued_jobs = []
+            if not backlog_drained:
+                free_workers = free_slots(len(futures))
+                queued_jobs = claim_jobs_with_users(free_workers)
+                backlog_drained = len(queued_jobs) < free_workers
+    lease_keeper.stop()
+
+
+def daemon(
+    max_workers=None,
+    prices=None,
+    big_model=None,
+    small_model=None,
+    sender_email_address=None,
+    last_cost_values_set_date="?",
+    poll_interval=5,
+    cleanup_interval=60 * 60,
+    listen_for_jobs=False,
+    sweep_interval=60,
+    stage_limits=None,
+):
+    """
+    Long-running version of manager(). The clients, the imports and the worker
+    pool are set up once and new jobs are polled for in-process, so a cycle no
+    longer pays for a fresh python process, local_cleanup() and a new pool.
+
+    Parameters:
+      - max_workers: number of threads in the persistent worker pool (jobs in flight when stage_limits is set)
+      - prices, big_model, small_model, sender_email_address, last_cost_values_set_date, stage_limits: same as manager()
+      - poll_interval: seconds to wait between two job polls (a poll also happens as soon as a worker frees up)
+      - cleanup_interval: seconds between two local_cleanup() runs
+      - listen_for_jobs: wake up as soon as a job is inserted (Supabase Realtime) instead of polling
+      - sweep_interval: seconds between two safety-net polls while listen_for_jobs is connected
+    """
+
+    worker_id = "[DAEMON]"
+    setup_node()
+
+    # remember which jobs are already in the pool so a job whose lease expired
+    # while it was still being processed here is never submitted twice
+    in_flight = {}
+    in_flight_lock = threading.Lock()
+    stop_event = threading.Event()
+    # set whenever a worker frees up so the next page of jobs is claimed right away
+    wake_event = threading.Event()
+
+    executor, submit_job, workers, free_slots = make_job_executor(
+        max_workers=max_workers,
+        stage_limits=stage_limits,
+        on_slot_free=wake_event.set,
+        prices=prices,
+        big_model=big_model,
+        small_model=small_model,
+        sender_email_address=sender_email_address,
+        last_cost_values_set_date=last_cost_values_set_date,
+    )
+
+    def request_stop(signum, frame):
+        logger.info(
+            f"{worker_id} Received signal {signum}, stopping after in-flight jobs."
+        )
+        stop_event.set()
+        wake_event.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    def job_done(job_id, future):
+        with in_flight_lock:
+            in_flight.pop(job_id, None)
+        lease_keeper.discard(job_id)
+        wake_event.set()
+        try:
+            future.result()
+        except Exception as e:
+            logger.error(f"{worker_id} Job processing failed: {e}")
+
+    def job_inserted(record):
+        logger.info(f"{worker_id} Job {record.get('id')} was inserted, waking up.")
+        wake_event.set()
+
+    listener = None
+    if listen_for_jobs:
+        listener = job_events.JobEventListener(
+            supabase_url=os.getenv("SUPABASE_URL"),
+            supabase_key=os.getenv("SUPABASE_KEY"),
+            on_new_job=job_inserted,
+            logger=logger,
+        )
+        listener.start()
+
+    logger.info(
+        f"{worker_id} Starting job processor daemon with {workers} workers (poll interval: {poll_interval}s)..."
+    )
+
+    last_cleanup = time.time()
+    lease_keeper.start()
+    with executor:
+        while not stop_event.is_set():
+            if time.time() - last_cleanup >= cleanup_interval:
+                last_cleanup = time.time()
+                try:
+                    local_cleanup()
+                except Exception as e:
+                    cleanup_fail_msg = (
+                        f"Failed to run local file cleaner due to error: {e}"
+                    )
+                    logger.critical(cleanup_fail_msg)
+                    send_alert(cleanup_fail_msg)
 
-        for future in as_completed(futures):
             try:
-                future.result()
+                # only claim as many jobs as can start right away
+                with in_flight_lock:
+                    free_workers = free_slots(len(in_flight))
+                queued_jobs = claim_jobs_with_users(free_workers)
+                submitted = 0
+                for job in queued_jobs:
+                    with in_flight_lock:
+                        if job["id"] in in_flight:
+                            continue
+                        lease_keeper.add([job["id"]])
+                        future = submit_job(job)
+                        in_flight[job["id"]] = future
+                    future.add_done_callback(functools.partial(job_done, job["id"]))
+                    submitted += 1
+                if submitted > 0:
+                    logger.info(
+                        f"{worker_id} Submitted {submitted} new jobs ({len(in_flight)} in flight)."
+                    )
+                    if stage_limits is not None:
+                        logger.info(f"{worker_id} Pipeline stages: {executor.stats()}")
+                    logger.info(f"{worker_id} LLM rate limits: {rate_limiter.stats()}")
+                    logger.info(f"{worker_id} HTTP connections: {clients.stats()}")
+                    logger.info(f"{worker_id} User cache: {user_cache.stats()}")
+                    if contract_text_cache is not None:
+                        logger.info(
+                            f"{worker_id} Extraction cache: {contract_text_cache.stats()}"
+                        )
+                    if document_cache is not None:
+                        logger.info(
+                            f"{worker_id} Document cache: {document_cache.stats()}"
+                        )
             except Exception as e:
-                logger.error(f"{worker_id} Job processing failed: {e}")
+                big_root_error_msg = f"Root error with daemon poll cycle: {e}"
+                logger.critical(big_root_error_msg)
+                send_alert(big_root_error_msg)
 
+            # while insert events are coming in, polling is only a slow safety net
+            if listener is not None and listener.subscribed:
+                wake_event.wait(sweep_interval)
+            else:
+                wake_event.wait(poll_interval)
+            wake_event.clear()
+
+        if listener is not None:
+            listener.stop()
+
+        logger.info(
+            f"{worker_id} Waiting for {len(in_flight)} in-flight jobs to finish..."
+        )
+
+    lease_keeper.stop()
+    clients.close_all()
+    logger.info(f"{worker_id} Job processor daemon stopped.")
 
-def local_cleanup():
-    current_epoch_seconds = time.time()
 
+def local_cleanup():
+    # downloaded contracts live in document_cache, which keeps itself within its byte budget
+    if document_cache is not None:
+        document_cache.cleanup()
+    # the OCR cache is written by file_io's worker processes, so its index is rebuilt from the
+    # files' mtimes (their last use) and the least recently used pages over its budget are removed
+    if file_io.OCR_CACHE_MAX_BYTES > 0 and os.path.isdir(file_io.OCR_CACHE_DIR):
+        doc_cache.DocumentCache(
+            file_io.OCR_CACHE_DIR, max_bytes=file_io.OCR_CACHE_MAX_BYTES
+        ).cleanup()
+
+    # the pdfs/ directory was used for downloads before document_cache existed
     pdfs_removed = []
     pdfs_directory_path = os.path.join(
         os.path.dirname(os.path.abspath(__file__)), "pdfs/"
@@ -842,13 +1788,9 @@ def local_cleanup():
     if os.path.isdir(pdfs_directory_path):
         for file_name in os.listdir(pdfs_directory_path):
             file_path = os.path.join(pdfs_directory_path, file_name)
-            if os.path.isfile(file_path) and file_path.endswith(".pdf"):
-                file_date_created = file_io.get_file_creation_date(file_path)
-                if abs(file_date_created - current_epoch_seconds) >= (
-                    24 * 60 * 60
-                ):  # delete files older then 24 hours
-                    os.remove(file_path)
-                    pdfs_removed.append(file_path)
+            if os.path.isfile(file_path) and file_path.endswith((".pdf", ".part")):
+                os.remove(file_path)
+                pdfs_removed.append(file_path)
 
     lines_to_remove = 0
     log_file_path = os.path.join(
@@ -865,7 +1807,9 @@ def local_cleanup():
 
     log_label = "[LOCAL_CLEANUP]"
     if len(pdfs_removed) > 0:
-        msg = f"{log_label} Removed {len(pdfs_removed)} pdfs that were created over 24 hours ago"
+        msg = (
+            f"{log_label} Removed {len(pdfs_removed)} pdfs from the old pdfs/ directory"
+        )
         logger.debug(msg)
     if lines_to_remove > 0:
         msg = f"{log_label} Trimmed top {lines_to_remove} lines from the log file."
@@ -927,25 +1871,105 @@ def retry_email_sending(sender_email_address):
                 )
 
 
+# models and limits used for every analysis (by __main__ below and by bulk_ingest.py)
+BIG_MODEL_NAME = "o1-preview"
+SMALL_MODEL_NAME = "gpt-4o-mini"
+LAST_COST_VALUES_SET_DATE = "January 20, 2025"
+
+# last updated on 2-25-2025
+MODEL_PRICES = {
+    "openai": {
+        "gpt-4o": {"input": 2.5, "output": 10},
+        "gpt-4o-mini": {"input": 0.15, "output": 0.6},
+        "o1": {"input": 15, "output": 60},
+        "o1-preview": {"input": 15, "output": 60},
+        "o1-mini": {"input": 3, "output": 12},
+        "o3-mini": {"input": 1.10, "output": 4.40},
+    }
+}
+
+# requests/tokens per minute allowed by each provider for our account tier
+MODEL_RATE_LIMITS = {
+    "openai": {
+        "gpt-4o": {"requests_per_minute": 5000, "tokens_per_minute": 800000},
+        "gpt-4o-mini": {
+            "requests_per_minute": 5000,
+            "tokens_per_minute": 4000000,
+        },
+        "o1-preview": {"requests_per_minute": 5000, "tokens_per_minute": 800000},
+        "o3-mini": {"requests_per_minute": 5000, "tokens_per_minute": 4000000},
+    },
+    "groq": {
+        "deepseek-r1-distill-llama-70b": {
+            "requests_per_minute": 30,
+            "tokens_per_minute": 6000,
+        }
+    },
+}
+
+# in-flight LLM calls per provider, adjusted at runtime from latency and 429/503/timeout feedback
+PROVIDER_CONCURRENCY_LIMITS = {
+    "openai": {"initial_limit": 16, "min_limit": 2, "max_limit": 256},
+    "groq": {"initial_limit": 4, "min_limit": 1, "max_limit": 32},
+}
+
+# keep-alive/HTTP2 connection pool shared by the OpenAI, Groq and download clients
+HTTP_POOL_SETTINGS = {
+    "max_connections": 200,
+    "max_keepalive_connections": 50,
+    "keepalive_expiry": 60,
+    "http2": True,
+}
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DocuInsight contract analyzer")
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="keep running and poll for new jobs in-process instead of exiting after one cycle",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=5,
+        help="seconds between two job polls in daemon mode (default: 5)",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="run jobs through the staged pipeline (download, extract, analyze, persist, notify) with per-stage limits",
+    )
+    parser.add_argument(
+        "--listen",
+        action="store_true",
+        help="in daemon mode, wake up on job inserts via Supabase Realtime and only poll as a safety net",
+    )
+    parser.add_argument(
+        "--sweep-interval",
+        type=float,
+        default=60,
+        help="seconds between two safety-net polls while --listen is connected (default: 60)",
+    )
+    args = parser.parse_args()
+
     # important config values
     max_workers_values = 13
-    big_model_name = "o1-preview"
-    small_model_name = "gpt-4o-mini"
-    last_cost_values_set_date = "January 20, 2025"
+    big_model_name = BIG_MODEL_NAME
+    small_model_name = SMALL_MODEL_NAME
+    last_cost_values_set_date = LAST_COST_VALUES_SET_DATE
     sender_email_address = "noreply@docuinsight.ai"
 
-    # last updated on 2-25-2025
-    model_prices = {
-        "openai": {
-            "gpt-4o": {"input": 2.5, "output": 10},
-            "gpt-4o-mini": {"input": 0.15, "output": 0.6},
-            "o1": {"input": 15, "output": 60},
-            "o1-preview": {"input": 15, "output": 60},
-            "o1-mini": {"input": 3, "output": 12},
-            "o3-mini": {"input": 1.10, "output": 4.40},
-        }
-    }
+    # per-stage concurrency limits used with --pipeline (max_workers_values is ignored then)
+    pipeline_stage_limits = None
+    if args.pipeline:
+        max_workers_values = None
+        pipeline_stage_limits = dict(DEFAULT_STAGE_LIMITS)
+
+    rate_limiter.set_limits(MODEL_RATE_LIMITS)
+    rate_limiter.set_concurrency_limits(PROVIDER_CONCURRENCY_LIMITS)
+    clients.configure(**HTTP_POOL_SETTINGS)
+    setup_node()
 
     # set and safely determine model based values
     if str(os.getenv("DEV_MODE")).lower() == "true":
@@ -971,15 +1995,37 @@ if __name__ == "__main__":
     #     logger.critical(big_root_error_msg)
     #     send_alert(big_root_error_msg)
 
-    # run main analyzer logic
+    # run main analyzer logic (as a long-running daemon if requested)
+    if args.daemon:
+        try:
+            daemon(
+                max_workers=max_workers_values,
+                big_model=big_model_name,
+                small_model=small_model_name,
+                prices=MODEL_PRICES,
+                sender_email_address=sender_email_address,
+                last_cost_values_set_date=last_cost_values_set_date,
+                poll_interval=args.poll_interval,
+                listen_for_jobs=args.listen,
+                sweep_interval=args.sweep_interval,
+                stage_limits=pipeline_stage_limits,
+            )
+        except Exception as e:
+            big_root_error_msg = f"Root error with main daemon code: {e}"
+            logger.critical(big_root_error_msg)
+            send_alert(big_root_error_msg)
+            sys.exit(1)
+        sys.exit(0)
+
     try:
         manager(
             max_workers=max_workers_values,
             big_model=big_model_name,
             small_model=small_model_name,
-            prices=model_prices,
+            prices=MODEL_PRICES,
             sender_email_address=sender_email_address,
             last_cost_values_set_date=last_cost_values_set_date,
+            stage_limits=pipeline_stage_limits,
         )
     except Exception as e:
         big_root_error_msg = f"Root error with main manager code: {e}"
@@ -1,12 +1,17 @@
-from typing import Optional, Dict, Any, List
+from typing import TYPE_CHECKING, Optional, Dict, Any, List
+import threading
 from pydantic import BaseModel, Field
-from openai import OpenAI
 import json
 import time
 import os
 
+from rate_limit import RateLimiter, create_chat_completion
+from extraction_cache import ExtractionCache
 from file_io import load_file_content
 
+if TYPE_CHECKING:
+    from openai import OpenAI
+
 
 class TokenUsage(BaseModel):
     input: int
@@ -141,9 +146,25 @@ Please provide your analysis in the following JSON structure:
 }
     """
 
-    def __init__(self, openai_client: OpenAI, config: OAgentConfig):
+    def __init__(
+        self,
+        openai_client: "OpenAI",
+        config: OAgentConfig,
+        rate_limiter: Optional[RateLimiter] = None,
+        extraction_cache: Optional[ExtractionCache] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ):
+        """
+        An optional rate_limiter (shared between agents) keeps the calls within
+        OpenAI's requests/tokens per minute limits. An optional extraction_cache
+        is checked before a contract's text is extracted. Setting cancel_event
+        (e.g. once a hedged GAgent run won) stops the agent before its next request.
+        """
         self.openai_client = openai_client
         self.config = config
+        self.rate_limiter = rate_limiter
+        self.extraction_cache = extraction_cache
+        self.cancel_event = cancel_event
 
     def get_provider_for_model(self, model_name: str) -> str:
         """
@@ -178,9 +199,13 @@ Input Text:
         """.strip()
 
         try:
-            response = client.chat.completions.create(
-                model=self.config.small_model,
+            response = create_chat_completion(
+                client,
+                "openai",
+                self.config.small_model,
                 messages=[{"role": "user", "content": prompt}],
+                rate_limiter=self.rate_limiter,
+                cancel_event=self.cancel_event,
             )
 
             extracted_json_text = (
@@ -240,10 +265,20 @@ Document Under Review:
 
         return prompt
 
-    def analyze_contract(self, contract_path: str) -> Dict[str, Any]:
+    def analyze_contract(
+        self, contract_path: str, contract_content: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Analyzes the contract at `contract_path`. If the caller already extracted
+        the contract's text, it can be passed as `contract_content` so the file
+        is not loaded again.
+        """
         start_time = time.time()
 
-        contract_content = load_file_content(contract_path)
+        if contract_content is None and self.extraction_cache is not None:
+            contract_content = self.extraction_cache.load(contract_path)
+        elif contract_content is None:
+            contract_content = load_file_content(contract_path)
         prompt = self.build_prompt(contract_text=contract_content)
 
         # We only use openai now:
@@ -256,9 +291,13 @@ Document Under Review:
         extraction_error = None
 
         try:
-            response = big_model_client.chat.completions.create(
-                model=big_model_name,
+            response = create_chat_completion(
+                big_model_client,
+                "openai",
+                big_model_name,
                 messages=[{"role": "user", "content": prompt}],
+                rate_limiter=self.rate_limiter,
+                cancel_event=self.cancel_event,
                 stream=False,
             )
 
@@ -343,12 +382,16 @@ Document Under Review:
 
         return output
 
-    def run(self, contract_path: str) -> Dict[str, Any]:
-        return self.analyze_contract(contract_path)
+    def run(
+        self, contract_path: str, contract_content: Optional[str] = None
+    ) -> Dict[str, Any]:
+        return self.analyze_contract(contract_path, contract_content=contract_content)
 
 
 # NOTE: this code is only used for testing
 if __name__ == "__main__":
+    from openai import OpenAI
+
     openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
     prices = {
@@ -0,0 +1,201 @@
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Optional, Dict, Any, List, Tuple
+import concurrent.futures
+import threading
+import asyncio
+import logging
+
+
+class StagedPipeline:
+    """
+    Runs items through a fixed sequence of blocking stage functions, e.g.
+    the analyzer's download -> extract -> analyze -> persist -> notify (the
+    report is saved before anyone is emailed), on an asyncio loop.
+
+    Every stage has its own concurrency limit (and its own thread pool of that
+    size), so a slow network-bound stage can have hundreds of items in flight
+    while a CPU-heavy stage stays small. Each stage function receives the
+    value returned by the previous stage (the submitted item for the first one).
+
+    The pipeline can be used like a concurrent.futures executor: submit()
+    returns a Future and the pipeline works as a context manager.
+    """
+
+    def __init__(
+        self,
+        stages: List[Tuple[str, Callable[[Any], Any], int]],
+        on_error: Optional[Callable[[Any, Exception], None]] = None,
+        logger: Optional[logging.Logger] = None,
+        on_slot_free: Optional[Callable[[], None]] = None,
+    ):
+        """
+        Parameters:
+          - stages: list of (name, function, concurrency limit) in the order they run
+          - on_error: called with (item, exception) when a stage fails; the item is
+            the input of the failing stage and no later stage runs for it
+          - logger: logger used to report errors raised by on_error or on_slot_free
+          - on_slot_free: called whenever an item leaves the first stage, i.e. when
+            free_slots() went up (e.g. to submit the next item right away)
+        """
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage.")
+
+        self.stages = []
+        for name, func, limit in stages:
+            if limit < 1:
+                raise ValueError(
+                    f"Stage '{name}' needs a concurrency limit of at least 1."
+                )
+            self.stages.append({"name": name, "func": func, "limit": limit})
+
+        self.on_error = on_error
+        self.on_slot_free = on_slot_free
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._executors = {
+            stage["name"]: ThreadPoolExecutor(
+                max_workers=stage["limit"], thread_name_prefix=f"stage-{stage['name']}"
+            )
+            for stage in self.stages
+        }
+        self._semaphores = {
+            stage["name"]: asyncio.Semaphore(stage["limit"]) for stage in self.stages
+        }
+        self._stats = {
+            stage["name"]: {
+                "limit": stage["limit"],
+                "waiting": 0,
+                "active": 0,
+                "completed": 0,
+                "failed": 0,
+            }
+            for stage in self.stages
+        }
+
+        self._pending = set()
+        # items submitted that haven't left the first stage yet (waiting for it or in it)
+        self._entering = 0
+        self._pending_lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="pipeline-loop", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def capacity(self) -> int:
+        """
+        Number of items the pipeline can work on at once with every stage busy.
+        """
+        return sum(stage["limit"] for stage in self.stages)
+
+    def free_slots(self) -> int:
+        """
+        Number of items that would start the first stage right away if they were
+        submitted now, instead of queueing for it.
+        """
+        with self._pending_lock:
+            return max(0, self.stages[0]["limit"] - self._entering)
+
+    def submit(self, item: Any) -> Future:
+        """
+        Schedules `item` to run through all the stages and returns a Future that
+        resolves to the last stage's return value (or None if a stage failed and
+        on_error handled it).
+        """
+        with self._pending_lock:
+            self._entering += 1
+        future = asyncio.run_coroutine_threadsafe(self._run_item(item), self._loop)
+        with self._pending_lock:
+            self._pending.add(future)
+        future.add_done_callback(self._forget)
+        return future
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Returns a snapshot of the per-stage counters.
+        """
+        return {name: dict(values) for name, values in self._stats.items()}
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stops the pipeline. With wait=True, items that were already submitted are
+        allowed to finish first.
+        """
+        with self._pending_lock:
+            pending = list(self._pending)
+        if wait:
+            concurrent.futures.wait(pending)
+        else:
+            for future in pending:
+                future.cancel()
+
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        for executor in self._executors.values():
+            executor.shutdown(wait=wait)
+        self._loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.shutdown(wait=True)
+        return False
+
+    def _forget(self, future: Future):
+        with self._pending_lock:
+            self._pending.discard(future)
+
+    def _leave_first_stage(self):
+        with self._pending_lock:
+            self._entering -= 1
+        if self.on_slot_free is not None:
+            try:
+                self.on_slot_free()
+            except Exception as e:
+                self.logger.error(f"[PIPELINE] on_slot_free failed: {e}")
+
+    async def _run_item(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        in_first_stage = True
+        try:
+            for stage in self.stages:
+                name = stage["name"]
+                stats = self._stats[name]
+
+                stats["waiting"] += 1
+                async with self._semaphores[name]:
+                    stats["waiting"] -= 1
+                    stats["active"] += 1
+                    try:
+                        result = await loop.run_in_executor(
+                            self._executors[name], stage["func"], item
+                        )
+                    except Exception as e:
+                        stats["failed"] += 1
+                        if self.on_error is None:
+                            raise
+                        try:
+                            await loop.run_in_executor(
+                                self._executors[name], self.on_error, item, e
+                            )
+                        except Exception as handler_error:
+                            self.logger.error(
+                                f"[PIPELINE] on_error failed for stage '{name}': {handler_error}"
+                            )
+                        return None
+                    finally:
+                        stats["active"] -= 1
+
+                    stats["completed"] += 1
+                    item = result
+
+                if in_first_stage:
+                    in_first_stage = False
+                    self._leave_first_stage()
+            return item
+        finally:
+            # (the item failed in, or was cancelled before finishing, the first stage)
+            if in_first_stage:
+                self._leave_first_stage()
@@ -0,0 +1,497 @@
+from typing import Optional, Dict, Any, List, Tuple
+import threading
+import time
+import re
+
+# what a vision model charges for an image at most 2048x2048 pixels (e.g. gpt-4o: 85 + 4 tiles * 170)
+IMAGE_TOKEN_ESTIMATE = 765
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count of `text` (~4 characters per token for English text),
+    good enough to budget requests against a tokens-per-minute limit.
+    """
+    return len(text) // 4 + 1
+
+
+def estimate_message_tokens(message: Dict[str, Any]) -> int:
+    """
+    Rough token count of a chat message, whose content is either a string or a
+    list of text and image_url parts (see IMAGE_TOKEN_ESTIMATE).
+    """
+    content = message.get("content")
+    if isinstance(content, str):
+        return estimate_tokens(content)
+
+    tokens = 0
+    for part in content or []:
+        if part.get("type") == "text":
+            tokens += estimate_tokens(part.get("text", ""))
+        elif part.get("type") == "image_url":
+            tokens += IMAGE_TOKEN_ESTIMATE
+    return tokens
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parses the reset durations used in the providers' rate limit headers
+    (e.g. "20ms", "1s", "6m0s", "2m59.56s") into seconds.
+    """
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to `capacity` units and refills
+    `capacity` units per `period` seconds. The level may go negative when
+    usage turns out to be higher than what was reserved up front.
+    """
+
+    def __init__(self, capacity: float, period: float = 60):
+        self.capacity = float(capacity)
+        self.refill_per_second = self.capacity / period
+        self.level = self.capacity
+        self.blocked_until = 0.0
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        self.level = min(self.capacity, self.level + elapsed * self.refill_per_second)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """
+        Seconds until `amount` units can be taken (0 if they can be taken now),
+        or infinity if `amount` is more than the whole bucket holds.
+        """
+        self._refill(now)
+        if amount > self.capacity:
+            return float("inf")
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        needed = amount - self.level
+        if needed <= 0:
+            return 0.0
+        return needed / self.refill_per_second
+
+    def take(self, amount: float):
+        self.level -= amount
+
+    def sync(
+        self, remaining: Optional[float], reset_seconds: Optional[float], now: float
+    ):
+        """
+        Aligns the bucket with what the provider reports as remaining.
+        """
+        self._refill(now)
+        if remaining is None:
+            return
+        self.level = min(self.level, remaining)
+        if remaining <= 0 and reset_seconds:
+            self.blocked_until = max(self.blocked_until, now + reset_seconds)
+
+
+def is_overload_error(error: Exception) -> bool:
+    """
+    True for errors that mean the provider is at capacity: 429 (rate limited),
+    503 (overloaded) and request timeouts, from either the OpenAI or Groq SDK.
+    """
+    status_code = getattr(error, "status_code", None)
+    if status_code in (429, 503):
+        return True
+    return "Timeout" in type(error).__name__
+
+
+class RequestCancelled(Exception):
+    """
+    Raised by create_chat_completion() instead of sending a request whose
+    cancel_event was set (e.g. the other provider of a hedged analysis won).
+    """
+
+
+class RateLimitExceeded(Exception):
+    """
+    Raised by RateLimiter.acquire() instead of waiting when a request can't fit
+    into the limits in time: it's bigger than the whole tokens-per-minute
+    bucket (the provider would reject it anyway) or the wait would be longer
+    than the limiter's max_wait_seconds.
+    """
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD (additive increase, multiplicative decrease) limit on the number of
+    calls in flight to one provider. While latency stays close to its running
+    baseline the limit grows by about one per limit's worth of successful calls,
+    but only from calls made while the limit was (nearly) reached, so it tracks
+    the concurrency the provider actually handled instead of drifting up to
+    max_limit under a light load.
+    On a 429, 503 or timeout it is multiplied by `decrease_factor`, at most once
+    per `cooldown_seconds`, so one burst of errors only counts once.
+
+    Latency is compared per 1k tokens so that large and small contracts can be
+    judged against the same baseline.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 256,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+        cooldown_seconds: float = 5,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.cooldown_seconds = cooldown_seconds
+
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._in_flight = 0
+        self._latency_baseline = None
+        self._last_decrease = 0.0
+        self._counts = {"successes": 0, "overloads": 0, "errors": 0}
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def acquire(self):
+        """
+        Blocks until fewer calls than the current limit are in flight.
+        """
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self, latency_seconds: float, tokens: int = 0, error: Exception = None):
+        """
+        Ends a call started with acquire() and adjusts the limit based on how it went.
+        """
+        with self._condition:
+            # (counting this call) only a limit that was actually in use has earned a raise
+            near_limit = self._in_flight + 1 >= int(self._limit)
+            self._in_flight -= 1
+
+            if error is not None and is_overload_error(error):
+                self._counts["overloads"] += 1
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown_seconds:
+                    self._limit = max(
+                        self.min_limit, self._limit * self.decrease_factor
+                    )
+                    self._last_decrease = now
+            elif error is not None:
+                # not a capacity signal (bad request, auth, parsing, ...)
+                self._counts["errors"] += 1
+            else:
+                self._counts["successes"] += 1
+                latency = latency_seconds / max(1.0, tokens / 1000)
+                if self._latency_baseline is None:
+                    self._latency_baseline = latency
+                if (
+                    near_limit
+                    and latency <= self._latency_baseline * self.latency_tolerance
+                ):
+                    self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+                # slow moving average, so a gradual slowdown still raises the bar slowly
+                self._latency_baseline = 0.9 * self._latency_baseline + 0.1 * latency
+
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "limit": int(self._limit),
+                "in_flight": self._in_flight,
+                "seconds_per_1k_tokens": (
+                    round(self._latency_baseline, 3)
+                    if self._latency_baseline is not None
+                    else None
+                ),
+                **self._counts,
+            }
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limiter shared by every worker,
+    with one pair of token buckets per (provider, model), plus an optional
+    AdaptiveConcurrencyLimiter per provider.
+
+    `limits` has the same shape as the prices dictionary, e.g.:
+        {"openai": {"gpt-4o": {"requests_per_minute": 500, "tokens_per_minute": 30000}}}
+    Models without an entry are not limited.
+
+    `concurrency_limits` maps a provider to the AdaptiveConcurrencyLimiter
+    arguments for it, e.g.:
+        {"openai": {"initial_limit": 16, "max_limit": 256}}
+    Providers without an entry have no concurrency limit.
+
+    A request that would have to wait longer than `max_wait_seconds` (None: no
+    maximum) is refused with RateLimitExceeded, so the caller can fall back to
+    another provider instead of queueing behind a small limit.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Dict[str, Dict[str, int]]]] = None,
+        concurrency_limits: Optional[Dict[str, Dict[str, Any]]] = None,
+        max_wait_seconds: Optional[float] = None,
+    ):
+        self.max_wait_seconds = max_wait_seconds
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._stats = {}
+        self.concurrency_limiters = {}
+        self.set_limits(limits or {})
+        self.set_concurrency_limits(concurrency_limits or {})
+
+    def set_concurrency_limits(self, concurrency_limits: Dict[str, Dict[str, Any]]):
+        """
+        (Re)configures the adaptive concurrency limit of each provider.
+        """
+        self.concurrency_limiters = {
+            provider: AdaptiveConcurrencyLimiter(**settings)
+            for provider, settings in concurrency_limits.items()
+        }
+
+    def set_limits(self, limits: Dict[str, Dict[str, Dict[str, int]]]):
+        """
+        (Re)configures the limits; buckets start out full.
+        """
+        with self._lock:
+            self._buckets = {}
+            for provider, models in limits.items():
+                for model_name, model_limits in models.items():
+                    buckets = {}
+                    if model_limits.get("requests_per_minute"):
+                        buckets["requests"] = TokenBucket(
+                            model_limits["requests_per_minute"]
+                        )
+                    if model_limits.get("tokens_per_minute"):
+                        buckets["tokens"] = TokenBucket(
+                            model_limits["tokens_per_minute"]
+                        )
+                    self._buckets[(provider, model_name)] = buckets
+
+    def _stats_for(self, key: Tuple[str, str]) -> Dict[str, float]:
+        if key not in self._stats:
+            self._stats[key] = {"requests": 0, "tokens": 0, "waited_seconds": 0.0}
+        return self._stats[key]
+
+    def acquire(
+        self,
+        provider: str,
+        model_name: str,
+        estimated_tokens: int,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> float:
+        """
+        Blocks until one request of `estimated_tokens` tokens fits into the
+        provider's limits for this model, reserves it and returns the number of
+        seconds spent waiting.
+
+        Raises RateLimitExceeded right away if the request can never fit or
+        would have to wait longer than max_wait_seconds in total, and
+        RequestCancelled (without reserving anything) once `cancel_event` is set.
+        """
+        key = (provider, model_name)
+        waited = 0.0
+        while True:
+            with self._lock:
+                buckets = self._buckets.get(key, {})
+                now = time.monotonic()
+                wait = 0.0
+                if "requests" in buckets:
+                    wait = max(wait, buckets["requests"].wait_time(1, now))
+                if "tokens" in buckets:
+                    wait = max(wait, buckets["tokens"].wait_time(estimated_tokens, now))
+
+                if wait <= 0:
+                    if "requests" in buckets:
+                        buckets["requests"].take(1)
+                    if "tokens" in buckets:
+                        buckets["tokens"].take(estimated_tokens)
+                    stats = self._stats_for(key)
+                    stats["requests"] += 1
+                    stats["tokens"] += estimated_tokens
+                    stats["waited_seconds"] += waited
+                    return waited
+
+            if wait == float("inf"):
+                raise RateLimitExceeded(
+                    f"A request of ~{estimated_tokens} tokens is over the tokens per minute limit of {provider}/{model_name}."
+                )
+            if (
+                self.max_wait_seconds is not None
+                and waited + wait > self.max_wait_seconds
+            ):
+                raise RateLimitExceeded(
+                    f"The {provider}/{model_name} limits would delay the request by {round(waited + wait, 1)}s "
+                    f"(max {self.max_wait_seconds}s)."
+                )
+
+            # sleep outside of the lock so other models/providers are not held up
+            if cancel_event is None:
+                time.sleep(min(wait, 5))
+            elif cancel_event.wait(min(wait, 5)):
+                raise RequestCancelled(
+                    f"The {provider} request to {model_name} was cancelled."
+                )
+            waited += min(wait, 5)
+
+    def record_usage(
+        self, provider: str, model_name: str, estimated_tokens: int, actual_tokens: int
+    ):
+        """
+        Charges (or refunds) the difference between the tokens reserved by
+        acquire() and the tokens the request actually used.
+        """
+        key = (provider, model_name)
+        with self._lock:
+            buckets = self._buckets.get(key, {})
+            if "tokens" in buckets:
+                buckets["tokens"].take(actual_tokens - estimated_tokens)
+            self._stats_for(key)["tokens"] += actual_tokens - estimated_tokens
+
+    def update_from_headers(self, provider: str, model_name: str, headers: Any):
+        """
+        Syncs the buckets with the provider's x-ratelimit-* (and retry-after)
+        response headers, which OpenAI and Groq both send.
+        """
+        if headers is None:
+            return
+
+        def _number(name):
+            try:
+                return float(headers.get(name))
+            except (TypeError, ValueError):
+                return None
+
+        retry_after = parse_reset_duration(headers.get("retry-after"))
+        key = (provider, model_name)
+        with self._lock:
+            buckets = self._buckets.get(key, {})
+            now = time.monotonic()
+            for kind in ("requests", "tokens"):
+                if kind not in buckets:
+                    continue
+                remaining = _number(f"x-ratelimit-remaining-{kind}")
+                reset_seconds = parse_reset_duration(
+                    headers.get(f"x-ratelimit-reset-{kind}")
+                )
+                if retry_after is not None:
+                    remaining = 0
+                    reset_seconds = max(reset_seconds or 0, retry_after)
+                buckets[kind].sync(remaining, reset_seconds, now)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns per "provider/model" usage counters and the current bucket levels,
+        plus the current adaptive concurrency limit of each provider.
+        """
+        with self._lock:
+            output = {}
+            for key, stats in self._stats.items():
+                entry = dict(stats)
+                for kind, bucket in self._buckets.get(key, {}).items():
+                    entry[f"{kind}_available"] = round(bucket.level, 1)
+                output["/".join(key)] = entry
+
+        for provider, limiter in self.concurrency_limiters.items():
+            output[f"{provider}/concurrency"] = limiter.stats()
+        return output
+
+
+def create_chat_completion(
+    client: Any,
+    provider: str,
+    model_name: str,
+    messages: List[Dict[str, Any]],
+    rate_limiter: Optional[RateLimiter] = None,
+    cancel_event: Optional[threading.Event] = None,
+    **kwargs,
+):
+    """
+    Calls client.chat.completions.create() (OpenAI or Groq client) while
+    respecting `rate_limiter`: waits for room for the estimated prompt tokens
+    (and for a free slot under the provider's adaptive concurrency limit, if any)
+    before the request is sent and syncs the limiter with the rate limit headers
+    and the latency of the response (or of the error response, e.g. a 429).
+
+    If `cancel_event` is set by the time the request would be sent (or while
+    waiting for the limits), it isn't sent and RequestCancelled is raised (a
+    request in flight is not aborted). Requests the limits can't fit in time
+    raise RateLimitExceeded (see RateLimiter.acquire()).
+    """
+    if cancel_event is not None and cancel_event.is_set():
+        raise RequestCancelled(f"The {provider} request to {model_name} was cancelled.")
+
+    if rate_limiter is None:
+        return client.chat.completions.create(
+            model=model_name, messages=messages, **kwargs
+        )
+
+    estimated_tokens = sum(estimate_message_tokens(message) for message in messages)
+    rate_limiter.acquire(provider, model_name, estimated_tokens, cancel_event)
+
+    concurrency_limiter = rate_limiter.concurrency_limiters.get(provider)
+    if concurrency_limiter is not None:
+        concurrency_limiter.acquire()
+
+    if cancel_event is not None and cancel_event.is_set():
+        # cancelled while waiting for the limiters; give back what was reserved
+        error = RequestCancelled(
+            f"The {provider} request to {model_name} was cancelled."
+        )
+        rate_limiter.record_usage(provider, model_name, estimated_tokens, 0)
+        if concurrency_limiter is not None:
+            # (as an error, so the cancellation doesn't count as a fast response)
+            concurrency_limiter.release(0, error=error)
+        raise error
+
+    start_time = time.monotonic()
+    try:
+        raw_response = client.chat.completions.with_raw_response.create(
+            model=model_name, messages=messages, **kwargs
+        )
+        rate_limiter.update_from_headers(provider, model_name, raw_response.headers)
+        response = raw_response.parse()
+    except Exception as e:
+        error_response = getattr(e, "response", None)
+        rate_limiter.update_from_headers(
+            provider, model_name, getattr(error_response, "headers", None)
+        )
+        if concurrency_limiter is not None:
+            concurrency_limiter.release(time.monotonic() - start_time, error=e)
+        raise
+
+    total_tokens = estimated_tokens
+    usage_info = getattr(response, "usage", None)
+    if usage_info and getattr(usage_info, "total_tokens", None):
+        total_tokens = usage_info.total_tokens
+        rate_limiter.record_usage(
+            provider, model_name, estimated_tokens, usage_info.total_tokens
+        )
+
+    if concurrency_limiter is not None:
+        concurrency_limiter.release(time.monotonic() - start_time, tokens=total_tokens)
+    return response
@@ -0,0 +1,5 @@
+import sys
+import os
+
+# the analyzer's modules import each other by name (they're run from this directory, see analyzer.sh)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,106 @@
+import os
+
+import pytest
+
+from doc_cache import DocumentCache
+
+
+def writer(content: bytes):
+    def fetch(destination_path):
+        with open(destination_path, "wb") as file:
+            file.write(content)
+
+    return fetch
+
+
+def test_a_hit_does_not_fetch_again(tmp_path):
+    cache = DocumentCache(str(tmp_path), max_bytes=1000)
+    path = cache.acquire("aa11", writer(b"x" * 10), suffix=".pdf")
+    cache.release("aa11")
+
+    def fail(destination_path):
+        raise AssertionError("fetched twice")
+
+    assert cache.acquire("aa11", fail, suffix=".pdf") == path
+    cache.release("aa11")
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    cache = DocumentCache(str(tmp_path), max_bytes=25)
+    paths = {}
+    for key in ("aa", "bb"):
+        paths[key] = cache.acquire(key, writer(b"x" * 10))
+        cache.release(key)
+    # "aa" becomes the most recently used
+    cache.acquire("aa", writer(b""))
+    cache.release("aa")
+
+    paths["cc"] = cache.acquire("cc", writer(b"x" * 10))
+    cache.release("cc")
+    assert os.path.exists(paths["aa"])
+    assert not os.path.exists(paths["bb"])
+    assert os.path.exists(paths["cc"])
+    assert cache.stats()["evictions"] == 1
+
+
+def test_pinned_files_are_not_evicted(tmp_path):
+    cache = DocumentCache(str(tmp_path), max_bytes=15)
+    pinned_path = cache.acquire("aa", writer(b"x" * 10))
+    other_path = cache.acquire("bb", writer(b"x" * 10))
+    # both are pinned, so the cache is over its budget for now
+    assert os.path.exists(pinned_path) and os.path.exists(other_path)
+
+    cache.release("bb")
+    assert os.path.exists(pinned_path)
+    assert not os.path.exists(other_path)
+    cache.release("aa")
+
+
+def test_a_failed_fetch_unpins_and_is_not_cached(tmp_path):
+    cache = DocumentCache(str(tmp_path), max_bytes=100)
+
+    def fail(destination_path):
+        raise OSError("download failed")
+
+    with pytest.raises(OSError):
+        cache.acquire("aa", fail)
+    with pytest.raises(Exception):
+        # a fetch that doesn't create the file fails too
+        cache.acquire("aa", lambda destination_path: None)
+    assert cache.stats()["pinned"] == 0
+    assert cache.stats()["fetch_failures"] == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_the_index_is_rebuilt_from_disk(tmp_path):
+    cache = DocumentCache(str(tmp_path), max_bytes=100)
+    path = cache.acquire("aa", writer(b"x" * 10), suffix=".txt")
+    cache.release("aa")
+    with open(os.path.join(str(tmp_path), "leftover.part"), "wb") as file:
+        file.write(b"partial")
+
+    reopened = DocumentCache(str(tmp_path), max_bytes=100)
+    assert reopened.stats()["entries"] == 1
+    assert reopened.stats()["bytes"] == 10
+    assert reopened.acquire("aa", writer(b""), suffix=".txt") == path
+    reopened.release("aa")
+
+    reopened.cleanup()
+    assert not os.path.exists(os.path.join(str(tmp_path), "leftover.part"))
+
+
+def test_files_vanishing_while_the_index_is_built_are_skipped(tmp_path, monkeypatch):
+    cache = DocumentCache(str(tmp_path), max_bytes=100)
+    cache.acquire("aa", writer(b"x" * 10))
+    cache.release("aa")
+
+    getmtime = os.path.getmtime
+
+    def evicted_meanwhile(path):
+        os.remove(path)
+        return getmtime(path)
+
+    monkeypatch.setattr(os.path, "getmtime", evicted_meanwhile)
+    assert DocumentCache(str(tmp_path), max_bytes=100).stats()["entries"] == 0
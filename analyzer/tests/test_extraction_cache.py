@@ -0,0 +1,92 @@
+import file_io
+from extraction_cache import ExtractionCache, hash_file
+
+
+def fake_loader(calls, problem=None):
+    def load_file_content(
+        file_path, client=None, data=None, rate_limiter=None, problems=None
+    ):
+        calls.append(file_path)
+        if problem is not None:
+            problems.append(problem)
+        return f"text of {file_path}"
+
+    return load_file_content
+
+
+def write_contract(tmp_path, content=b"contract"):
+    path = tmp_path / "contract.pdf"
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_extracted_text_is_cached_by_content(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(file_io, "load_file_content", fake_loader(calls))
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    path = write_contract(tmp_path)
+
+    assert cache.load(path) == f"text of {path}"
+    assert cache.load(path, content_hash=hash_file(path).upper()) == f"text of {path}"
+    assert calls == [path]
+    assert cache.stats()["extractions"] == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_a_new_extractor_version_extracts_again(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(file_io, "load_file_content", fake_loader(calls))
+    path = write_contract(tmp_path)
+
+    ExtractionCache(str(tmp_path / "cache"), version="1").load(path)
+    ExtractionCache(str(tmp_path / "cache"), version="2").load(path)
+    assert len(calls) == 2
+
+
+def test_partial_extractions_are_not_cached(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        file_io, "load_file_content", fake_loader(calls, problem="not OCRed")
+    )
+    stored = []
+
+    class Table:
+        def select(self, *args):
+            return self
+
+        def eq(self, *args):
+            return self
+
+        def limit(self, *args):
+            return self
+
+        def upsert(self, row):
+            stored.append(row)
+            return self
+
+        def execute(self):
+            return type("Response", (), {"data": []})()
+
+    class Supabase:
+        def table(self, name):
+            return Table()
+
+    cache = ExtractionCache(str(tmp_path / "cache"), supabase_client=Supabase())
+    path = write_contract(tmp_path)
+    assert cache.load(path) == f"text of {path}"
+    assert cache.load(path) == f"text of {path}"
+
+    assert len(calls) == 2
+    assert stored == []
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["partial_extractions"] == 2
+    assert cache.stats()["pinned"] == 0
+
+
+def test_json_is_never_cached(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(file_io, "load_file_content", fake_loader(calls))
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    cache.load("contract.json", data=b"{}")
+    cache.load("contract.json", data=b"{}")
+    assert len(calls) == 2
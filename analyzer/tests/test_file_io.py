@@ -0,0 +1,214 @@
+import shutil
+import io
+import zipfile
+
+import pytest
+
+import file_io
+
+
+@pytest.mark.parametrize(
+    "pages",
+    [
+        ["a\n\n\n", "\n\nb", "c\n \n"],
+        ["", "  \n\n", "text\n\n\n\nmore", "\n\n\n"],
+        ["first\n", "\n", "\n", "second"],
+        ["\n\n", "only blank pages\n\n"],
+    ],
+)
+def test_join_normalized_pages_matches_normalizing_the_whole_text(pages):
+    normalized_pages = [file_io.normalize_whitespace(page) for page in pages]
+    assert file_io.join_normalized_pages(
+        normalized_pages
+    ) == file_io.normalize_whitespace("".join(pages))
+
+
+def make_pdf(page_texts):
+    import fitz
+
+    document = fitz.open()
+    for text in page_texts:
+        document.new_page().insert_text((50, 50), text)
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+def test_parallel_pdf_extraction_matches_the_sequential_one():
+    data = make_pdf([f"page {i}\n\n\nline" for i in range(6)])
+    problems = []
+    text = file_io.load_pdf_parallel(data=data, page_threshold=1, problems=problems)
+    assert text == file_io.normalize_whitespace(file_io.load_pdf_bytes(data))
+    assert text == file_io.load_pdf_parallel(data=data)
+    assert problems == []
+
+
+def test_pdf_pages_are_streamed_with_offsets():
+    data = make_pdf(["one", "two", "three"])
+    pages = list(file_io.iter_pdf_pages(data=data))
+    text = file_io.load_pdf_bytes(data)
+    assert [page["index"] for page in pages] == [0, 1, 2]
+    for page in pages:
+        assert text[page["offset"] :].startswith(page["text"])
+
+
+def make_docx():
+    import docx
+
+    document = docx.Document()
+    document.sections[0].header.paragraphs[0].text = "Acme Corp"
+    document.add_paragraph("First paragraph")
+    table = document.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = "Name"
+    table.cell(0, 1).text = "Value"
+    table.cell(1, 0).text = "Term"
+    table.cell(1, 1).paragraphs[0].add_run("12").add_tab()
+    document.add_paragraph("Last paragraph")
+    document.sections[0].footer.paragraphs[0].text = "Page footer"
+    output = io.BytesIO()
+    document.save(output)
+    return output.getvalue()
+
+
+def test_docx_blocks_are_streamed_in_document_order():
+    blocks = list(file_io.iter_docx_blocks(data=make_docx()))
+    assert [(block["kind"], block["text"]) for block in blocks] == [
+        ("header", "Header: Acme Corp"),
+        ("paragraph", "First paragraph"),
+        ("table_row", "Name\tValue"),
+        ("table_row", "Term\t12\t"),
+        ("paragraph", "Last paragraph"),
+        ("footer", "Footer: Page footer"),
+    ]
+
+    text = file_io.load_docx_bytes(make_docx())
+    for block in blocks:
+        assert text[block["offset"] :].startswith(block["text"])
+
+
+def test_docx_paragraphs_match_python_docx():
+    import docx
+
+    data = make_docx()
+    expected = [
+        paragraph.text for paragraph in docx.Document(io.BytesIO(data)).paragraphs
+    ]
+    paragraphs = [
+        block["text"]
+        for block in file_io.iter_docx_blocks(data=data)
+        if block["kind"] == "paragraph"
+    ]
+    assert paragraphs == expected
+
+
+def test_docx_fallback_content_is_not_repeated():
+    body = (
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+        'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006"><w:body>'
+        "<w:p><w:r><w:t>Before</w:t></w:r>"
+        "<mc:AlternateContent><mc:Choice><w:r><w:t> box</w:t></w:r></mc:Choice>"
+        "<mc:Fallback><w:r><w:t> box</w:t></w:r></mc:Fallback></mc:AlternateContent>"
+        "</w:p></w:body></w:document>"
+    )
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w") as archive:
+        archive.writestr("word/document.xml", body)
+    assert file_io.load_docx_bytes(output.getvalue()) == "Before box"
+
+
+def make_xlsx(rows):
+    import openpyxl
+
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Terms"
+    for row in rows:
+        sheet.append(row)
+    output = io.BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+
+def test_xlsx_rows_are_streamed():
+    data = make_xlsx([["Name", "Value"], [None, None], [None, None], ["Term", 12]])
+    items = list(file_io.iter_xlsx_rows(data=data, max_rows=0, max_chars=0))
+    assert [(item["kind"], item["text"]) for item in items] == [
+        ("sheet", "Sheet: Terms\n"),
+        ("row", "Name\tValue\n"),
+        ("blank", "\t\n"),
+        ("row", "Term\t12\n"),
+    ]
+    text = "".join(item["text"] for item in items)
+    for item in items:
+        assert text[item["offset"] :].startswith(item["text"])
+    assert file_io.load_xlsx_bytes(data, max_rows=0, max_chars=0) == text.strip()
+
+
+def test_xlsx_sheets_can_be_capped():
+    data = make_xlsx([[f"row {i}"] for i in range(10)])
+    items = list(file_io.iter_xlsx_rows(data=data, max_rows=3, max_chars=0))
+    assert [item["kind"] for item in items] == [
+        "sheet",
+        "row",
+        "row",
+        "row",
+        "truncated",
+    ]
+
+    items = list(file_io.iter_xlsx_rows(data=data, max_rows=0, max_chars=14))
+    assert [item["kind"] for item in items] == ["sheet", "row", "row", "truncated"]
+
+
+@pytest.mark.parametrize(
+    "text, encoding", [("Vertragsbedingungen für Käufer", "utf-8"), ("plain", "ascii")]
+)
+def test_text_files_are_decoded_from_a_sample(text, encoding):
+    data = text.encode(encoding)
+    assert file_io.load_text_bytes(data) == text
+    lines = list(file_io.iter_text_lines(data=data))
+    assert "".join(line["text"] for line in lines) == text
+
+
+class FakeVisionClient:
+    class chat:
+        class completions:
+            messages = []
+
+            @staticmethod
+            def create(model, messages, **kwargs):
+                FakeVisionClient.chat.completions.messages.append(messages)
+                message = type("Message", (), {"content": "a picture"})()
+                choice = type("Choice", (), {"message": message})()
+                return type("Response", (), {"choices": [choice]})()
+
+
+@pytest.mark.skipif(
+    shutil.which("tesseract") is not None, reason="needs tesseract to be missing"
+)
+def test_image_ocr_failures_do_not_break_the_process_pool(monkeypatch):
+    from PIL import Image
+
+    monkeypatch.setattr(file_io, "_pdf_process_pool", None)
+    frames = [Image.new("RGB", (40, 40), (i * 20, 0, 0)) for i in range(12)]
+    output = io.BytesIO()
+    frames[0].save(output, "GIF", save_all=True, append_images=frames[1:])
+
+    problems = []
+    pool = file_io.get_pdf_process_pool()
+    try:
+        result = file_io.load_image_bytes(
+            output.getvalue(), FakeVisionClient(), problems=problems
+        )
+        assert result == {"response": "a picture", "pytesseract": ""}
+        assert problems == ["12 of 12 image frames were not OCRed"]
+        # only the first frames are shown to the vision model
+        sent = FakeVisionClient.chat.completions.messages[-1][0]["content"]
+        assert len(sent) == file_io.IMAGE_MAX_VISION_FRAMES
+
+        # the pool is still the same (working) one
+        assert file_io.get_pdf_process_pool() is pool
+        assert (
+            file_io.load_pdf_parallel(data=make_pdf(["a"]), page_threshold=1) == "a\n"
+        )
+    finally:
+        file_io.discard_process_pool(pool)
@@ -0,0 +1,54 @@
+import threading
+
+from job_leases import JobLeaseKeeper
+
+
+def test_renew_now_drops_jobs_claimed_by_another_node():
+    renewed = []
+
+    def renew(job_ids):
+        renewed.append(sorted(job_ids))
+        return [job_id for job_id in job_ids if job_id != "lost"]
+
+    keeper = JobLeaseKeeper(renew=renew, interval=60)
+    keeper.add(["a", "b", "lost"])
+    keeper.renew_now()
+    assert renewed == [["a", "b", "lost"]]
+    assert keeper.held() == 2
+
+    keeper.discard("a")
+    keeper.renew_now()
+    assert renewed[-1] == ["b"]
+
+
+def test_nothing_is_renewed_without_jobs():
+    calls = []
+    keeper = JobLeaseKeeper(renew=lambda job_ids: calls.append(job_ids), interval=60)
+    keeper.renew_now()
+    assert calls == []
+
+
+def test_a_failed_renewal_keeps_the_jobs():
+    def renew(job_ids):
+        raise ConnectionError("database unreachable")
+
+    keeper = JobLeaseKeeper(renew=renew, interval=60)
+    keeper.add(["a"])
+    keeper.renew_now()
+    assert keeper.held() == 1
+
+
+def test_leases_are_renewed_in_the_background():
+    renewed = threading.Event()
+
+    def renew(job_ids):
+        renewed.set()
+        return job_ids
+
+    keeper = JobLeaseKeeper(renew=renew, interval=0.05)
+    keeper.add(["a"])
+    keeper.start()
+    try:
+        assert renewed.wait(2)
+    finally:
+        keeper.stop()
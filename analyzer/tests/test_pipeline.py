@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+
+from pipeline import StagedPipeline
+
+
+def test_items_run_through_the_stages_in_order():
+    stages = [
+        ("double", lambda x: x * 2, 2),
+        ("increment", lambda x: x + 1, 2),
+    ]
+    with StagedPipeline(stages) as pipeline:
+        futures = [pipeline.submit(i) for i in range(10)]
+        assert [future.result(timeout=5) for future in futures] == [
+            i * 2 + 1 for i in range(10)
+        ]
+    assert pipeline.stats()["double"]["completed"] == 10
+    assert pipeline.stats()["increment"]["completed"] == 10
+
+
+def test_a_failing_stage_skips_the_later_ones():
+    errors = []
+    later_stage_calls = []
+
+    def fail_odd(x):
+        if x % 2:
+            raise ValueError(x)
+        return x
+
+    stages = [
+        ("check", fail_odd, 2),
+        ("record", lambda x: later_stage_calls.append(x) or x, 2),
+    ]
+    on_error = lambda item, e: errors.append((item, type(e)))
+    with StagedPipeline(stages, on_error=on_error) as pipeline:
+        results = [pipeline.submit(i).result(timeout=5) for i in range(4)]
+
+    assert results == [0, None, 2, None]
+    assert sorted(errors) == [(1, ValueError), (3, ValueError)]
+    assert sorted(later_stage_calls) == [0, 2]
+    assert pipeline.stats()["check"]["failed"] == 2
+
+
+def test_errors_propagate_without_on_error():
+    def fail(x):
+        raise ValueError("boom")
+
+    with StagedPipeline([("fail", fail, 1)]) as pipeline:
+        with pytest.raises(ValueError):
+            pipeline.submit(1).result(timeout=5)
+
+
+def test_stage_limits_are_respected():
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def slow(x):
+        nonlocal active, max_active
+        with lock:
+            active += 1
+            max_active = max(max_active, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+        return x
+
+    with StagedPipeline([("slow", slow, 3)]) as pipeline:
+        for future in [pipeline.submit(i) for i in range(12)]:
+            future.result(timeout=5)
+    assert max_active == 3
+
+
+def test_free_slots_follow_the_first_stage():
+    release = threading.Event()
+    slots_freed = threading.Semaphore(0)
+
+    def first(x):
+        release.wait(5)
+        if x == 0:
+            raise ValueError(x)
+        return x
+
+    stages = [("first", first, 2), ("second", lambda x: x, 1)]
+    pipeline = StagedPipeline(
+        stages, on_error=lambda item, e: None, on_slot_free=slots_freed.release
+    )
+    try:
+        assert pipeline.free_slots() == 2
+        futures = [pipeline.submit(i) for i in range(3)]
+        # two are in the first stage and one waits for it
+        assert pipeline.free_slots() == 0
+
+        release.set()
+        for future in futures:
+            future.result(timeout=5)
+        for _ in futures:
+            assert slots_freed.acquire(timeout=5)
+        # failed items give their slot back as well
+        assert pipeline.free_slots() == 2
+    finally:
+        pipeline.shutdown()
+
+
+def test_a_pipeline_needs_stages_with_a_limit():
+    with pytest.raises(ValueError):
+        StagedPipeline([])
+    with pytest.raises(ValueError):
+        StagedPipeline([("stage", lambda x: x, 0)])
@@ -0,0 +1,144 @@
+import threading
+import time
+
+import pytest
+
+from rate_limit import (
+    AdaptiveConcurrencyLimiter,
+    RateLimitExceeded,
+    RateLimiter,
+    RequestCancelled,
+    TokenBucket,
+    estimate_message_tokens,
+    parse_reset_duration,
+)
+
+
+class OverloadError(Exception):
+    status_code = 429
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(capacity=60, period=60)
+    now = bucket.updated_at
+    assert bucket.wait_time(60, now) == 0
+    bucket.take(60)
+    # refills one unit per second
+    assert bucket.wait_time(10, now) == pytest.approx(10)
+    assert bucket.wait_time(10, now + 10) == pytest.approx(0)
+
+
+def test_token_bucket_never_fits_more_than_its_capacity():
+    bucket = TokenBucket(capacity=6000)
+    assert bucket.wait_time(6001, bucket.updated_at) == float("inf")
+
+
+def test_token_bucket_sync_blocks_until_reset():
+    bucket = TokenBucket(capacity=10)
+    now = bucket.updated_at
+    bucket.sync(remaining=0, reset_seconds=5, now=now)
+    assert bucket.wait_time(1, now) == pytest.approx(5)
+
+
+def test_rate_limiter_refuses_requests_bigger_than_the_bucket():
+    limiter = RateLimiter({"groq": {"model": {"tokens_per_minute": 6000}}})
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire("groq", "model", 8000)
+    # nothing was reserved
+    assert limiter.acquire("groq", "model", 6000) == 0
+
+
+def test_rate_limiter_refuses_waits_over_max_wait_seconds():
+    limiter = RateLimiter(
+        {"groq": {"model": {"tokens_per_minute": 6000}}}, max_wait_seconds=1
+    )
+    limiter.acquire("groq", "model", 5000)
+    start_time = time.monotonic()
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire("groq", "model", 5000)
+    assert time.monotonic() - start_time < 1
+
+
+def test_rate_limiter_stops_waiting_once_cancelled():
+    limiter = RateLimiter({"groq": {"model": {"tokens_per_minute": 600}}})
+    limiter.acquire("groq", "model", 600)
+    cancel_event = threading.Event()
+    threading.Timer(0.2, cancel_event.set).start()
+    start_time = time.monotonic()
+    with pytest.raises(RequestCancelled):
+        limiter.acquire("groq", "model", 300, cancel_event)
+    assert time.monotonic() - start_time < 2
+
+
+def test_rate_limiter_does_not_limit_unknown_models():
+    limiter = RateLimiter({"openai": {"gpt-4o": {"tokens_per_minute": 10}}})
+    assert limiter.acquire("openai", "other-model", 10**6) == 0
+
+
+def test_record_usage_charges_the_difference():
+    limiter = RateLimiter({"openai": {"model": {"tokens_per_minute": 1000}}})
+    limiter.acquire("openai", "model", 100)
+    limiter.record_usage("openai", "model", 100, 400)
+    assert limiter.stats()["openai/model"]["tokens_available"] == pytest.approx(
+        600, abs=1
+    )
+
+
+def test_concurrency_limiter_halves_once_per_cooldown():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8, cooldown_seconds=60)
+    for _ in range(3):
+        limiter.acquire()
+    for _ in range(3):
+        limiter.release(1, error=OverloadError())
+    assert limiter.limit == 4
+    assert limiter.stats()["overloads"] == 3
+
+
+def test_concurrency_limiter_only_grows_when_the_limit_was_used():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4)
+    # one call at a time never gets close to the limit
+    for _ in range(50):
+        limiter.acquire()
+        limiter.release(1, tokens=1000)
+    assert limiter.limit == 4
+
+    for _ in range(20):
+        for _ in range(4):
+            limiter.acquire()
+        for _ in range(4):
+            limiter.release(1, tokens=1000)
+    assert limiter.limit > 4
+
+
+def test_concurrency_limiter_blocks_at_the_limit():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=1)
+    limiter.acquire()
+    acquired = threading.Event()
+
+    def acquire():
+        limiter.acquire()
+        acquired.set()
+
+    threading.Thread(target=acquire, daemon=True).start()
+    assert not acquired.wait(0.2)
+    limiter.release(1)
+    assert acquired.wait(1)
+
+
+def test_estimate_message_tokens_counts_images():
+    message = {
+        "role": "user",
+        "content": [
+            {"type": "text", "text": "a" * 400},
+            {"type": "image_url", "image_url": {"url": "data:..."}},
+        ],
+    }
+    assert estimate_message_tokens(message) == 101 + 765
+
+
+@pytest.mark.parametrize(
+    "value, seconds",
+    [("20ms", 0.02), ("1s", 1), ("6m0s", 360), ("2m59.56s", 179.56), ("7", 7)],
+)
+def test_parse_reset_duration(value, seconds):
+    assert parse_reset_duration(value) == pytest.approx(seconds)
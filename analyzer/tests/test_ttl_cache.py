@@ -0,0 +1,48 @@
+import time
+
+import pytest
+
+from ttl_cache import TTLCache
+
+
+def test_get_many_splits_found_and_missing():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set_many({"a": 1, "b": 2})
+    assert cache.get_many(["a", "b", "c"]) == ({"a": 1, "b": 2}, ["c"])
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_expire():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1, ttl=0.05)
+    cache.set("b", 2)
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.stats()["expirations"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_invalidate_and_clear():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set_many({"a": 1, "b": 2})
+    cache.invalidate("a")
+    assert cache.get("a", "missing") == "missing"
+    cache.clear()
+    assert cache.get("b") is None
+
+
+def test_maxsize_must_be_positive():
+    with pytest.raises(ValueError):
+        TTLCache(maxsize=0)
@@ -0,0 +1,98 @@
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+from collections import OrderedDict
+import threading
+import time
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory cache whose entries expire `ttl` seconds after they
+    were stored. Once `maxsize` entries are stored, the least recently used
+    entry is evicted to make room for a new one.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 600):
+        if maxsize < 1:
+            raise ValueError("A TTLCache needs a maxsize of at least 1.")
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Returns the cached value of `key`, or `default` if it's missing or expired.
+        """
+        found, _ = self.get_many([key])
+        return found.get(key, default)
+
+    def get_many(self, keys: Iterable[Hashable]) -> Tuple[Dict[Hashable, Any], List]:
+        """
+        Looks up several keys at once and returns (found, missing): a dict of the
+        cached values and the list of keys that have to be fetched.
+        """
+        found = {}
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] <= now:
+                    del self._entries[key]
+                    self._stats["expirations"] += 1
+                    entry = None
+
+                if entry is None:
+                    self._stats["misses"] += 1
+                    missing.append(key)
+                else:
+                    self._stats["hits"] += 1
+                    self._entries.move_to_end(key)
+                    found[key] = entry[1]
+        return found, missing
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """
+        Stores `value` under `key` for `ttl` seconds (the cache's ttl by default).
+        """
+        self.set_many({key: value}, ttl=ttl)
+
+    def set_many(self, values: Dict[Hashable, Any], ttl: Optional[float] = None):
+        """
+        Stores every key-value pair of `values` for `ttl` seconds (the cache's ttl by default).
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            for key, value in values.items():
+                self._entries[key] = (expires_at, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, key: Hashable):
+        """
+        Removes `key` from the cache (if present).
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the hit/miss/eviction counters and the current size.
+        """
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "size": len(self._entries),
+                "hit_ratio": (
+                    round(self._stats["hits"] / lookups, 3) if lookups else 0.0
+                ),
+            }
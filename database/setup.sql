@@ -184,6 +184,9 @@ CREATE TABLE public.jobs (
     errors JSONB,
     status job_status DEFAULT 'queued',
     report_id UUID,  -- Foreign key to reports
+    claimed_by TEXT,                         -- analyzer node currently holding the job (see claim_jobs)
+    lease_expires_at TIMESTAMP WITH TIME ZONE, -- claim is considered abandoned after this point
+    priority BOOLEAN NOT NULL DEFAULT FALSE, -- analyzed by both LLM providers at once (see ANALYSIS_HEDGE_DELAY_SECONDS)
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT fk_user
@@ -196,6 +199,212 @@ CREATE TABLE public.jobs (
         ON DELETE SET NULL
 );
 
+CREATE INDEX IF NOT EXISTS jobs_status_created_at_idx ON public.jobs (status, created_at);
+
+--
+-- 6) Job claiming for the analyzer(s)
+--
+--    Atomically moves up to p_limit runnable jobs (queued, retrying, failed at
+--    least p_retry_delay_seconds ago, or running with an expired lease) to
+--    'running' for the calling analyzer node, oldest first. FOR UPDATE SKIP
+--    LOCKED lets several nodes call this at the same time without ever handing
+--    out the same job twice.
+--
+
+CREATE OR REPLACE FUNCTION public.claim_jobs(
+    p_worker TEXT,
+    p_limit INTEGER DEFAULT 1,
+    p_lease_seconds INTEGER DEFAULT 1800,
+    p_retry_delay_seconds INTEGER DEFAULT 300
+)
+RETURNS SETOF public.jobs
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    UPDATE public.jobs AS j
+    SET status = 'running',
+        claimed_by = p_worker,
+        lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+        updated_at = now()
+    WHERE j.id IN (
+        SELECT c.id
+        FROM public.jobs AS c
+        WHERE c.status IN ('queued', 'retrying')
+           OR (c.status = 'failed'
+               AND c.updated_at < now() - make_interval(secs => p_retry_delay_seconds))
+           OR (c.status = 'running' AND c.lease_expires_at < now())
+        ORDER BY c.created_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING j.*;
+END;
+$$;
+
+--    Extends the leases of the given jobs that are still claimed by the calling
+--    node (the analyzer calls this periodically while jobs are in flight) and
+--    returns their ids; jobs missing from the result were taken over by
+--    another node after their lease expired.
+--
+
+CREATE OR REPLACE FUNCTION public.renew_job_leases(
+    p_worker TEXT,
+    p_job_ids UUID[],
+    p_lease_seconds INTEGER DEFAULT 1800
+)
+RETURNS SETOF UUID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    UPDATE public.jobs AS j
+    SET lease_expires_at = now() + make_interval(secs => p_lease_seconds)
+    WHERE j.id = ANY(p_job_ids)
+      AND j.status = 'running'
+      AND j.claimed_by = p_worker
+    RETURNING j.id;
+END;
+$$;
+
+--    Gives up the calling node's claim on the given jobs without running them
+--    (e.g. when their users couldn't be looked up) by expiring their leases, so
+--    the next claim_jobs() call, on any node, can pick them up again right away.
+--
+
+CREATE OR REPLACE FUNCTION public.release_job_leases(
+    p_worker TEXT,
+    p_job_ids UUID[]
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE public.jobs AS j
+    SET claimed_by = NULL,
+        lease_expires_at = now()
+    WHERE j.id = ANY(p_job_ids)
+      AND j.status = 'running'
+      AND j.claimed_by = p_worker;
+END;
+$$;
+
+--
+-- 6b) Job finalization for the analyzer(s)
+--
+--    Writes everything a finished (or failed) job produces in one transaction:
+--    the report's content, final report and trace, plus the job's status,
+--    errors and report_id, and releases the job's lease. A job without a
+--    report gets one as soon as there is a final report or a trace to store,
+--    so the trace of a failed job is kept as well. Returns the report's id.
+--    Fails without writing anything if the job is no longer claimed by
+--    p_worker (its lease expired and another node reclaimed it), or if it
+--    would be marked 'completed' without a (non-empty) final report.
+--
+
+CREATE OR REPLACE FUNCTION public.finalize_job(
+    p_job_id UUID,
+    p_worker TEXT,
+    p_status job_status,
+    p_errors JSONB DEFAULT '{}'::jsonb,
+    p_trace_back JSONB DEFAULT NULL,
+    p_final_report JSONB DEFAULT NULL,
+    p_contract_content TEXT DEFAULT NULL,
+    p_send_at TIMESTAMP WITH TIME ZONE DEFAULT NULL
+)
+RETURNS UUID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_report_id UUID;
+    v_claimed_by TEXT;
+BEGIN
+    SELECT j.report_id, j.claimed_by INTO v_report_id, v_claimed_by
+    FROM public.jobs AS j
+    WHERE j.id = p_job_id
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'job % does not exist', p_job_id;
+    END IF;
+
+    IF v_claimed_by IS DISTINCT FROM p_worker THEN
+        RAISE EXCEPTION 'job % is not claimed by %', p_job_id, p_worker;
+    END IF;
+
+    IF p_status = 'completed' AND (p_final_report IS NULL OR p_final_report = '{}'::jsonb) THEN
+        RAISE EXCEPTION 'job % can not be completed without a final report', p_job_id;
+    END IF;
+
+    IF v_report_id IS NOT NULL THEN
+        UPDATE public.reports AS r
+        SET contract_content = COALESCE(p_contract_content, r.contract_content),
+            final_report = COALESCE(p_final_report, r.final_report),
+            trace_back = COALESCE(
+                p_trace_back || jsonb_build_object('report_id', r.id),
+                r.trace_back
+            ),
+            status = CASE WHEN p_final_report IS NOT NULL THEN 'completed' ELSE p_status END,
+            updated_at = now()
+        WHERE r.id = v_report_id;
+
+        IF NOT FOUND THEN
+            v_report_id := NULL;
+        END IF;
+    END IF;
+
+    IF v_report_id IS NULL AND (p_final_report IS NOT NULL OR p_trace_back IS NOT NULL) THEN
+        v_report_id := gen_random_uuid();
+        INSERT INTO public.reports (id, contract_content, final_report, trace_back, version, status)
+        VALUES (
+            v_report_id,
+            p_contract_content,
+            p_final_report,
+            p_trace_back || jsonb_build_object('report_id', v_report_id),
+            '0.0.0',
+            CASE WHEN p_final_report IS NOT NULL THEN 'completed' ELSE p_status END
+        );
+    END IF;
+
+    UPDATE public.jobs
+    SET status = p_status,
+        errors = p_errors,
+        send_at = COALESCE(p_send_at, send_at),
+        report_id = v_report_id,
+        claimed_by = NULL,
+        lease_expires_at = NULL,
+        updated_at = now()
+    WHERE id = p_job_id;
+
+    RETURN v_report_id;
+END;
+$$;
+
+--
+-- 6c) Extracted contract text shared between analyzer nodes (optional)
+--
+--    Used by the analyzer's extraction cache when EXTRACTION_CACHE_TABLE is set
+--    to 'extractions', so a document that one node already parsed/OCRed is
+--    never extracted again by another one.
+--
+
+CREATE TABLE IF NOT EXISTS public.extractions (
+    content_hash VARCHAR(255) NOT NULL,      -- same MD5 as jobs.file_hash
+    extractor_version VARCHAR(50) NOT NULL,  -- file_io.EXTRACTOR_VERSION
+    content TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (content_hash, extractor_version)
+);
+
+--
+-- 7) Realtime notifications for new jobs
+--
+--    The analyzer daemon (main.py --daemon --listen) subscribes to inserts on
+--    public.jobs so it can start a job right away instead of on its next poll.
+--
+
+ALTER PUBLICATION supabase_realtime ADD TABLE public.jobs;
+
 create table public.waitlist (
   id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
   name text not null,
@@ -214,3 +423,15 @@ create table public.waitlist (
 --    - next_auth.users
 --    - public.jobs (particularly into the recipients JSON array).
 --
+-- Databases created before job claiming was added (section 6) can be upgraded with:
+--    ALTER TABLE public.jobs ADD COLUMN IF NOT EXISTS claimed_by TEXT;
+--    ALTER TABLE public.jobs ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP WITH TIME ZONE;
+-- followed by the CREATE INDEX and CREATE FUNCTION statements of section 6
+-- (and the CREATE FUNCTION statement of section 6b, and section 6c).
+-- Databases created before finalize_job() took p_worker need its old version dropped first:
+--    DROP FUNCTION IF EXISTS public.finalize_job(UUID, job_status, JSONB, JSONB, JSONB, TEXT, TIMESTAMP WITH TIME ZONE);
+-- and, before claim_jobs() took p_retry_delay_seconds:
+--    DROP FUNCTION IF EXISTS public.claim_jobs(TEXT, INTEGER, INTEGER);
+-- Databases created before priority jobs were added can be upgraded with:
+--    ALTER TABLE public.jobs ADD COLUMN IF NOT EXISTS priority BOOLEAN NOT NULL DEFAULT FALSE;
+--